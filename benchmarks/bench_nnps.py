@@ -0,0 +1,28 @@
+"""Benchmarks for the CPU NNPS algorithms, to be run using asv.
+
+See ``pysph bench nnps`` for a more exhaustive set of benchmarks that also
+varies the spread of the smoothing lengths and the number of threads.
+"""
+
+from pysph.tools.benchmark import NNPS_ALGORITHMS, find_all_neighbors, \
+    get_nnps_class, make_particles
+
+
+class NNPSSuite(object):
+    params = (list(NNPS_ALGORITHMS), [10000, 100000], [2, 3], [False, True])
+    param_names = ['nnps', 'n', 'dim', 'cache']
+    timeout = 300
+
+    def setup(self, name, n, dim, cache):
+        self.pa = make_particles(n, dim, h_spread=0.5)
+        self.nnps = get_nnps_class(name)(
+            dim=dim, particles=[self.pa], radius_scale=2.0, cache=cache
+        )
+
+    def time_update(self, name, n, dim, cache):
+        self.nnps.update()
+
+    def time_query(self, name, n, dim, cache):
+        # The update resets the cached neighbors.
+        self.nnps.update()
+        find_all_neighbors(self.nnps, cache)
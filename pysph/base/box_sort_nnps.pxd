@@ -22,4 +22,7 @@ cdef class BoxSortNNPS(LinkedListNNPS):
     ############################################################################
     cdef public map[long, int] cell_to_index  # Maps cell ID to an index
 
+    cdef bint _update_incremental(self) except -1
+    cdef long _map_cell_index(self, long cell_id) nogil
+
 
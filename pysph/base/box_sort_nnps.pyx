@@ -33,12 +33,21 @@ cdef class BoxSortNNPS(LinkedListNNPS):
 
     #### Private protocol ################################################
 
+    cdef bint _update_incremental(self) except -1:
+        # Only the occupied cells are stored so particles moving into a new
+        # cell require a full binning.
+        return False
+
     cdef long _get_flattened_cell_index(self, cPoint pnt, double cell_size):
         cdef long cell_id = flatten(
             find_cell_id(pnt, cell_size), self.ncells_per_dim, self.dim
         )
         return self.cell_to_index[cell_id]
 
+    cdef long _map_cell_index(self, long cell_id) nogil:
+        # Only look up the map here as this is called from many threads.
+        return deref(self.cell_to_index.find(cell_id)).second
+
     @cython.boundscheck(False)
     @cython.wraparound(False)
     cdef inline long _get_valid_cell_index(self, int cid_x, int cid_y, int cid_z,
@@ -56,7 +56,8 @@ cdef class CellIndexingNNPS(NNPS):
     cpdef get_spatially_ordered_indices(self, int pa_index, LongArray indices)
 
     cdef void fill_array(self, NNPSParticleArrayWrapper pa_wrapper, int pa_index,
-            UIntArray indices, u_int* current_keys, key_to_idx_t* current_indices) nogil
+            UIntArray indices, u_int* current_keys, key_to_idx_t* current_indices,
+            bint parallel) nogil
 
     cpdef _refresh(self)
 
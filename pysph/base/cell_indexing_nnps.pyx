@@ -6,6 +6,7 @@ from libcpp.vector cimport vector
 from libcpp.map cimport map
 
 from cython.operator cimport dereference as deref, preincrement as inc
+from cython.parallel import prange
 
 # Cython for compiler directives
 cimport cython
@@ -224,27 +225,35 @@ cdef class CellIndexingNNPS(NNPS):
 
 
     cdef void fill_array(self, NNPSParticleArrayWrapper pa_wrapper, int pa_index,
-            UIntArray indices, u_int* current_keys, key_to_idx_t* current_indices) nogil:
+            UIntArray indices, u_int* current_keys, key_to_idx_t* current_indices,
+            bint parallel) nogil:
         cdef double* x_ptr = pa_wrapper.x.data
         cdef double* y_ptr = pa_wrapper.y.data
         cdef double* z_ptr = pa_wrapper.z.data
 
         cdef double* xmin = self.xmin.data
 
+        cdef double cell_size = self.cell_size
+
         cdef int i, n
         cdef int c_x, c_y, c_z
-        for i from 0<=i<indices.length:
-            n = indices.data[i]
-            find_cell_id_raw(
-                    x_ptr[i] - xmin[0],
-                    y_ptr[i] - xmin[1],
-                    z_ptr[i] - xmin[2],
-                    self.cell_size,
-                    &c_x, &c_y, &c_z
-                    )
-            current_keys[i] = self._get_key(n, c_x, c_y, c_z, pa_index)
+        if parallel:
+            for i in prange(indices.length):
+                n = indices.data[i]
+                c_x = real_to_int(x_ptr[i] - xmin[0], cell_size)
+                c_y = real_to_int(y_ptr[i] - xmin[1], cell_size)
+                c_z = real_to_int(z_ptr[i] - xmin[2], cell_size)
+                current_keys[i] = self._get_key(n, c_x, c_y, c_z, pa_index)
+        else:
+            for i in range(indices.length):
+                n = indices.data[i]
+                c_x = real_to_int(x_ptr[i] - xmin[0], cell_size)
+                c_y = real_to_int(y_ptr[i] - xmin[1], cell_size)
+                c_z = real_to_int(z_ptr[i] - xmin[2], cell_size)
+                current_keys[i] = self._get_key(n, c_x, c_y, c_z, pa_index)
 
-        sort(current_keys, current_keys + indices.length)
+        # The keys contain the particle index and are distinct.
+        parallel_sort(current_keys, indices.length, parallel)
 
         cdef int id_x, id_y, id_z
 
@@ -359,5 +368,6 @@ cdef class CellIndexingNNPS(NNPS):
         cdef u_int* current_keys = self.keys[pa_index]
         cdef key_to_idx_t* current_indices = self.key_indices[pa_index]
 
-        self.fill_array(pa_wrapper, pa_index, indices, current_keys, current_indices)
+        self.fill_array(pa_wrapper, pa_index, indices, current_keys, current_indices,
+                        self._use_parallel_bin(indices.length))
 
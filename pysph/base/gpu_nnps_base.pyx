@@ -213,6 +213,44 @@ cdef class GPUNNPS(NNPSBase):
             self.set_context(src_index, dst_index)
         self.cache[idx].get_neighbors_gpu()
 
+    def get_all_neighbors(self, int src_index, int dst_index, indices=None,
+                          bint distances=False):
+        """Find the neighbors of many destination particles at once, see
+        :py:meth:`NNPSBase.get_all_neighbors`. The neighbors are found on the
+        device and copied back.
+        """
+        self.get_nearest_particles_gpu(src_index, dst_index)
+        cdef GPUNeighborCache cache = self.current_cache
+        if not cache._copied_to_cpu:
+            cache.copy_to_cpu()
+        lengths = cache._nbr_lengths.astype(np.int64)
+        starts = cache._start_idx.astype(np.int64)
+        if indices is not None:
+            indices = np.asarray(indices, dtype=np.int64)
+            lengths = lengths[indices]
+            starts = starts[indices]
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        gather = np.repeat(starts - offsets[:-1], lengths) + \
+            np.arange(offsets[-1])
+        nbrs = cache._neighbors_cpu[gather]
+        if not distances:
+            return offsets, nbrs
+
+        src = self.particles[src_index]
+        dst = self.particles[dst_index]
+        src.gpu.pull('x', 'y', 'z')
+        dst.gpu.pull('x', 'y', 'z')
+        if indices is None:
+            indices = np.arange(len(lengths))
+        d_idx = np.repeat(indices, lengths)
+        dists = np.sqrt(
+            (dst.x[d_idx] - src.x[nbrs])**2 +
+            (dst.y[d_idx] - src.y[nbrs])**2 +
+            (dst.z[d_idx] - src.z[nbrs])**2
+        )
+        return offsets, nbrs, dists
+
     cpdef spatially_order_particles(self, int pa_index):
         """Spatially order particles such that nearby particles have indices
         nearer each other.  This may improve pre-fetching on the CPU.
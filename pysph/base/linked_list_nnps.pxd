@@ -17,11 +17,25 @@ cdef class LinkedListNNPS(NNPS):
     cdef NNPSParticleArrayWrapper src, dst # Current source and destination.
     cdef UIntArray next, head              # Current next and head arrays.
 
+    # Data used for incremental updates.
+    cdef list _cids                        # Cell index of each particle
+    cdef list _ref_positions               # (x, y, z) at the last binning
+    cdef DoubleArray _ref_xmin             # xmin at the last full binning
+    cdef IntArray _ref_ncells_per_dim      # number of cells at the same
+    cdef double _ref_cell_size             # cell size at the same
+    cdef bint _incremental_valid           # if the reference data is usable
+
     cpdef long _count_occupied_cells(self, long n_cells) except -1
     cpdef long _get_number_of_cells(self) except -1
     cdef long _get_flattened_cell_index(self, cPoint pnt, double cell_size)
+    cdef long _map_cell_index(self, long cell_id) nogil
+    cdef _bin_parallel(self, int pa_index, UIntArray indices)
     cdef long _get_valid_cell_index(self, int cid_x, int cid_y, int cid_z,
             int* ncells_per_dim, int dim, int n_cells) nogil
     cdef void find_nearest_neighbors(self, size_t d_idx, UIntArray nbrs) nogil
+    cdef bint _supports_periodic_images(self)
+    cdef bint _update_incremental(self) except -1
+    cdef _save_incremental_state(self)
+    cdef _rebin_moved(self, int pa_index)
 
 
@@ -9,6 +9,7 @@ from cython.parallel import parallel, prange, threadid
 
 # malloc and friends
 from libc.stdlib cimport malloc, free
+from libc.string cimport memcmp, memcpy
 from libcpp.map cimport map
 from libcpp.pair cimport pair
 from libcpp.vector cimport vector
@@ -73,6 +74,17 @@ cdef class LinkedListNNPS(NNPS):
         # flag for constant smoothing lengths
         self.fixed_h = fixed_h
 
+        # data for incremental updates
+        self._cids = [UIntArray() for i in range(self.narrays)]
+        self._ref_positions = [
+            (DoubleArray(), DoubleArray(), DoubleArray())
+            for i in range(self.narrays)
+        ]
+        self._ref_xmin = DoubleArray(3)
+        self._ref_ncells_per_dim = IntArray(3)
+        self._ref_cell_size = 0.0
+        self._incremental_valid = False
+
         # defaults
         self.ncells_per_dim = IntArray(3)
         self.n_cells = 0
@@ -132,20 +144,18 @@ cdef class LinkedListNNPS(NNPS):
         cdef unsigned int _next
         cdef int ix, iy, iz
 
+        # the virtual periodic images of the particle, if any.
+        cdef double* xmax = self.xmax.data
+        cdef double* image_shifts = self.image_shifts.data
+        cdef int image
+
         # this is the physical position of the particle that will be
         # used in pairwise searching
         cdef double x = d_x[d_idx]
         cdef double y = d_y[d_idx]
         cdef double z = d_z[d_idx]
 
-        # get the un-flattened index for the destination particle with
-        # respect to the minimum
         cdef int _cid_x, _cid_y, _cid_z
-        find_cell_id_raw(
-            x - xmin[0], y - xmin[1], z - xmin[2],
-            cell_size, &_cid_x, &_cid_y, &_cid_z
-        )
-
         cdef int cid_x, cid_y, cid_z
         cdef long cell_index, orig_length
         cid_x = cid_y = cid_z = 0
@@ -156,37 +166,56 @@ cdef class LinkedListNNPS(NNPS):
 
         orig_length = nbrs.length
 
-        # Begin search through neighboring cells
-        for ix in range(3):
-            for iy in range(3):
-                for iz in range(3):
-                    cid_x = _cid_x + shifts[ix]
-                    cid_y = _cid_y + shifts[iy]
-                    cid_z = _cid_z + shifts[iz]
-
-                    # Only consider valid cell indices
-                    cell_index = self._get_valid_cell_index(
-                        cid_x, cid_y, cid_z,
-                        self.ncells_per_dim.data, dim, n_cells
-                    )
-                    if cell_index > -1:
-
-                        # get the first particle and begin iteration
-                        _next = head[ cell_index ]
-                        while( _next != UINT_MAX ):
-                            hj2 = radius_scale * s_h[_next]
-                            hj2 *= hj2
-
-                            xij2 = norm2( s_x[_next]-x,
-                                          s_y[_next]-y,
-                                          s_z[_next]-z )
-
-                            # select neighbor
-                            if ( (xij2 < hi2) or (xij2 < hj2) ):
-                                nbrs.c_append(_next)
-
-                            # get the 'next' particle in this cell
-                            _next = next[_next]
+        for image in range(self.n_images + 1):
+            if image > 0:
+                # Search around the periodic image of the particle, which is
+                # only useful near the bounds of the particles.
+                x = d_x[d_idx] + image_shifts[3*image - 3]
+                y = d_y[d_idx] + image_shifts[3*image - 2]
+                z = d_z[d_idx] + image_shifts[3*image - 1]
+                if x < xmin[0] - cell_size or x > xmax[0] + cell_size or \
+                   y < xmin[1] - cell_size or y > xmax[1] + cell_size or \
+                   z < xmin[2] - cell_size or z > xmax[2] + cell_size:
+                    continue
+
+            # get the un-flattened index for the destination particle with
+            # respect to the minimum
+            find_cell_id_raw(
+                x - xmin[0], y - xmin[1], z - xmin[2],
+                cell_size, &_cid_x, &_cid_y, &_cid_z
+            )
+
+            # Begin search through neighboring cells
+            for ix in range(3):
+                for iy in range(3):
+                    for iz in range(3):
+                        cid_x = _cid_x + shifts[ix]
+                        cid_y = _cid_y + shifts[iy]
+                        cid_z = _cid_z + shifts[iz]
+
+                        # Only consider valid cell indices
+                        cell_index = self._get_valid_cell_index(
+                            cid_x, cid_y, cid_z,
+                            self.ncells_per_dim.data, dim, n_cells
+                        )
+                        if cell_index > -1:
+
+                            # get the first particle and begin iteration
+                            _next = head[ cell_index ]
+                            while( _next != UINT_MAX ):
+                                hj2 = radius_scale * s_h[_next]
+                                hj2 *= hj2
+
+                                xij2 = norm2( s_x[_next]-x,
+                                              s_y[_next]-y,
+                                              s_z[_next]-z )
+
+                                # select neighbor
+                                if ( (xij2 < hi2) or (xij2 < hj2) ):
+                                    nbrs.c_append(_next)
+
+                                # get the 'next' particle in this cell
+                                _next = next[_next]
         if self.sort_gids:
             self._sort_neighbors(
                 &nbrs.data[orig_length], nbrs.length - orig_length, s_gid
@@ -256,6 +285,8 @@ cdef class LinkedListNNPS(NNPS):
         cdef UIntArray head = self.heads[ pa_index ]
         cdef UIntArray next = self.nexts[ pa_index ]
         cdef double cell_size = self.cell_size
+        cdef UIntArray cids = self._cids[ pa_index ]
+        cdef bint save_cids = self.incremental
 
         cdef UIntArray lindices, gindices
         cdef size_t num_particles, indexi, i
@@ -264,8 +295,12 @@ cdef class LinkedListNNPS(NNPS):
         cdef cPoint pnt = cPoint_new(0, 0, 0)
         cdef int _cid
 
-        # now bin the particles
         num_particles = indices.length
+        if self._use_parallel_bin(num_particles):
+            self._bin_parallel(pa_index, indices)
+            return
+
+        # now bin the particles
         for indexi in range(num_particles):
             i = indices.data[indexi]
 
@@ -281,12 +316,90 @@ cdef class LinkedListNNPS(NNPS):
             # insert this particle
             next.data[ i ] = head.data[ _cid ]
             head.data[_cid] = i
+            if save_cids:
+                cids.data[i] = _cid
 
     cdef long _get_flattened_cell_index(self, cPoint pnt, double cell_size):
         return flatten(
             find_cell_id(pnt, cell_size), self.ncells_per_dim, self.dim
         )
 
+    cdef bint _supports_periodic_images(self):
+        return True
+
+    cdef long _map_cell_index(self, long cell_id) nogil:
+        """Return the index of the head of the given flattened cell."""
+        return cell_id
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cdef _bin_parallel(self, int pa_index, UIntArray indices):
+        """Bin the given particles using all the threads.
+
+        The particles are sorted on their cell, keeping the order of the
+        indices within a cell, and each one is then linked to the one before
+        it in the same cell. This gives the same head and next arrays as
+        inserting them one after the other.
+        """
+        cdef NNPSParticleArrayWrapper pa_wrapper = self.pa_wrappers[pa_index]
+        cdef double* x = pa_wrapper.x.data
+        cdef double* y = pa_wrapper.y.data
+        cdef double* z = pa_wrapper.z.data
+        cdef double* xmin = self.xmin.data
+        cdef int* ncells_per_dim = self.ncells_per_dim.data
+        cdef int dim = self.dim
+        cdef double cell_size = self.cell_size
+
+        cdef unsigned int* head = (<UIntArray>self.heads[pa_index]).data
+        cdef unsigned int* next = (<UIntArray>self.nexts[pa_index]).data
+        cdef unsigned int* cids = (<UIntArray>self._cids[pa_index]).data
+        cdef bint save_cids = self.incremental
+        cdef unsigned int* idx = indices.data
+        cdef long n = indices.length
+
+        # The cell in the upper and the position in the indices in the lower
+        # 32 bits.
+        cdef unsigned long long* keys = <unsigned long long*>malloc(
+            n*sizeof(unsigned long long)
+        )
+        if keys == NULL:
+            raise MemoryError()
+        cdef long s, _cid
+        cdef unsigned int i
+        cdef int c_x, c_y, c_z
+
+        for s in prange(n, nogil=True):
+            i = idx[s]
+            c_x = real_to_int(x[i] - xmin[0], cell_size)
+            c_y = real_to_int(y[i] - xmin[1], cell_size)
+            c_z = real_to_int(z[i] - xmin[2], cell_size)
+            _cid = self._map_cell_index(
+                flatten_raw(c_x, c_y, c_z, ncells_per_dim, dim)
+            )
+            keys[s] = (<unsigned long long>_cid << 32) | <unsigned long long>s
+
+        with nogil:
+            parallel_sort(keys, n, True)
+
+        # The first particle of a cell points to the old head of the cell.
+        for s in prange(n, nogil=True):
+            _cid = <long>(keys[s] >> 32)
+            i = idx[keys[s] & 0xffffffffULL]
+            if s > 0 and (keys[s - 1] >> 32) == <unsigned long long>_cid:
+                next[i] = idx[keys[s - 1] & 0xffffffffULL]
+            else:
+                next[i] = head[_cid]
+            if save_cids:
+                cids[i] = <unsigned int>_cid
+
+        # The last particle of a cell is its new head.
+        for s in prange(n, nogil=True):
+            _cid = <long>(keys[s] >> 32)
+            if s == n - 1 or (keys[s + 1] >> 32) != <unsigned long long>_cid:
+                head[_cid] = idx[keys[s] & 0xffffffffULL]
+
+        free(keys)
+
     cpdef long _get_number_of_cells(self) except -1:
         cdef double cell_size = self.cell_size
         cdef double cell_size1 = 1./cell_size
@@ -372,8 +485,124 @@ cdef class LinkedListNNPS(NNPS):
             next.resize( np )
 
             # UINT_MAX is used to indicate an invalid index
-            for j in range(_ncells):
-                head.data[j] = UINT_MAX
+            if self._use_parallel_bin(np):
+                for j in prange(_ncells, nogil=True):
+                    head.data[j] = UINT_MAX
+                for j in prange(np, nogil=True):
+                    next.data[j] = UINT_MAX
+            else:
+                for j in range(_ncells):
+                    head.data[j] = UINT_MAX
+                for j in range(np):
+                    next.data[j] = UINT_MAX
+
+            if self.incremental:
+                (<UIntArray>self._cids[i]).resize(np)
+
+    cdef bint _update_incremental(self) except -1:
+        """Rebin the particles that moved to a different cell since the last
+        update, returns False if a full binning is needed.
+        """
+        cdef int i, k
+        cdef NNPSParticleArrayWrapper pa_wrapper
 
-            for j in range(np):
-                next.data[j] = UINT_MAX
+        if not self._incremental_valid or self.domain.manager.in_parallel:
+            return False
+
+        # The cells must be the same as those at the last full binning.
+        if self.cell_size != self._ref_cell_size:
+            return False
+        for k in range(3):
+            if self.xmin.data[k] != self._ref_xmin.data[k]:
+                return False
+        if self._get_number_of_cells() != self.n_cells:
+            return False
+        for k in range(3):
+            if self.ncells_per_dim.data[k] != \
+               self._ref_ncells_per_dim.data[k]:
+                return False
+
+        for i in range(self.narrays):
+            pa_wrapper = self.pa_wrappers[i]
+            if pa_wrapper.get_number_of_particles() != \
+               (<UIntArray>self._cids[i]).length:
+                return False
+
+        for i in range(self.narrays):
+            self._rebin_moved(i)
+        return True
+
+    cdef _save_incremental_state(self):
+        """Save the positions and cells used for incremental updates."""
+        cdef int i, k
+        cdef NNPSParticleArrayWrapper pa_wrapper
+        cdef DoubleArray src, dst
+        for i in range(self.narrays):
+            pa_wrapper = self.pa_wrappers[i]
+            current = (pa_wrapper.x, pa_wrapper.y, pa_wrapper.z)
+            for k in range(3):
+                src = current[k]
+                dst = self._ref_positions[i][k]
+                dst.resize(src.length)
+                memcpy(dst.data, src.data, src.length*sizeof(double))
+        for k in range(3):
+            self._ref_xmin.data[k] = self.xmin.data[k]
+            self._ref_ncells_per_dim.data[k] = self.ncells_per_dim.data[k]
+        self._ref_cell_size = self.cell_size
+        self._incremental_valid = True
+
+    cdef _rebin_moved(self, int pa_index):
+        """Move the particles of the array that changed cells since the last
+        update. The array is skipped if none of its particles moved.
+        """
+        cdef NNPSParticleArrayWrapper pa_wrapper = self.pa_wrappers[pa_index]
+        cdef DoubleArray x = pa_wrapper.x
+        cdef DoubleArray y = pa_wrapper.y
+        cdef DoubleArray z = pa_wrapper.z
+        cdef DoubleArray x0, y0, z0
+        x0, y0, z0 = self._ref_positions[pa_index]
+        cdef UIntArray head = self.heads[pa_index]
+        cdef UIntArray next = self.nexts[pa_index]
+        cdef UIntArray cids = self._cids[pa_index]
+        cdef double* xmin = self.xmin.data
+        cdef double cell_size = self.cell_size
+        cdef size_t nbytes = x.length*sizeof(double)
+        cdef cPoint pnt = cPoint_new(0, 0, 0)
+        cdef long i, _cid, old_cid
+        cdef unsigned int j
+
+        if memcmp(x.data, x0.data, nbytes) == 0 and \
+           memcmp(y.data, y0.data, nbytes) == 0 and \
+           memcmp(z.data, z0.data, nbytes) == 0:
+            self.n_static_skips += 1
+            return
+
+        for i in range(x.length):
+            if x.data[i] == x0.data[i] and y.data[i] == y0.data[i] and \
+               z.data[i] == z0.data[i]:
+                continue
+            x0.data[i] = x.data[i]
+            y0.data[i] = y.data[i]
+            z0.data[i] = z.data[i]
+
+            pnt.x = x.data[i] - xmin[0]
+            pnt.y = y.data[i] - xmin[1]
+            pnt.z = z.data[i] - xmin[2]
+            _cid = self._get_flattened_cell_index(pnt, cell_size)
+            old_cid = cids.data[i]
+            if _cid == old_cid:
+                continue
+
+            # Remove the particle from its old cell.
+            if head.data[old_cid] == i:
+                head.data[old_cid] = next.data[i]
+            else:
+                j = head.data[old_cid]
+                while next.data[j] != i:
+                    j = next.data[j]
+                next.data[j] = next.data[i]
+
+            # Insert it into the new cell.
+            next.data[i] = head.data[_cid]
+            head.data[_cid] = i
+            cids.data[i] = _cid
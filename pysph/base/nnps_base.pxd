@@ -24,6 +24,11 @@ cdef extern from 'limits.h':
     cdef unsigned int UINT_MAX
     cdef int INT_MAX
 
+# Parallel sort used when binning the particles.
+cdef extern from 'parallel_utils.h' nogil:
+    cdef long PARALLEL_MIN_SIZE
+    void parallel_sort[T](T* data, long n, bint parallel)
+
 # ZOLTAN ID TYPE AND PTR
 ctypedef unsigned int ZOLTAN_ID_TYPE
 ctypedef unsigned int* ZOLTAN_ID_PTR
@@ -175,6 +180,7 @@ cdef class DomainManagerBase:
     cdef public bint in_parallel     # Flag to determine if in parallel
     cdef public double radius_scale  # Radius scale for kernel
     cdef public double n_layers      # Number of layers of ghost particles
+    cdef public bint virtual_periodic # periodic images without ghost copies
 
     #cdef double dbl_max              # Maximum value of double
 
@@ -188,6 +194,13 @@ cdef class CPUDomainManager(DomainManagerBase):
     cdef public object dtype
     cdef public double dtype_max
     cdef public list ghosts
+    cdef public bint reuse_ghosts    # refresh ghosts in place if possible
+
+    # source particle, translation and ghost layer flags of the ghosts
+    cdef list _ghost_src
+    cdef list _ghost_shift
+    cdef list _ghost_flags
+    cdef list _n_ghosts
 
     # box-wrap particles within the physical domain
     cdef _box_wrap_periodic(self)
@@ -198,6 +211,18 @@ cdef class CPUDomainManager(DomainManagerBase):
     # create new ghosts
     cdef _create_ghosts_periodic(self)
 
+    # check if the ghosts of the previous update are still in place
+    cdef bint _ghosts_in_place(self)
+
+    # check if the particles in the ghost layers are the same as before
+    cdef bint _ghost_layers_unchanged(self)
+
+    # copy the properties of the source particles to the ghosts
+    cdef _refresh_ghosts(self)
+
+    # check that the virtual periodic images can be used
+    cdef _check_periodic_images(self)
+
     # Compute the cell size across processors. The cell size is taken
     # as max(h)*radius_scale
     cdef _compute_cell_size_for_binning(self)
@@ -250,13 +275,32 @@ cdef class NeighborCache:
     cdef public list _neighbor_arrays
     cdef int _last_avg_nbr_size
 
+    # Contiguous (CSR) storage of the neighbors in destination order.
+    cdef public bint csr              # build the CSR arrays on update
+    cdef bint _csr_built              # if the CSR arrays are valid
+    cdef bint _used                   # if neighbors were asked for
+    cdef LongArray _offsets
+    cdef UIntArray _indices
+
+    # Compressed storage of the CSR arrays, see NNPS.set_cache_compression.
+    cdef public bint compress         # store delta encoded 16 bit indices
+    cdef unsigned short* _stream      # the encoded neighbors
+    cdef long _stream_alloc           # allocated length of the stream
+
     cdef void get_neighbors_raw(self, size_t d_idx, UIntArray nbrs) nogil
+    cdef unsigned short* get_compressed_raw(self, size_t d_idx) nogil
     cpdef get_neighbors(self, int src_index, size_t d_idx, UIntArray nbrs)
     cpdef find_all_neighbors(self)
+    cpdef get_csr(self)
+    cpdef get_compression_stats(self, long n_samples=*)
     cpdef update(self)
 
     cdef void _update_last_avg_nbr_size(self)
     cdef void _find_neighbors(self, long d_idx) nogil
+    cdef _build_csr(self)
+    cdef _build_compressed(self)
+    cdef _reset_scratch(self)
+    cdef _decompress(self)
 
 cdef class NNPSBase:
     ##########################################################################
@@ -305,6 +349,23 @@ cdef class NNPS(NNPSBase):
 
     cdef public bint sort_gids        # Sort neighbors by their gids.
 
+    cdef public double kernel_radius_scale # radius scale without any skin
+    cdef public double skin           # Verlet skin as a fraction of radius
+    cdef public long n_rebuilds       # number of times neighbors were rebuilt
+    cdef public long n_reuses         # number of updates reusing neighbors
+    cdef list _skin_reference         # (x, y, z, h) at the last rebuild
+    cdef double _skin_hmin            # minimum h at the last rebuild
+    cdef bint _skin_valid             # if the reference data is usable
+
+    cdef public bint incremental      # only rebin particles that moved
+    cdef public long n_static_skips   # number of static arrays not rebinned
+
+    cdef public bint parallel_bin     # bin using all the OpenMP threads
+
+    # Shifts of the virtual periodic images of a particle.
+    cdef DoubleArray image_shifts     # (dx, dy, dz) for each image
+    cdef public int n_images          # number of periodic images
+
     ##########################################################################
     # Member functions
     ##########################################################################
@@ -317,17 +378,42 @@ cdef class NNPS(NNPSBase):
     # assumed to be of type unsigned int and local to the NNPS object
     cpdef _bin(self, int pa_index, UIntArray indices)
 
+    # Return True if the given number of particles should be binned in
+    # parallel.
+    cdef bint _use_parallel_bin(self, long n)
+
+    # Return True if virtual periodic images are supported.
+    cdef bint _supports_periodic_images(self)
+
     cdef void _sort_neighbors(self, unsigned int* nbrs, size_t length,
                               unsigned int *gids) nogil
 
     # compute the min and max for the particle coordinates
     cdef _compute_bounds(self)
 
+    # Check if the neighbors found at the last rebuild are still valid
+    # given the Verlet skin.
+    cdef bint _can_reuse_neighbors(self)
+
+    # save the positions and smoothing lengths used to check the skin.
+    cdef _save_skin_reference(self)
+
+    # Update the binning of the particles that moved since the last update,
+    # returns False if this is not possible and a full binning is needed.
+    cdef bint _update_incremental(self) except -1
+
+    # save the data needed for an incremental update after a full binning.
+    cdef _save_incremental_state(self)
+
     cdef void find_nearest_neighbors(self, size_t d_idx, UIntArray nbrs) nogil
 
     cdef void get_nearest_neighbors(self, size_t d_idx,
                                       UIntArray nbrs) nogil
 
+    # Return the compressed neighbors of the particle if the current cache
+    # stores them compressed, NULL otherwise.
+    cdef unsigned short* get_compressed_neighbors(self, size_t d_idx) nogil
+
     # Neighbor query function. Returns the list of neighbors for a
     # requested particle. The returned list is assumed to be of type
     # unsigned int to follow the type of the local and global ids.
@@ -349,5 +435,14 @@ cdef class NNPS(NNPSBase):
 
     cpdef spatially_order_particles(self, int pa_index)
 
+    cpdef get_morton_ordered_indices(self, int pa_index, LongArray indices)
+
+    cpdef morton_order_particles(self, int pa_index)
+
+    cpdef double get_locality_metric(self, int pa_index,
+                                     long n_samples=*) except -1
+
+    cdef _align_particles(self, int pa_index, LongArray indices)
+
     # refresh any data structures needed for binning
     cpdef _refresh(self)
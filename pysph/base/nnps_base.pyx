@@ -1,6 +1,7 @@
 #cython: embedsignature=True
 # Library imports.
 import numpy as np
+from timeit import default_timer
 cimport numpy as np
 
 # Cython imports
@@ -9,6 +10,7 @@ from cython.parallel import parallel, prange, threadid
 
 # malloc and friends
 from libc.stdlib cimport malloc, free
+from libc.string cimport memcpy
 from libcpp.map cimport map
 from libcpp.pair cimport pair
 from libcpp.vector cimport vector
@@ -67,6 +69,15 @@ ctypedef pair[unsigned int, unsigned int] id_gid_pair_t
 cdef inline bint _compare_gids(id_gid_pair_t x, id_gid_pair_t y) nogil:
     return y.second > x.second
 
+cdef inline double _nearest_image(double xij, double length) nogil:
+    # Separation to the nearest periodic image, a zero length is not periodic.
+    if length > 0.0:
+        if xij > 0.5*length:
+            return xij - length
+        elif xij < -0.5*length:
+            return xij + length
+    return xij
+
 def py_flatten(IntPoint cid, IntArray ncells_per_dim, int dim):
     """Python wrapper"""
     cdef cIntPoint _cid = cid.data
@@ -214,6 +225,63 @@ cpdef UIntArray arange_uint(int start, int stop=-1):
 
     return arange
 
+def _spread_bits(x):
+    """Insert two zero bits between each of the lower 21 bits of the uint64
+    array `x`, used to interleave the cell indices for a Morton key.
+    """
+    x = x & np.uint64(0x1fffff)
+    for shift, mask in ((32, 0x1f00000000ffff), (16, 0x1f0000ff0000ff),
+                        (8, 0x100f00f00f00f00f), (4, 0x10c30c30c30c30c3),
+                        (2, 0x1249249249249249)):
+        x = (x | (x << np.uint64(shift))) & np.uint64(mask)
+    return x
+
+def _get_ghost_layer_flags(coords, lower, upper, periodic, double width):
+    """Return the ghost layers each particle lies in as bit flags.
+
+    Bits ``2*k`` and ``2*k + 1`` are set when the particle is within `width`
+    of the lower and upper bound along the periodic axis ``k``.
+    """
+    flags = np.zeros(len(coords[0]), dtype=np.int32)
+    for k in range(3):
+        if periodic[k]:
+            flags |= ((coords[k] - lower[k]) <= width).astype(np.int32) << 2*k
+            flags |= ((upper[k] - coords[k]) <= width).astype(np.int32) << (2*k + 1)
+    return flags
+
+def _get_ghost_mapping(flags, periodic, translate):
+    """Return the source particle and the translation of every periodic ghost
+    given the ghost layer flags of the particles.
+
+    Ghosts are created one periodic axis at a time, the ghosts of the
+    previous axes are copied again to fill the corners.
+    """
+    src = np.zeros(0, dtype=np.int64)
+    shift = np.zeros((0, 3))
+    for k in range(3):
+        if not periodic[k]:
+            continue
+        low = (flags & (1 << 2*k)) != 0
+        high = (flags & (1 << (2*k + 1))) != 0
+        disp = np.zeros(3)
+        disp[k] = translate[k]
+
+        corner_low = low[src]
+        corner_high = high[src]
+        srcs = [src, src[corner_low], src[corner_high]]
+        shifts = [shift, shift[corner_low] + disp, shift[corner_high] - disp]
+        if k == 0:
+            srcs.extend([np.where(low)[0], np.where(high)[0]])
+            shifts.extend([[disp], [-disp]])
+        else:
+            srcs.extend([np.where(high)[0], np.where(low)[0]])
+            shifts.extend([[-disp], [disp]])
+        for i in (3, 4):
+            shifts[i] = np.repeat(shifts[i], len(srcs[i]), axis=0)
+        src = np.concatenate(srcs).astype(np.int64)
+        shift = np.concatenate(shifts)
+    return src, shift
+
 ##############################################################################
 cdef class NNPSParticleArrayWrapper:
     def __init__(self, ParticleArray pa):
@@ -243,7 +311,8 @@ cdef class DomainManager:
     def __init__(self, double xmin=-1000, double xmax=1000, double ymin=0,
                  double ymax=0, double zmin=0, double zmax=0,
                  periodic_in_x=False, periodic_in_y=False, periodic_in_z=False,
-                 double n_layers=2.0, backend=None, props=None):
+                 double n_layers=2.0, backend=None, props=None,
+                 virtual_periodic=False):
         """Constructor
 
         Parameters
@@ -259,19 +328,30 @@ cdef class DomainManager:
             Provide a list or dict with the keys as particle array names.
             Only the specified properties are copied.  If not specified,
             all props are copied.
+
+        virtual_periodic: bool: do not create ghost particles for periodic
+            domains. The NNPS finds the neighbors across the periodic
+            boundaries and the generated code uses the nearest periodic
+            image of each neighbor in XIJ. Only supported on the CPU.
         """
         self.backend = get_backend(backend)
         is_periodic = periodic_in_x or periodic_in_y or periodic_in_z
+        kw = {}
         if self.backend is 'opencl' or self.backend is 'cuda':
             from pysph.base.gpu_domain_manager import GPUDomainManager
             domain_manager = GPUDomainManager
+            if virtual_periodic:
+                raise NotImplementedError(
+                    'Virtual periodic images are not supported on the GPU.'
+                )
         else:
             domain_manager = CPUDomainManager
+            kw['virtual_periodic'] = virtual_periodic
         self.manager = domain_manager(
             xmin=xmin, xmax=xmax, ymin=ymin,
             ymax=ymax, zmin=zmin, zmax=zmax, periodic_in_x=periodic_in_x,
             periodic_in_y=periodic_in_y, periodic_in_z=periodic_in_z,
-            n_layers=n_layers, backend=self.backend, props=props
+            n_layers=n_layers, backend=self.backend, props=props, **kw
         )
 
     def set_pa_wrappers(self, wrappers):
@@ -306,7 +386,7 @@ cdef class DomainManagerBase(object):
     def __init__(self, double xmin=-1000, double xmax=1000, double ymin=0,
                  double ymax=0, double zmin=0, double zmax=0,
                  periodic_in_x=False, periodic_in_y=False, periodic_in_z=False,
-                 double n_layers=2.0, props=None):
+                 double n_layers=2.0, props=None, virtual_periodic=False):
         """Constructor
 
         The n_layers argument specifies the number of ghost layers as multiples
@@ -316,6 +396,9 @@ cdef class DomainManagerBase(object):
             Provide a list or dict with the keys as particle array names.
             Only the specified properties are copied.  If not specified,
             all props are copied.
+
+        virtual_periodic: bool: use virtual periodic images of the particles
+            instead of ghost copies.
         """
         self._check_limits(xmin, xmax, ymin, ymax, zmin, zmax)
 
@@ -330,6 +413,7 @@ cdef class DomainManagerBase(object):
         self.periodic_in_z = periodic_in_z
         self.is_periodic = periodic_in_x or periodic_in_y or periodic_in_z
         self.n_layers = n_layers
+        self.virtual_periodic = virtual_periodic and self.is_periodic
 
         # get the translates in each coordinate direction
         self.xtranslate = xmax - xmin
@@ -415,7 +499,8 @@ cdef class CPUDomainManager(DomainManagerBase):
     def __init__(self, double xmin=-1000, double xmax=1000, double ymin=0,
                  double ymax=0, double zmin=0, double zmax=0,
                  periodic_in_x=False, periodic_in_y=False, periodic_in_z=False,
-                 double n_layers=2.0, backend=None, props=None):
+                 double n_layers=2.0, backend=None, props=None,
+                 virtual_periodic=False):
         """Constructor
 
         The n_layers argument specifies the number of ghost layers as multiples
@@ -425,12 +510,16 @@ cdef class CPUDomainManager(DomainManagerBase):
             Provide a list or dict with the keys as particle array names.
             Only the specified properties are copied.  If not specified,
             all props are copied.
+
+        virtual_periodic: bool: use virtual periodic images of the particles
+            instead of ghost copies.
         """
         DomainManagerBase.__init__(
             self, xmin=xmin, xmax=xmax,
             ymin=ymin, ymax=ymax, zmin=zmin, zmax=zmax,
             periodic_in_x=periodic_in_x, periodic_in_y=periodic_in_y,
-            periodic_in_z=periodic_in_z, n_layers=n_layers, props=props
+            periodic_in_z=periodic_in_z, n_layers=n_layers, props=props,
+            virtual_periodic=virtual_periodic
         )
 
         self.use_double = True
@@ -438,6 +527,14 @@ cdef class CPUDomainManager(DomainManagerBase):
         self.dtype_max = np.finfo(self.dtype).max
         self.ghosts = None
 
+        # The ghosts are refreshed in place when the same particles are in
+        # the ghost layers as in the previous update.
+        self.reuse_ghosts = True
+        self._ghost_src = None
+        self._ghost_shift = None
+        self._ghost_flags = None
+        self._n_ghosts = None
+
     #### Public protocol ################################################
     def update(self):
         """General method that is called before NNPS can bin particles.
@@ -447,6 +544,8 @@ cdef class CPUDomainManager(DomainManagerBase):
         boundary conditions.
 
         """
+        cdef bint reuse
+
         # compute the cell sizes
         self._compute_cell_size_for_binning()
 
@@ -457,14 +556,27 @@ cdef class CPUDomainManager(DomainManagerBase):
         if self.is_periodic and not self.in_parallel:
             self._update_from_gpu()
 
-            # remove periodic ghost particles from a previous step
-            self._remove_ghosts()
+            # remove periodic ghost particles from a previous step unless
+            # they may be reused.
+            reuse = (self.reuse_ghosts and not self.virtual_periodic and
+                     self._ghosts_in_place())
+            if not reuse:
+                self._remove_ghosts()
+                self._n_ghosts = None
 
             # box-wrap current particles for periodicity
             self._box_wrap_periodic()
 
-            # create new periodic ghosts
-            self._create_ghosts_periodic()
+            # create new periodic ghosts, the NNPS finds the neighbors
+            # across the boundaries for virtual periodic images.
+            if self.virtual_periodic:
+                self._check_periodic_images()
+            elif reuse and self._ghost_layers_unchanged():
+                self._refresh_ghosts()
+            else:
+                if reuse:
+                    self._remove_ghosts()
+                self._create_ghosts_periodic()
 
             # Update GPU.
             self._update_gpu()
@@ -505,12 +617,17 @@ cdef class CPUDomainManager(DomainManagerBase):
         cdef NNPSParticleArrayWrapper pa_wrapper
         cdef DoubleArray x, y, z
         cdef double xi, yi, zi
-        cdef int i, np
+        cdef int array_index, i, np
 
         # iterate over each array and mark for translation
-        for pa_wrapper in self.pa_wrappers:
+        for array_index in range(self.narrays):
+            pa_wrapper = self.pa_wrappers[array_index]
             x = pa_wrapper.x; y = pa_wrapper.y; z = pa_wrapper.z
+
+            # ghosts kept for reuse are at the end and are not wrapped.
             np = x.length
+            if self._n_ghosts is not None:
+                np -= self._n_ghosts[array_index]
 
             # iterate over particles and box-wrap
             for i in range(np):
@@ -535,6 +652,9 @@ cdef class CPUDomainManager(DomainManagerBase):
         other side of the boundary. Corner reflections need to be
         accounted for when using domains with multiple periodicity.
 
+        The source particle and translation of each ghost are saved so
+        that the ghosts can be refreshed in place by the next update.
+
         The periodic domain is specified using the DomainManager object
 
         """
@@ -548,33 +668,17 @@ cdef class CPUDomainManager(DomainManagerBase):
         cdef double cell_size = self.n_layers * self.cell_size
 
         # periodic domain values
-        cdef double xmin = self.xmin, xmax = self.xmax
-        cdef double ymin = self.ymin, ymax = self.ymax,
-        cdef double zmin = self.zmin, zmax = self.zmax
-
-        cdef double xtranslate = self.xtranslate
-        cdef double ytranslate = self.ytranslate
-        cdef double ztranslate = self.ztranslate
-
-        # periodicity flags
-        cdef bint periodic_in_x = self.periodic_in_x
-        cdef bint periodic_in_y = self.periodic_in_y
-        cdef bint periodic_in_z = self.periodic_in_z
+        lower = (self.xmin, self.ymin, self.zmin)
+        upper = (self.xmax, self.ymax, self.zmax)
+        translate = (self.xtranslate, self.ytranslate, self.ztranslate)
+        periodic = (self.periodic_in_x, self.periodic_in_y,
+                    self.periodic_in_z)
 
         # locals
         cdef NNPSParticleArrayWrapper pa_wrapper
         cdef ParticleArray pa, ghost_pa
-        cdef DoubleArray x, y, z, xt, yt, zt
-        cdef double xi, yi, zi
-        cdef int array_index, i, np, start
-
-        # temporary indices for particles to be replicated
-        cdef LongArray x_low, x_high, y_high, y_low, z_high, z_low, low, high
-
-        x_low = LongArray(); x_high = LongArray()
-        y_high = LongArray(); y_low = LongArray()
-        z_high = LongArray(); z_low = LongArray()
-        low = LongArray(); high = LongArray()
+        cdef int array_index, k
+        cdef LongArray indices = LongArray()
 
         if not self.ghosts:
             self.ghosts = [paw.pa.empty_clone(props=copy_props[i])
@@ -587,136 +691,148 @@ cdef class CPUDomainManager(DomainManagerBase):
                     pa_wrappers[i].pa, props=copy_props[i]
                 )
 
+        self._ghost_src = []
+        self._ghost_shift = []
+        self._ghost_flags = []
+        self._n_ghosts = []
+
         for array_index in range(narrays):
             ghost_pa = self.ghosts[array_index]
             pa_wrapper = pa_wrappers[array_index]
             pa = pa_wrapper.pa
-            x = pa_wrapper.x; y = pa_wrapper.y; z = pa_wrapper.z
-
-            # reset the length of the arrays
-            x_low.reset(); x_high.reset(); y_high.reset(); y_low.reset()
-            z_low.reset(); z_high.reset()
-
-            np = x.length
-            for i in range(np):
-                xi = x.data[i]; yi = y.data[i]; zi = z.data[i]
-
-                if periodic_in_x:
-                    if ( (xi - xmin) <= cell_size ): x_low.append(i)
-                    if ( (xmax - xi) <= cell_size ): x_high.append(i)
-
-                if periodic_in_y:
-                    if ( (yi - ymin) <= cell_size ): y_low.append(i)
-                    if ( (ymax - yi) <= cell_size ): y_high.append(i)
 
-                if periodic_in_z:
-                    if ( (zi - zmin) <= cell_size ): z_low.append(i)
-                    if ( (zmax - zi) <= cell_size ): z_high.append(i)
-
-            # now treat each case separately and append to the main array
-            x = ghost_pa.get_carray('x')
-            y = ghost_pa.get_carray('y')
-            z = ghost_pa.get_carray('z')
-            if periodic_in_x:
-                # x_low
-                start = ghost_pa.get_number_of_particles()
-                pa.extract_particles(
-                    x_low, ghost_pa, align=False, props=copy_props[array_index]
-                )
-                self._add_to_array(ghost_pa.get_carray('x'), xtranslate,
-                                   start=start)
-
-                # x_high
-                start = ghost_pa.get_number_of_particles()
-                pa.extract_particles(
-                    x_high, ghost_pa, align=False, props=copy_props[array_index]
-                )
-                self._add_to_array(ghost_pa.get_carray('x'), -xtranslate,
-                                   start=start)
-
-            if periodic_in_y:
-                # Now do the corners from the previous.
-                low.reset(); high.reset()
-                np = x.length
-                for i in range(np):
-                    yi = y.data[i]
-                    if ( (yi - ymin) <= cell_size ): low.append(i)
-                    if ( (ymax - yi) <= cell_size ): high.append(i)
-
-                start = ghost_pa.get_number_of_particles()
-                ghost_pa.extract_particles(
-                    low, ghost_pa, align=False, props=copy_props[array_index]
-                )
-                self._add_to_array(ghost_pa.get_carray('y'), ytranslate,
-                                   start=start)
+            coords = [pa_wrapper.x.get_npy_array(),
+                      pa_wrapper.y.get_npy_array(),
+                      pa_wrapper.z.get_npy_array()]
+            flags = _get_ghost_layer_flags(
+                coords, lower, upper, periodic, cell_size
+            )
+            src, shift = _get_ghost_mapping(flags, periodic, translate)
+
+            self._ghost_src.append(src)
+            self._ghost_shift.append(shift)
+            self._ghost_flags.append(flags)
+            self._n_ghosts.append(len(src))
+
+            # copy the source particles and translate them
+            indices.resize(len(src))
+            indices.get_npy_array()[:] = src
+            pa.extract_particles(
+                indices, ghost_pa, align=False, props=copy_props[array_index]
+            )
+            for k, name in enumerate(('x', 'y', 'z')):
+                ghost_pa.get_carray(name).get_npy_array()[:] += shift[:, k]
 
-                start = ghost_pa.get_number_of_particles()
-                ghost_pa.extract_particles(
-                    high, ghost_pa, align=False, props=copy_props[array_index]
-                )
-                self._add_to_array(ghost_pa.get_carray('y'), -ytranslate,
-                                   start=start)
-
-                # Add the actual y_high and y_low now.
-                # y_high
-                start = ghost_pa.get_number_of_particles()
-                pa.extract_particles(
-                    y_high, ghost_pa, align=False, props=copy_props[array_index]
-                )
-                self._add_to_array(ghost_pa.get_carray('y'), -ytranslate,
-                                   start=start)
+            ghost_pa.set_num_real_particles(ghost_pa.get_number_of_particles())
+            ghost_pa.tag[:] = Ghost
+            pa.append_parray(ghost_pa, align=False)
 
-                # y_low
-                start = ghost_pa.get_number_of_particles()
-                pa.extract_particles(
-                    y_low, ghost_pa, align=False, props=copy_props[array_index]
-                )
-                self._add_to_array(ghost_pa.get_carray('y'), ytranslate,
-                                   start=start)
-
-            if periodic_in_z:
-                # Now do the corners from the previous.
-                low.reset(); high.reset()
-                np = x.length
-                for i in range(np):
-                    zi = z.data[i]
-                    if ( (zi - zmin) <= cell_size ): low.append(i)
-                    if ( (zmax - zi) <= cell_size ): high.append(i)
-
-                start = ghost_pa.get_number_of_particles()
-                ghost_pa.extract_particles(
-                    low, ghost_pa, align=False, props=copy_props[array_index]
-                )
-                self._add_to_array(ghost_pa.get_carray('z'), ztranslate,
-                                   start=start)
+    cdef bint _ghosts_in_place(self):
+        """Return True if the ghosts created by the previous update are
+        still at the end of the arrays and no other particles were added or
+        removed since.
+        """
+        cdef int array_index
+        cdef long n_real
+        cdef ParticleArray pa
 
-                start = ghost_pa.get_number_of_particles()
-                ghost_pa.extract_particles(
-                    high, ghost_pa, align=False, props=copy_props[array_index]
-                )
-                self._add_to_array(ghost_pa.get_carray('z'), -ztranslate,
-                                   start=start)
-
-                # Add the actual z_high and z_low now.
-                # z_high
-                start = ghost_pa.get_number_of_particles()
-                pa.extract_particles(
-                    z_high, ghost_pa, align=False, props=copy_props[array_index]
-                )
-                self._add_to_array(ghost_pa.get_carray('z'), -ztranslate,
-                                   start=start)
+        if self._n_ghosts is None:
+            return False
+
+        for array_index in range(self.narrays):
+            pa = (<NNPSParticleArrayWrapper>self.pa_wrappers[array_index]).pa
+            n_real = len(self._ghost_flags[array_index])
+            if (pa.get_number_of_particles() !=
+                    n_real + self._n_ghosts[array_index]):
+                return False
+            tag = pa.get_carray('tag').get_npy_array()
+            if np.any(tag[:n_real] == Ghost) or np.any(tag[n_real:] != Ghost):
+                return False
+        return True
+
+    cdef bint _ghost_layers_unchanged(self):
+        """Return True if the real particles in the ghost layers are the same
+        as when the ghosts were created, the ghosts would then be copies of
+        the same particles.
+        """
+        cdef double cell_size = self.n_layers * self.cell_size
+        cdef NNPSParticleArrayWrapper pa_wrapper
+        cdef int array_index
+        cdef long n_real
+
+        lower = (self.xmin, self.ymin, self.zmin)
+        upper = (self.xmax, self.ymax, self.zmax)
+        periodic = (self.periodic_in_x, self.periodic_in_y,
+                    self.periodic_in_z)
+
+        for array_index in range(self.narrays):
+            pa_wrapper = self.pa_wrappers[array_index]
+            n_real = len(self._ghost_flags[array_index])
+            coords = [pa_wrapper.x.get_npy_array()[:n_real],
+                      pa_wrapper.y.get_npy_array()[:n_real],
+                      pa_wrapper.z.get_npy_array()[:n_real]]
+            flags = _get_ghost_layer_flags(
+                coords, lower, upper, periodic, cell_size
+            )
+            if not np.array_equal(flags, self._ghost_flags[array_index]):
+                return False
+        return True
 
-                # z_low
-                start = ghost_pa.get_number_of_particles()
-                pa.extract_particles(
-                    z_low, ghost_pa, align=False, props=copy_props[array_index]
-                )
-                self._add_to_array(ghost_pa.get_carray('z'), ztranslate,
-                                   start=start)
+    cdef _refresh_ghosts(self):
+        """Copy the properties of the source particles to the existing
+        ghosts and translate them, instead of creating the ghosts again.
+        """
+        cdef list copy_props = self.copy_props
+        cdef ParticleArray pa, ghost_pa
+        cdef int array_index, k, stride
+        cdef long n_real
 
-            ghost_pa.set_num_real_particles(ghost_pa.get_number_of_particles())
-            ghost_pa.tag[:] = Ghost
-            pa.append_parray(ghost_pa, align=False)
+        for array_index in range(self.narrays):
+            pa = (<NNPSParticleArrayWrapper>self.pa_wrappers[array_index]).pa
+            ghost_pa = self.ghosts[array_index]
+            ghost_pa.ensure_properties(pa, props=copy_props[array_index])
+            src = self._ghost_src[array_index]
+            shift = self._ghost_shift[array_index]
+            n_real = len(self._ghost_flags[array_index])
+            if len(src) == 0:
+                continue
+
+            for name in pa.properties:
+                if name == 'tag':
+                    continue
+                stride = pa.stride.get(name, 1)
+                data = pa.get_carray(name).get_npy_array()
+                data = data.reshape(-1, stride)
+                if name in ghost_pa.properties:
+                    data[n_real:] = data[src]
+                else:
+                    # properties that are not copied are reset as for newly
+                    # created ghosts.
+                    data[n_real:] = pa.default_values[name]
+
+            for k, name in enumerate(('x', 'y', 'z')):
+                pa.get_carray(name).get_npy_array()[n_real:] += shift[:, k]
+
+    cdef _check_periodic_images(self):
+        """Check that the domain is large enough to use the nearest periodic
+        image of the neighbors.
+
+        A particle may then only be a neighbor of another through a single
+        image, which requires the domain to be longer than twice the cell
+        size along each periodic direction.
+        """
+        cdef double cell_size = self.cell_size
+        lengths = [
+            ('x', self.periodic_in_x, self.xtranslate),
+            ('y', self.periodic_in_y, self.ytranslate),
+            ('z', self.periodic_in_z, self.ztranslate),
+        ]
+        for name, periodic, length in lengths:
+            if periodic and length <= 2.0*cell_size:
+                msg = 'Periodic length along %s (%g) must be larger than '\
+                      'twice the search radius (%g) for virtual periodic '\
+                      'images.' % (name, length, cell_size)
+                raise RuntimeError(msg)
 
     cdef _compute_cell_size_for_binning(self):
         """Compute the cell size for the binning.
@@ -919,6 +1035,60 @@ cdef class Cell:
 
 
 ###############################################################################
+# The compressed neighbors of a particle are stored as a stream of unsigned
+# shorts, the number of neighbors followed by the differences between the
+# sorted neighbor indices.  Values that do not fit in 16 bits are stored as
+# 0xFFFF followed by the lower and upper 16 bits of the value.
+
+cdef inline long _encoded_length(unsigned int* nbrs, long n) nogil:
+    cdef long i
+    cdef long length = 1 if n < 0xFFFF else 3
+    cdef unsigned int prev = 0
+    for i in range(n):
+        length += 1 if nbrs[i] - prev < 0xFFFF else 3
+        prev = nbrs[i]
+    return length
+
+cdef inline long _encode_value(unsigned int value, unsigned short* out) nogil:
+    if value < 0xFFFF:
+        out[0] = value
+        return 1
+    out[0] = 0xFFFF
+    out[1] = value & 0xFFFF
+    out[2] = value >> 16
+    return 3
+
+cdef inline void _encode(unsigned int* nbrs, long n,
+                         unsigned short* out) nogil:
+    cdef long i, pos
+    cdef unsigned int prev = 0
+    pos = _encode_value(n, out)
+    for i in range(n):
+        pos += _encode_value(nbrs[i] - prev, &out[pos])
+        prev = nbrs[i]
+
+cdef inline unsigned int _decode_value(unsigned short* stream,
+                                       long* pos) nogil:
+    cdef unsigned int value = stream[pos[0]]
+    if value == 0xFFFF:
+        value = stream[pos[0] + 1] | (<unsigned int>stream[pos[0] + 2] << 16)
+        pos[0] += 3
+    else:
+        pos[0] += 1
+    return value
+
+cdef inline long _decode(unsigned short* stream, unsigned int* out) nogil:
+    # Decode the neighbors into out if it is not NULL, return the number
+    # of neighbors.
+    cdef long pos = 0
+    cdef long i, n = _decode_value(stream, &pos)
+    cdef unsigned int prev = 0
+    if out != NULL:
+        for i in range(n):
+            prev += _decode_value(stream, &pos)
+            out[i] = prev
+    return n
+
 
 cdef class NeighborCache:
     def __init__(self, NNPS nnps, int dst_index, int src_index):
@@ -958,15 +1128,38 @@ cdef class NeighborCache:
             self._neighbor_arrays.append(_arr)
             self._neighbors[i] = <void*>_arr
 
+        self.csr = False
+        self._csr_built = False
+        self._used = False
+        self._offsets = LongArray()
+        self._indices = UIntArray()
+        self.compress = False
+        self._stream = NULL
+        self._stream_alloc = 0
+
     def __dealloc__(self):
         aligned_free(self._neighbors)
+        free(self._stream)
 
     #### Public protocol ################################################
 
     cdef void get_neighbors_raw(self, size_t d_idx, UIntArray nbrs) nogil:
+        cdef size_t start, end, tid
+        if not self._used:
+            self._used = True
+        if self._csr_built and self.compress:
+            start = self._offsets.data[d_idx]
+            nbrs.c_reset()
+            nbrs.c_resize(_decode(&self._stream[start], NULL))
+            _decode(&self._stream[start], nbrs.data)
+            return
+        if self._csr_built:
+            start = self._offsets.data[d_idx]
+            end = self._offsets.data[d_idx + 1]
+            nbrs.c_set_view(&self._indices.data[start], end - start)
+            return
         if self._cached.data[d_idx] == 0:
             self._find_neighbors(d_idx)
-        cdef size_t start, end, tid
         start = self._start_stop.data[2*d_idx]
         end = self._start_stop.data[2*d_idx + 1]
         tid = self._pid_to_tid.data[d_idx]
@@ -974,6 +1167,13 @@ cdef class NeighborCache:
             &(<UIntArray>self._neighbors[tid]).data[start], end - start
         )
 
+    cdef unsigned short* get_compressed_raw(self, size_t d_idx) nogil:
+        if not self._used:
+            self._used = True
+        if self._csr_built and self.compress:
+            return &self._stream[self._offsets.data[d_idx]]
+        return NULL
+
     cpdef get_neighbors(self, int src_index, size_t d_idx, UIntArray nbrs):
         self.get_neighbors_raw(d_idx, nbrs)
 
@@ -982,12 +1182,109 @@ cdef class NeighborCache:
         cdef long np = \
                 self._particles[self._dst_index].get_number_of_particles()
 
+        if self.csr:
+            if not self._csr_built:
+                self._build_csr()
+            return
+
         with nogil, parallel():
             for d_idx in prange(np):
                 if self._cached.data[d_idx] == 0:
                     self._find_neighbors(d_idx)
 
+    cpdef get_csr(self):
+        """Return the neighbors of all the destination particles as the
+        NumPy arrays ``(offsets, indices)`` in compressed sparse row form.
+        The neighbors of particle ``i`` are
+        ``indices[offsets[i]:offsets[i+1]]``.
+
+        The arrays are built if needed, this assumes that the context of
+        the NNPS is set to this cache. The returned arrays are views of the
+        cache's data and are only valid until the next update.
+        """
+        if not self._csr_built:
+            self._build_csr()
+        if self.compress:
+            return self._decompress()
+        return self._offsets.get_npy_array(), self._indices.get_npy_array()
+
+    cpdef get_compression_stats(self, long n_samples=1048576):
+        """Return a dictionary with the size of the compressed neighbors
+        and the cost of decoding them, or None if they are not compressed.
+
+        The ``ratio`` is the size of the neighbor indices stored as 32 bit
+        integers divided by their compressed size. The ``decode_overhead``
+        is the time taken to decode about `n_samples` neighbors divided by
+        the time taken to read the same neighbors from a plain array.
+        """
+        if not (self.compress and self._csr_built):
+            return None
+        cdef long i, j, n, n_p = self._offsets.length - 1
+        cdef long n_nbrs = 0, n_sample_particles = 0
+        cdef unsigned int prev, check, expect
+        cdef long pos
+        cdef UIntArray plain = UIntArray()
+        cdef unsigned short* stream
+
+        for i in range(n_p):
+            n = _decode(&self._stream[self._offsets.data[i]], NULL)
+            if n_nbrs < n_samples:
+                n_sample_particles += 1
+                plain.c_resize(n_nbrs + n)
+                _decode(&self._stream[self._offsets.data[i]],
+                        &plain.data[n_nbrs])
+            n_nbrs += n
+
+        t_plain = t_decode = 1e100
+        for _ in range(3):
+            start = default_timer()
+            with nogil:
+                expect = 0
+                for j in range(plain.length):
+                    expect += plain.data[j]
+            t_plain = min(t_plain, default_timer() - start)
+
+            start = default_timer()
+            with nogil:
+                check = 0
+                for i in range(n_sample_particles):
+                    stream = &self._stream[self._offsets.data[i]]
+                    pos = 0
+                    n = _decode_value(stream, &pos)
+                    prev = 0
+                    for j in range(n):
+                        prev += _decode_value(stream, &pos)
+                        check += prev
+            t_decode = min(t_decode, default_timer() - start)
+            if check != expect:
+                raise RuntimeError('Corrupt compressed neighbor cache.')
+
+        nbytes = self._offsets.data[n_p]*sizeof(unsigned short)
+        uncompressed = n_nbrs*sizeof(unsigned int)
+        return dict(
+            n_neighbors=n_nbrs, nbytes=nbytes,
+            uncompressed_nbytes=uncompressed,
+            ratio=float(uncompressed)/max(nbytes, 1),
+            decode_overhead=t_decode/max(t_plain, 1e-9)
+        )
+
     cpdef update(self):
+        cdef NNPS nnps = self._nnps
+        cdef NeighborCache current
+        cdef int cur_src, cur_dst
+        if self.csr and self._used:
+            # The neighbors were used since the last update so build the
+            # CSR arrays right away, restoring the context of the NNPS.
+            self._used = False
+            current = nnps.current_cache
+            cur_src, cur_dst = nnps.src_index, nnps.dst_index
+            nnps.set_context(self._src_index, self._dst_index)
+            self._build_csr()
+            if current is not None:
+                nnps.set_context(cur_src, cur_dst)
+            return
+
+        self._csr_built = False
         self._update_last_avg_nbr_size()
         cdef int n_threads = self._n_threads
         cdef int dst_index = self._dst_index
@@ -1035,6 +1332,139 @@ cdef class NeighborCache:
             (<UIntArray>self._neighbors[thread_id]).length
         self._cached.data[d_idx] = 1
 
+    cdef _build_csr(self):
+        """Find the neighbors of all the destination particles in two
+        parallel passes, the first counts the neighbors and the second fills
+        the contiguous array of indices after a prefix sum of the counts.
+        """
+        cdef long d_idx, i
+        cdef long np = \
+                self._particles[self._dst_index].get_number_of_particles()
+        cdef int thread_id
+        cdef UIntArray arr
+        cdef long* offsets
+        cdef unsigned int* indices
+
+        if self.compress:
+            self._build_compressed()
+            return
+
+        self._reset_scratch()
+        self._offsets.resize(np + 1)
+        offsets = self._offsets.data
+        offsets[0] = 0
+        with nogil, parallel():
+            thread_id = threadid()
+            for d_idx in prange(np):
+                (<UIntArray>self._neighbors[thread_id]).c_reset()
+                self._nnps.find_nearest_neighbors(
+                    d_idx, <UIntArray>self._neighbors[thread_id]
+                )
+                offsets[d_idx + 1] = \
+                    (<UIntArray>self._neighbors[thread_id]).length
+
+        for i in range(np):
+            offsets[i + 1] += offsets[i]
+
+        self._indices.resize(offsets[np])
+        indices = self._indices.data
+        with nogil, parallel():
+            thread_id = threadid()
+            for d_idx in prange(np):
+                (<UIntArray>self._neighbors[thread_id]).c_reset()
+                self._nnps.find_nearest_neighbors(
+                    d_idx, <UIntArray>self._neighbors[thread_id]
+                )
+                memcpy(
+                    &indices[offsets[d_idx]],
+                    (<UIntArray>self._neighbors[thread_id]).data,
+                    sizeof(unsigned int)*(offsets[d_idx + 1] - offsets[d_idx])
+                )
+        self._csr_built = True
+
+    cdef _build_compressed(self):
+        """Build the CSR arrays like _build_csr but store the sorted
+        neighbors of each particle delta encoded in 16 bit values.
+        """
+        cdef long d_idx, i, n
+        cdef long np = \
+                self._particles[self._dst_index].get_number_of_particles()
+        cdef int thread_id
+        cdef unsigned int* data
+        cdef long* offsets
+        cdef unsigned short* stream
+
+        self._reset_scratch()
+        self._indices = UIntArray()
+        self._offsets.resize(np + 1)
+        offsets = self._offsets.data
+        offsets[0] = 0
+        with nogil, parallel():
+            thread_id = threadid()
+            for d_idx in prange(np):
+                (<UIntArray>self._neighbors[thread_id]).c_reset()
+                self._nnps.find_nearest_neighbors(
+                    d_idx, <UIntArray>self._neighbors[thread_id]
+                )
+                data = (<UIntArray>self._neighbors[thread_id]).data
+                n = (<UIntArray>self._neighbors[thread_id]).length
+                sort(data, data + n)
+                offsets[d_idx + 1] = _encoded_length(data, n)
+
+        for i in range(np):
+            offsets[i + 1] += offsets[i]
+
+        if offsets[np] > self._stream_alloc:
+            free(self._stream)
+            self._stream_alloc = offsets[np]
+            self._stream = <unsigned short*>malloc(
+                sizeof(unsigned short)*self._stream_alloc
+            )
+            if self._stream == NULL:
+                self._stream_alloc = 0
+                raise MemoryError('Unable to allocate the neighbor cache.')
+        stream = self._stream
+        with nogil, parallel():
+            thread_id = threadid()
+            for d_idx in prange(np):
+                (<UIntArray>self._neighbors[thread_id]).c_reset()
+                self._nnps.find_nearest_neighbors(
+                    d_idx, <UIntArray>self._neighbors[thread_id]
+                )
+                data = (<UIntArray>self._neighbors[thread_id]).data
+                n = (<UIntArray>self._neighbors[thread_id]).length
+                sort(data, data + n)
+                _encode(data, n, &stream[offsets[d_idx]])
+        self._csr_built = True
+
+    cdef _reset_scratch(self):
+        # Fresh per-thread scratch arrays, these only ever grow to the
+        # largest number of neighbors of a particle.
+        cdef UIntArray arr
+        cdef int i
+        for i in range(self._n_threads):
+            arr = UIntArray()
+            self._neighbor_arrays[i] = arr
+            self._neighbors[i] = <void*>arr
+
+    cdef _decompress(self):
+        cdef long i, n_p = self._offsets.length - 1
+        cdef np.ndarray[np.int64_t, ndim=1] offsets = np.zeros(
+            n_p + 1, dtype=np.int64
+        )
+        for i in range(n_p):
+            offsets[i + 1] = offsets[i] + _decode(
+                &self._stream[self._offsets.data[i]], NULL
+            )
+        cdef np.ndarray[np.uint32_t, ndim=1] indices = np.empty(
+            offsets[n_p], dtype=np.uint32
+        )
+        for i in range(n_p):
+            if offsets[i + 1] > offsets[i]:
+                _decode(&self._stream[self._offsets.data[i]],
+                        &indices[offsets[i]])
+        return offsets, indices
+
 
 ##############################################################################
 cdef class NNPSBase:
@@ -1190,6 +1620,138 @@ cdef class NNPSBase:
                 src_index, dst_index, d_idx, nbrs, False
             )
 
+    def get_all_neighbors(self, int src_index, int dst_index, indices=None,
+                          bint distances=False):
+        """Find the neighbors of many destination particles at once.
+
+        The search is done in parallel without the GIL and is much faster
+        than calling :py:meth:`get_nearest_particles` for each particle.
+
+        Parameters
+        ----------
+
+        src_index: int
+            Index of the particle array to which the neighbors belong.
+
+        dst_index: int
+            Index of the particle array of the query particles.
+
+        indices: array of ints or None
+            Indices of the query particles, all particles if None.
+
+        distances: bool
+            Also return the distance to each neighbor.
+
+        Returns
+        -------
+
+        offsets, nbrs[, dists]: NumPy arrays in compressed sparse row form,
+            the neighbors of the i'th query particle are
+            ``nbrs[offsets[i]:offsets[i+1]]`` and ``dists`` has the
+            corresponding distances.
+        """
+        cdef long n_dst = self.particles[dst_index].get_number_of_particles()
+        cdef np.ndarray[np.uint32_t, ndim=1] query
+        if indices is None:
+            query = np.arange(n_dst, dtype=np.uint32)
+        else:
+            query = np.ascontiguousarray(indices, dtype=np.uint32)
+            if query.size > 0 and query.max() >= n_dst:
+                raise IndexError(
+                    'Particle index out of range for %s particles.' % n_dst
+                )
+
+        cdef long i, n = query.shape[0]
+        cdef int thread_id, n_threads = get_number_of_threads()
+        cdef unsigned int* q = <unsigned int*>query.data
+        cdef np.ndarray[np.int64_t, ndim=1] offsets = np.zeros(
+            n + 1, dtype=np.int64
+        )
+        cdef np.int64_t* off = <np.int64_t*>offsets.data
+        cdef NNPSParticleArrayWrapper src = self.pa_wrappers[src_index]
+        cdef NNPSParticleArrayWrapper dst = self.pa_wrappers[dst_index]
+        cdef np.ndarray[np.uint32_t, ndim=1] nbrs
+        cdef np.ndarray[np.float64_t, ndim=1] dists
+        cdef unsigned int* nbr_data
+        cdef double* dist_data
+        cdef double* xs = src.x.data
+        cdef double* ys = src.y.data
+        cdef double* zs = src.z.data
+        cdef double* xd = dst.x.data
+        cdef double* yd = dst.y.data
+        cdef double* zd = dst.z.data
+        cdef long j, start, length
+        cdef unsigned int s_idx, d_idx
+        cdef double xij, yij, zij
+
+        # With virtual periodic images the neighbors may be found through
+        # an image so the distance is to the nearest image.
+        cdef double xlen = 0.0, ylen = 0.0, zlen = 0.0
+        manager = self.domain.manager
+        if manager.virtual_periodic:
+            if manager.periodic_in_x:
+                xlen = manager.xtranslate
+            if manager.periodic_in_y:
+                ylen = manager.ytranslate
+            if manager.periodic_in_z:
+                zlen = manager.ztranslate
+
+        # Per-thread scratch arrays for the neighbors of one particle.
+        arrays = [UIntArray() for i in range(n_threads)]
+        cdef void** scratch = <void**>aligned_malloc(sizeof(void*)*n_threads)
+        for i in range(n_threads):
+            scratch[i] = <void*>arrays[i]
+
+        try:
+            self.set_context(src_index, dst_index)
+            with nogil, parallel():
+                thread_id = threadid()
+                for i in prange(n):
+                    (<UIntArray>scratch[thread_id]).c_reset()
+                    self.find_nearest_neighbors(
+                        q[i], <UIntArray>scratch[thread_id]
+                    )
+                    off[i + 1] = (<UIntArray>scratch[thread_id]).length
+
+            for i in range(n):
+                off[i + 1] += off[i]
+
+            nbrs = np.empty(off[n], dtype=np.uint32)
+            dists = np.empty(off[n] if distances else 0, dtype=np.float64)
+            nbr_data = <unsigned int*>nbrs.data
+            dist_data = <double*>dists.data
+            with nogil, parallel():
+                thread_id = threadid()
+                for i in prange(n):
+                    (<UIntArray>scratch[thread_id]).c_reset()
+                    self.find_nearest_neighbors(
+                        q[i], <UIntArray>scratch[thread_id]
+                    )
+                    start = off[i]
+                    length = off[i + 1] - start
+                    memcpy(
+                        &nbr_data[start],
+                        (<UIntArray>scratch[thread_id]).data,
+                        sizeof(unsigned int)*length
+                    )
+                    if distances:
+                        d_idx = q[i]
+                        for j in range(length):
+                            s_idx = nbr_data[start + j]
+                            xij = _nearest_image(xd[d_idx] - xs[s_idx], xlen)
+                            yij = _nearest_image(yd[d_idx] - ys[s_idx], ylen)
+                            zij = _nearest_image(zd[d_idx] - zs[s_idx], zlen)
+                            dist_data[start + j] = sqrt(
+                                xij*xij + yij*yij + zij*zij
+                            )
+        finally:
+            aligned_free(scratch)
+
+        if distances:
+            return offsets, nbrs, dists
+        else:
+            return offsets, nbrs
+
     cpdef set_context(self, int src_index, int dst_index):
         """Setup the context before asking for neighbors.  The `dst_index`
         represents the particles for whom the neighbors are to be determined
@@ -1225,6 +1787,28 @@ cdef class NNPS(NNPSBase):
         self.xmax = DoubleArray(3)
         self._last_domain_size = 0.0
 
+        # Verlet skin, disabled by default.
+        self.kernel_radius_scale = radius_scale
+        self.skin = 0.0
+        self.n_rebuilds = 0
+        self.n_reuses = 0
+        self._skin_reference = []
+        self._skin_hmin = 0.0
+        self._skin_valid = False
+
+        # Incremental updates, disabled by default.
+        self.incremental = False
+        self.n_static_skips = 0
+
+        # Binning is done in parallel when OpenMP is available.
+        self.parallel_bin = True
+
+        # Virtual periodic images, see `_setup_periodic_images`.
+        self.image_shifts = DoubleArray()
+        self.n_images = 0
+        if self.domain.manager.virtual_periodic:
+            self._setup_periodic_images()
+
         # The cache.
         self.use_cache = cache
         _cache = []
@@ -1244,6 +1828,118 @@ cdef class NNPS(NNPSBase):
             for cache in self.cache:
                 cache.update()
 
+    def set_csr_cache(self, bint csr):
+        """Store the cached neighbors contiguously in destination order.
+
+        When enabled, the caches that were used since the last
+        :py:meth:`update` find the neighbors of all particles in two
+        parallel passes and store them in one compressed sparse row (CSR)
+        array instead of the per-thread arrays. This uses memory in
+        proportion to the actual number of neighbors and allows the
+        neighbors to be exported cheaply with :py:meth:`get_neighbor_csr`.
+        This enables the neighbor cache.
+        """
+        for cache in self.cache:
+            cache.csr = csr
+        if csr:
+            self.set_use_cache(True)
+
+    def set_cache_compression(self, bint compress):
+        """Store the cached neighbors compressed.
+
+        The neighbors of each particle are sorted and stored as differences
+        between consecutive indices in 16 bit values, which takes about half
+        the memory of the regular cache when the particles are spatially
+        ordered. The compiled equations decode the neighbors as they iterate
+        over them. This implies :py:meth:`set_csr_cache` and cannot be used
+        with ``sort_gids`` as the neighbors are ordered by their index.
+        """
+        if compress and self.sort_gids:
+            raise ValueError(
+                'Compressing the neighbor cache is not supported with sort_gids.'
+            )
+        for cache in self.cache:
+            cache.compress = compress
+        if compress:
+            self.set_csr_cache(True)
+
+    def get_cache_compression_stats(self):
+        """Return the compression ratio and decode overhead of the
+        compressed neighbor caches that are in use, see
+        :py:meth:`NeighborCache.get_compression_stats`. Returns None if no
+        cache is compressed.
+        """
+        stats = [x.get_compression_stats() for x in self.cache]
+        stats = [x for x in stats if x is not None and x['n_neighbors'] > 0]
+        if len(stats) == 0:
+            return None
+        n_neighbors = sum(x['n_neighbors'] for x in stats)
+        nbytes = sum(x['nbytes'] for x in stats)
+        uncompressed = sum(x['uncompressed_nbytes'] for x in stats)
+        overhead = sum(
+            x['decode_overhead']*x['n_neighbors'] for x in stats
+        )/n_neighbors
+        return dict(
+            n_neighbors=n_neighbors, nbytes=nbytes,
+            uncompressed_nbytes=uncompressed,
+            ratio=float(uncompressed)/max(nbytes, 1),
+            decode_overhead=overhead
+        )
+
+    def get_neighbor_csr(self, int src_index, int dst_index):
+        """Return the neighbors in `src_index` of all the particles in
+        `dst_index` as the NumPy arrays ``(offsets, indices)``.
+
+        The neighbors of particle ``i`` are
+        ``indices[offsets[i]:offsets[i+1]]``, the arrays are only valid
+        until the next call to :py:meth:`update`.
+        """
+        self.set_context(src_index, dst_index)
+        cdef NeighborCache cache = self.current_cache
+        if not self.use_cache:
+            cache._csr_built = False
+        return cache.get_csr()
+
+    def set_skin(self, double skin):
+        """Use a Verlet skin when searching for neighbors.
+
+        The search radius is enlarged by a factor of ``(1 + skin)`` and the
+        cached neighbors are retained by subsequent calls to
+        :py:meth:`update` until the particles have moved (or their
+        smoothing lengths have grown) by more than half the skin. This
+        requires the neighbor cache which is enabled if the skin is
+        non-zero.
+
+        Parameters
+        ----------
+
+        skin: double: thickness of the skin as a fraction of the kernel
+            radius, a value of zero disables the skin.
+        """
+        if skin < 0.0:
+            raise ValueError('The skin must be non-negative, got %s' % skin)
+        self.skin = skin
+        self.radius_scale = self.kernel_radius_scale*(1.0 + skin)
+        self.domain.set_radius_scale(self.radius_scale)
+        self._skin_valid = False
+        if skin > 0.0:
+            self.set_use_cache(True)
+
+        self.domain.update()
+        self.update()
+
+    def set_incremental(self, bint incremental):
+        """Only rebin the particles that moved to a different cell when
+        updating.
+
+        Arrays whose particles have not moved at all, for example fixed
+        walls, are skipped entirely. A full binning is done when the number
+        of particles, the cell size or the bounds of the domain change. This
+        is only supported by some of the NNPS algorithms and is ignored by
+        the others.
+        """
+        self.incremental = incremental
+
     def update_domain(self):
         self.domain.update()
 
@@ -1260,6 +1956,13 @@ cdef class NNPS(NNPSBase):
         For serial runs, this method should be called when the
         particles have moved.
 
+        If a Verlet skin is set (see :py:meth:`set_skin`) and the particles
+        have not moved sufficiently since the last time the neighbors were
+        found, the binning is skipped and the cached neighbors are reused.
+
+        If incremental updates are enabled (see :py:meth:`set_incremental`),
+        only the particles that changed cells are rebinned.
+
         """
         cdef int i, num_particles
         cdef ParticleArray pa
@@ -1267,27 +1970,40 @@ cdef class NNPS(NNPSBase):
 
         cdef DomainManager domain = self.domain
 
+        if self.skin > 0.0 and self.use_cache:
+            if self._can_reuse_neighbors():
+                self.n_reuses += 1
+                return
+
         # use cell sizes computed by the domain.
         self.cell_size = domain.manager.cell_size
         self.hmin = domain.manager.hmin
 
         # compute bounds and refresh the data structure
         self._compute_bounds()
-        self._refresh()
+        if not (self.incremental and self._update_incremental()):
+            self._refresh()
 
-        # indices on which to bin. We bin all local particles
-        for i in range(self.narrays):
-            pa = self.particles[i]
-            num_particles = pa.get_number_of_particles()
-            indices = arange_uint(num_particles)
+            # indices on which to bin. We bin all local particles
+            for i in range(self.narrays):
+                pa = self.particles[i]
+                num_particles = pa.get_number_of_particles()
+                indices = arange_uint(num_particles)
 
-            # bin the particles
-            self._bin( pa_index=i, indices=indices )
+                # bin the particles
+                self._bin( pa_index=i, indices=indices )
+
+            if self.incremental:
+                self._save_incremental_state()
 
         if self.use_cache:
             for cache in self.cache:
                 cache.update()
 
+        self.n_rebuilds += 1
+        if self.skin > 0.0:
+            self._save_skin_reference()
+
     cdef void get_nearest_neighbors(self, size_t d_idx, UIntArray nbrs) nogil:
         if self.use_cache:
             self.current_cache.get_neighbors_raw(d_idx, nbrs)
@@ -1295,6 +2011,11 @@ cdef class NNPS(NNPSBase):
             nbrs.c_reset()
             self.find_nearest_neighbors(d_idx, nbrs)
 
+    cdef unsigned short* get_compressed_neighbors(self, size_t d_idx) nogil:
+        if self.use_cache:
+            return self.current_cache.get_compressed_raw(d_idx)
+        return NULL
+
     #### Private protocol ################################################
     cdef _compute_bounds(self):
         """Compute coordinate bounds for the particles"""
@@ -1353,6 +2074,90 @@ cdef class NNPS(NNPSBase):
         self.xmin.set_data(np.asarray([xmin, ymin, zmin]))
         self.xmax.set_data(np.asarray([xmax, ymax, zmax]))
 
+    cdef bint _can_reuse_neighbors(self):
+        """Return True if the neighbors found at the last rebuild are valid.
+
+        A pair within the kernel radius must have been within the enlarged
+        radius at the last rebuild. This is guaranteed if no particles were
+        added or removed and twice the maximum displacement plus the
+        maximum increase in the kernel radius is less than the skin.
+
+        """
+        cdef int i
+        cdef long j, n
+        cdef NNPSParticleArrayWrapper pa_wrapper
+        cdef DoubleArray x, y, z, h, x0, y0, z0, h0
+        cdef double dx, dy, dz, dh, disp2
+        cdef double max_disp2 = 0.0, max_dh = 0.0
+        cdef double allowed
+
+        if not self._skin_valid or self.domain.manager.in_parallel:
+            return False
+
+        for i in range(self.narrays):
+            pa_wrapper = self.pa_wrappers[i]
+            x = pa_wrapper.x; y = pa_wrapper.y
+            z = pa_wrapper.z; h = pa_wrapper.h
+            x0, y0, z0, h0 = self._skin_reference[i]
+            n = x.length
+            if n != x0.length:
+                return False
+
+            for j in range(n):
+                dx = x.data[j] - x0.data[j]
+                dy = y.data[j] - y0.data[j]
+                dz = z.data[j] - z0.data[j]
+                disp2 = dx*dx + dy*dy + dz*dz
+                if disp2 > max_disp2:
+                    max_disp2 = disp2
+                dh = h.data[j] - h0.data[j]
+                if dh > max_dh:
+                    max_dh = dh
+
+        allowed = self.kernel_radius_scale*(self.skin*self._skin_hmin - max_dh)
+        return 2.0*sqrt(max_disp2) < allowed
+
+    cdef bint _update_incremental(self) except -1:
+        """Rebin only the particles that moved. Subclasses that support
+        this should return True if the update was done.
+        """
+        return False
+
+    cdef _save_incremental_state(self):
+        pass
+
+    cdef _save_skin_reference(self):
+        """Save the positions and smoothing lengths of the particles."""
+        cdef int i, k
+        cdef long j, n
+        cdef NNPSParticleArrayWrapper pa_wrapper
+        cdef DoubleArray src, dst
+        cdef double hmin = 1e100
+
+        if len(self._skin_reference) != self.narrays:
+            self._skin_reference = [
+                (DoubleArray(), DoubleArray(), DoubleArray(), DoubleArray())
+                for i in range(self.narrays)
+            ]
+
+        for i in range(self.narrays):
+            pa_wrapper = self.pa_wrappers[i]
+            current = (pa_wrapper.x, pa_wrapper.y, pa_wrapper.z, pa_wrapper.h)
+            for k in range(4):
+                src = current[k]
+                dst = self._skin_reference[i][k]
+                n = src.length
+                dst.resize(n)
+                for j in range(n):
+                    dst.data[j] = src.data[j]
+
+            if pa_wrapper.h.length > 0:
+                pa_wrapper.h.update_min_max()
+                hmin = fmin(hmin, pa_wrapper.h.minimum)
+
+        self._skin_hmin = hmin
+        self._skin_valid = True
+
     cdef void _sort_neighbors(self, unsigned int* nbrs, size_t length,
                               unsigned int *gids) nogil:
         if length == 0:
@@ -1388,6 +2193,45 @@ cdef class NNPS(NNPSBase):
     cpdef _bin(self, int pa_index, UIntArray indices):
         raise NotImplementedError("NNPS :: _bin called")
 
+    cdef bint _supports_periodic_images(self):
+        return False
+
+    def _setup_periodic_images(self):
+        """Setup the shifts of the virtual periodic images of a particle.
+
+        With virtual periodic domains no ghost particles are created, the
+        neighbors of a particle near a periodic boundary are also searched
+        for around its images shifted by the periodic lengths.
+        """
+        if not self._supports_periodic_images():
+            msg = '%s does not support virtual periodic images.' % (
+                self.__class__.__name__
+            )
+            raise NotImplementedError(msg)
+        manager = self.domain.manager
+        shifts = []
+        for periodic, length in ((manager.periodic_in_x, manager.xtranslate),
+                                 (manager.periodic_in_y, manager.ytranslate),
+                                 (manager.periodic_in_z, manager.ztranslate)):
+            shifts.append([0.0, -length, length] if periodic else [0.0])
+        images = [(dx, dy, dz) for dx in shifts[0] for dy in shifts[1]
+                  for dz in shifts[2]]
+        # The first image is the particle itself.
+        images = images[1:]
+        self.n_images = len(images)
+        self.image_shifts.resize(3*self.n_images)
+        for i, image in enumerate(images):
+            for k in range(3):
+                self.image_shifts.data[3*i + k] = image[k]
+
+    cdef bint _use_parallel_bin(self, long n):
+        """Return True if `n` particles are to be binned using all the OpenMP
+        threads, small arrays are binned serially. The parallel binning
+        produces the same data as the serial one.
+        """
+        return self.parallel_bin and n >= PARALLEL_MIN_SIZE and \
+            get_number_of_threads() > 1
+
     cpdef _refresh(self):
         raise NotImplementedError("NNPS :: _refresh called")
 
@@ -1399,8 +2243,71 @@ cdef class NNPS(NNPSBase):
         nearer each other.  This may improve pre-fetching on the CPU.
         """
         cdef LongArray indices = LongArray()
-        cdef ParticleArray pa = self.pa_wrappers[pa_index].pa
         self.get_spatially_ordered_indices(pa_index, indices)
+        self._align_particles(pa_index, indices)
+
+    cpdef get_morton_ordered_indices(self, int pa_index, LongArray indices):
+        """Set `indices` to the particle indices sorted along a Z-order
+        (Morton) curve through the cells of the NNPS.
+        """
+        cdef NNPSParticleArrayWrapper pa_wrapper = self.pa_wrappers[pa_index]
+        cdef double cell_size = self.cell_size
+        if cell_size <= 0.0:
+            cell_size = 1.0
+        cdef int k
+        cdef np.ndarray key = np.zeros(
+            pa_wrapper.get_number_of_particles(), dtype=np.uint64
+        )
+        coords = [pa_wrapper.x.get_npy_array(), pa_wrapper.y.get_npy_array(),
+                  pa_wrapper.z.get_npy_array()]
+        for k in range(self.dim):
+            cid = np.floor((coords[k] - self.xmin.data[k])/cell_size)
+            cid = np.clip(cid, 0, 2**21 - 1).astype(np.uint64)
+            key |= _spread_bits(cid) << np.uint64(k)
+        indices.resize(key.size)
+        indices.get_npy_array()[:] = np.argsort(key, kind='mergesort')
+
+    cpdef morton_order_particles(self, int pa_index):
+        """Order the particles along a Z-order curve, see
+        :py:meth:`get_morton_ordered_indices`.
+        """
+        cdef LongArray indices = LongArray()
+        self.get_morton_ordered_indices(pa_index, indices)
+        self._align_particles(pa_index, indices)
+
+    cpdef double get_locality_metric(self, int pa_index,
+                                     long n_samples=1000) except -1:
+        """Return the average distance between the indices of particles and
+        their neighbors in the same array.
+
+        This is a cheap measure of the memory locality of the neighbor
+        accesses, the neighbors of about `n_samples` particles (evenly
+        strided) are used. Smaller values are better, the value increases
+        as the particles mix and is reduced by spatially ordering them.
+        """
+        cdef UIntArray nbrs = UIntArray()
+        cdef NNPSParticleArrayWrapper pa_wrapper = self.pa_wrappers[pa_index]
+        cdef long n = pa_wrapper.get_number_of_particles()
+        cdef long i, j, step
+        cdef long count = 0
+        cdef double total = 0.0
+
+        if n == 0 or n_samples <= 0:
+            return 0.0
+        step = max(n//n_samples, 1)
+        self.set_context(pa_index, pa_index)
+        for i in range(0, n, step):
+            nbrs.c_reset()
+            self.find_nearest_neighbors(i, nbrs)
+            for j in range(nbrs.length):
+                total += fabs(<double>nbrs.data[j] - <double>i)
+            count += nbrs.length
+        if count == 0:
+            return 0.0
+        return total/count
+
+    cdef _align_particles(self, int pa_index, LongArray indices):
+        cdef ParticleArray pa = self.pa_wrappers[pa_index].pa
         cdef BaseArray arr
 
         for name, arr in pa.properties.items():
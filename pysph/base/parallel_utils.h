@@ -0,0 +1,60 @@
+#ifndef PARALLEL_UTILS_H
+#define PARALLEL_UTILS_H
+#include <algorithm>
+
+#ifdef _OPENMP
+    #include <omp.h>
+#endif
+
+// Smaller inputs are processed serially as the threads cost more than they
+// save.
+#define PARALLEL_MIN_SIZE 16384
+
+inline int get_max_threads()
+{
+#ifdef _OPENMP
+    return omp_get_max_threads();
+#else
+    return 1;
+#endif
+}
+
+// Sort the data in place, using all the OpenMP threads if parallel is true.
+// Each thread sorts a chunk of the data and the chunks are then merged
+// pairwise, level by level. For distinct values the result is the same as
+// that of std::sort.
+template <typename T>
+inline void parallel_sort(T* data, long n, bool parallel)
+{
+    long n_chunks = get_max_threads();
+    if(!parallel || n_chunks < 2)
+    {
+        std::sort(data, data + n);
+        return;
+    }
+
+    long chunk = (n + n_chunks - 1)/n_chunks;
+
+    #pragma omp parallel for schedule(static)
+    for(long c=0; c<n_chunks; c++)
+    {
+        long start = std::min(c*chunk, n);
+        long end = std::min(start + chunk, n);
+        std::sort(data + start, data + end);
+    }
+
+    for(long width=chunk; width<n; width*=2)
+    {
+        long n_merges = (n + 2*width - 1)/(2*width);
+        #pragma omp parallel for schedule(static)
+        for(long m=0; m<n_merges; m++)
+        {
+            long start = 2*m*width;
+            long mid = std::min(start + width, n);
+            long end = std::min(start + 2*width, n);
+            std::inplace_merge(data + start, data + mid, data + end);
+        }
+    }
+}
+
+#endif
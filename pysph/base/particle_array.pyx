@@ -1366,12 +1366,11 @@ cdef class ParticleArray:
             >>> pa.copy_over_properties(props = {'x':'x0', 'y':'y0'}
 
         """
-        cdef DoubleArray dst, src
+        cdef BaseArray dst, src
         cdef str prop
         cdef int stride
 
         cdef long np = self.get_number_of_particles()
-        cdef long i
 
         for prop in props:
 
@@ -1379,24 +1378,22 @@ cdef class ParticleArray:
             dst = self.get_carray(props[prop])
             stride = self.stride.get(prop, 1)
 
-            for i in range(np*stride):
-                dst.data[i] = src.data[i]
+            # The arrays may be of different types, for example with single
+            # precision storage.
+            dst.get_npy_array()[:np*stride] = src.get_npy_array()[:np*stride]
 
     cpdef set_to_zero(self, list props):
 
         cdef long np = self.get_number_of_particles()
-        cdef long i
         cdef int stride
 
-        cdef DoubleArray prop_arr
+        cdef BaseArray prop_arr
         cdef str prop
 
         for prop in props:
             prop_arr = self.get_carray(prop)
             stride = self.stride.get(prop, 1)
-
-            for i in range(np*stride):
-                prop_arr.data[i] = 0.0
+            prop_arr.get_npy_array()[:np*stride] = 0.0
 
     cpdef set_pid(self, int pid):
         """Set the processor id for all particles """
@@ -1417,6 +1414,31 @@ cdef class ParticleArray:
         if self.gpu is not None:
             return self.gpu.remove_prop(prop_name)
 
+    def set_property_type(self, str prop_name, str type):
+        """Change the data type of the property, retaining its values.
+
+        Parameters
+        ----------
+
+        prop_name : str
+            name of the property.
+        type : str
+            the new data type of the property ('double', 'float' etc.)
+
+        """
+        cdef BaseArray arr, old_arr
+        old_arr = self.properties[prop_name]
+        if old_arr.get_c_type() == type:
+            return
+        if self.gpu is not None and self.backend is not 'cython':
+            raise NotImplementedError(
+                'Cannot change the type of a property on the GPU.'
+            )
+        arr = self._create_carray(type, 0)
+        arr.resize(old_arr.length)
+        arr.get_npy_array()[:] = old_arr.get_npy_array()
+        self.properties[prop_name] = arr
+
     def update_min_max(self, props=None):
         """Update the min,max values of all properties """
         if self.gpu is not None and self.backend is not 'cython':
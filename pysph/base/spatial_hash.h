@@ -5,6 +5,8 @@
 #include <algorithm>
 #include <cmath>
 
+#include "parallel_utils.h"
+
  // p1, p2 and p3 are large primes used in the hash function
  // Ref. http://citeseerx.ist.psu.edu/viewdoc/download?doi=10.1.1.105.6732&rep=rep1&type=pdf
 
@@ -98,6 +100,32 @@ public:
         }
     }
 
+    // Add the n particles idx given their cells using all the OpenMP
+    // threads, h is indexed by the particle. Each thread adds the particles
+    // of the buckets it owns in the given order so the table is the same as
+    // the one got by calling add for each particle in turn.
+    void add_all_parallel(long n, int* c_x, int* c_y, int* c_z,
+            unsigned int* idx, double* h)
+    {
+        #pragma omp parallel
+        {
+#ifdef _OPENMP
+            long long int n_threads = omp_get_num_threads();
+            long long int thread_id = omp_get_thread_num();
+#else
+            long long int n_threads = 1;
+            long long int thread_id = 0;
+#endif
+            long long int key;
+            for(long p=0; p<n; p++)
+            {
+                key = this->hash(c_x[p], c_y[p], c_z[p]);
+                if(((key % n_threads) + n_threads) % n_threads == thread_id)
+                    this->add(c_x[p], c_y[p], c_z[p], idx[p], h[idx[p]]);
+            }
+        }
+    }
+
     HashEntry* get(int i, int j, int k)
     {
         long long int key = this->hash(i,j,k);
@@ -12,6 +12,8 @@ cdef extern from "spatial_hash.h":
     cdef cppclass HashTable:
         HashTable(long long int) nogil except +
         void add(int, int, int, int, double) nogil
+        void add_all_parallel(long, int*, int*, int*, unsigned int*,
+                double*) nogil
         HashEntry* get(int, int, int) nogil
 
 # NNPS using Spatial Hashing algorithm
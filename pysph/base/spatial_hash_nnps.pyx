@@ -4,6 +4,8 @@
 from libc.stdlib cimport malloc, free
 from libcpp.vector cimport vector
 
+from cython.parallel import prange
+
 # Cython for compiler directives
 cimport cython
 
@@ -14,6 +16,38 @@ IF UNAME_SYSNAME == "Windows":
         return x if x > y else y
 
 
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef _add_all_parallel(HashTable* table, NNPSParticleArrayWrapper pa_wrapper,
+        UIntArray indices, double* xmin, double cell_size):
+    """Add the given particles to the hash table using all the threads.
+
+    The cells are found in parallel and the particles are then added to the
+    table in the same order as when binning serially.
+    """
+    cdef double* x = pa_wrapper.x.data
+    cdef double* y = pa_wrapper.y.data
+    cdef double* z = pa_wrapper.z.data
+    cdef long n = indices.length
+    cdef long i
+    cdef unsigned int idx
+
+    cdef IntArray cells = IntArray(3*n)
+    cdef int* c_x = cells.data
+    cdef int* c_y = c_x + n
+    cdef int* c_z = c_y + n
+
+    for i in prange(n, nogil=True):
+        idx = indices.data[i]
+        c_x[i] = real_to_int(x[idx] - xmin[0], cell_size)
+        c_y[i] = real_to_int(y[idx] - xmin[1], cell_size)
+        c_z[i] = real_to_int(z[idx] - xmin[2], cell_size)
+
+    with nogil:
+        table.add_all_parallel(n, c_x, c_y, c_z, indices.data,
+                               pa_wrapper.h.data)
+
+
 #############################################################################
 cdef class SpatialHashNNPS(NNPS):
 
@@ -201,6 +235,11 @@ cdef class SpatialHashNNPS(NNPS):
         cdef unsigned int i
         cdef unsigned int idx
 
+        if self._use_parallel_bin(num_indices):
+            _add_all_parallel(self.hashtable[pa_index], pa_wrapper, indices,
+                              xmin, self.cell_size)
+            return
+
         for i from 0<=i<num_indices:
             idx = indices.data[i]
             find_cell_id_raw(
@@ -483,6 +522,11 @@ cdef class ExtendedSpatialHashNNPS(NNPS):
 
         self.h_sub = self.cell_size/self.H
 
+        if self._use_parallel_bin(num_indices):
+            _add_all_parallel(self.hashtable[pa_index], pa_wrapper, indices,
+                              xmin, self.h_sub)
+            return
+
         for i from 0<=i<num_indices:
             idx = indices.data[i]
             find_cell_id_raw(
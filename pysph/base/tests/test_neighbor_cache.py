@@ -114,6 +114,56 @@ class TestNeighborCache(unittest.TestCase):
         )
         self.assertEqual(total_length, n*n)
 
+    def test_skin_reuses_neighbors_for_small_displacements(self):
+        # Given
+        pa = self._make_random_parray('pa1', 5)
+        nnps = LinkedListNNPS(dim=3, particles=[pa], cache=True)
+        nnps.set_skin(0.2)
+        n_rebuilds = nnps.n_rebuilds
+        # A displacement of 0.01 is well within half the skin of 0.08.
+        pa.x += 0.01
+
+        # When
+        nnps.update()
+        nnps.set_context(0, 0)
+
+        # Then
+        self.assertEqual(nnps.n_rebuilds, n_rebuilds)
+        self.assertEqual(nnps.n_reuses, 1)
+
+        # The reused neighbors should contain all the actual neighbors.
+        exact = LinkedListNNPS(dim=3, particles=[pa], cache=False)
+        nb_skin = UIntArray()
+        nb_exact = UIntArray()
+        for i in range(pa.get_number_of_particles()):
+            nnps.get_nearest_particles(0, 0, i, nb_skin)
+            exact.get_nearest_particles(0, 0, i, nb_exact)
+            nb_e = set(nb_exact.get_npy_array())
+            nb_s = set(nb_skin.get_npy_array())
+            self.assertTrue(nb_e.issubset(nb_s))
+
+    def test_skin_rebuilds_neighbors_for_large_displacements(self):
+        # Given
+        pa = self._make_random_parray('pa1', 5)
+        nnps = LinkedListNNPS(dim=3, particles=[pa], cache=True)
+        nnps.set_skin(0.2)
+        n_rebuilds = nnps.n_rebuilds
+
+        # When
+        pa.x[0] += 0.05
+        nnps.update()
+
+        # Then
+        self.assertEqual(nnps.n_rebuilds, n_rebuilds + 1)
+        self.assertEqual(nnps.n_reuses, 0)
+
+        # When
+        pa.h[1] *= 1.5
+        nnps.update()
+
+        # Then
+        self.assertEqual(nnps.n_rebuilds, n_rebuilds + 2)
+
 
 
 if __name__ == '__main__':
@@ -11,6 +11,8 @@ from numpy import random
 from pysph.base.point import IntPoint, Point
 from pysph.base.utils import get_particle_array
 from pysph.base import nnps
+from pysph.base.nnps_base import get_number_of_threads, \
+    set_number_of_threads
 from compyle.config import get_config
 
 # Carrays from PyZoltan
@@ -920,6 +922,114 @@ class TestNNPSOnLargeDomain(unittest.TestCase):
             assert numpy.all(x == y)
 
 
+class TestLinkedListNNPSIncremental(unittest.TestCase):
+    def _make_particles(self):
+        # A moving fluid inside a fixed wall so the bounds do not change.
+        x, y = numpy.mgrid[0:1:20j, 0:1:20j]
+        x, y = x.ravel(), y.ravel()
+        wall = (x < 0.1) | (x > 0.9) | (y < 0.1) | (y > 0.9)
+        h = numpy.ones_like(x)*0.06
+        fluid = get_particle_array(
+            name='fluid', x=x[~wall], y=y[~wall], h=h[~wall]
+        )
+        solid = get_particle_array(
+            name='solid', x=x[wall], y=y[wall], h=h[wall]
+        )
+        return [fluid, solid]
+
+    def _check_neighbors(self, nps, particles):
+        exact = nnps.LinkedListNNPS(dim=2, particles=particles)
+        nbrs = UIntArray()
+        expect = UIntArray()
+        for dst in range(2):
+            for src in range(2):
+                nps.set_context(src, dst)
+                exact.set_context(src, dst)
+                for i in range(particles[dst].get_number_of_particles()):
+                    nps.get_nearest_particles(src, dst, i, nbrs)
+                    exact.get_nearest_particles(src, dst, i, expect)
+                    self.assertEqual(
+                        sorted(nbrs.get_npy_array()),
+                        sorted(expect.get_npy_array())
+                    )
+
+    def test_incremental_update_finds_correct_neighbors(self):
+        # Given
+        particles = self._make_particles()
+        fluid = particles[0]
+        nps = nnps.LinkedListNNPS(dim=2, particles=particles)
+        nps.set_incremental(True)
+        nps.update()
+
+        # When
+        random.seed(1)
+        fluid.x += random.uniform(-0.05, 0.05, fluid.x.size)
+        fluid.y += random.uniform(-0.05, 0.05, fluid.y.size)
+        nps.update()
+
+        # Then
+        self.assertEqual(nps.n_static_skips, 1)
+        self._check_neighbors(nps, particles)
+
+    def test_incremental_update_with_changed_particles(self):
+        # Given
+        particles = self._make_particles()
+        fluid = particles[0]
+        nps = nnps.LinkedListNNPS(dim=2, particles=particles, cache=True)
+        nps.set_incremental(True)
+
+        # When
+        fluid.remove_particles([0, 1])
+        fluid.x[:5] += 0.1
+        nps.update()
+        fluid.y[:5] -= 0.1
+        nps.update()
+
+        # Then
+        self.assertEqual(nps.n_static_skips, 1)
+        self._check_neighbors(nps, particles)
+
+
+class TestSpatialOrdering(unittest.TestCase):
+    def _make_particles(self, nx=20):
+        x, y = numpy.mgrid[0:1:nx*1j, 0:1:nx*1j]
+        x, y = x.ravel(), y.ravel()
+        h = numpy.ones_like(x)*1.2/(nx - 1)
+        m = numpy.arange(x.size, dtype=float)
+        # Shuffle the particles to destroy the locality.
+        idx = numpy.random.RandomState(1).permutation(x.size)
+        return get_particle_array(
+            name='fluid', x=x[idx], y=y[idx], h=h[idx], m=m[idx]
+        )
+
+    def test_morton_order_improves_locality(self):
+        # Given
+        pa = self._make_particles()
+        m = pa.m.copy()
+        nps = nnps.LinkedListNNPS(dim=2, particles=[pa])
+        shuffled = nps.get_locality_metric(0)
+
+        # When
+        nps.morton_order_particles(0)
+        nps.update()
+
+        # Then
+        self.assertTrue(nps.get_locality_metric(0) < 0.2*shuffled)
+        # The particles are only permuted.
+        self.assertTrue(numpy.all(numpy.sort(pa.m) == numpy.sort(m)))
+        # The first few particles along the curve are in the first cell.
+        self.assertTrue(numpy.ptp(pa.x[:4]) < nps.cell_size)
+        self.assertTrue(numpy.ptp(pa.y[:4]) < nps.cell_size)
+
+    def test_locality_metric_for_empty_array(self):
+        pa = get_particle_array(name='fluid', x=[0.0, 1.0], h=0.1)
+        nps = nnps.LinkedListNNPS(dim=1, particles=[pa])
+        self.assertEqual(nps.get_locality_metric(0), 0.0)
+        pa.remove_particles([0, 1])
+        nps.update()
+        self.assertEqual(nps.get_locality_metric(0), 0.0)
+
+
 class TestLinkedListNNPSWithSorting(unittest.TestCase):
     def _make_particles(self, nx=20):
         x = numpy.linspace(0, 1, nx)
@@ -1038,6 +1148,117 @@ def test_neighbor_cache_update_doesnt_leak():
     assert new_length == old_length
 
 
+def test_csr_neighbor_cache_matches_regular_cache():
+    # Given
+    x, y, z = numpy.random.random((3, 500))
+    pa = get_particle_array(name='fluid', x=x, y=y, z=z, h=0.1)
+    nps = nnps.LinkedListNNPS(dim=3, particles=[pa], cache=True)
+    csr_nps = nnps.LinkedListNNPS(dim=3, particles=[pa])
+
+    # When
+    csr_nps.set_csr_cache(True)
+    offsets, indices = csr_nps.get_neighbor_csr(0, 0)
+
+    # Then
+    assert len(offsets) == 501
+    assert offsets[-1] == len(indices)
+    nbrs, csr_nbrs = UIntArray(), UIntArray()
+    nps.set_context(0, 0)
+    csr_nps.set_context(0, 0)
+    for i in range(500):
+        nps.get_nearest_particles(0, 0, i, nbrs)
+        csr_nps.get_nearest_particles(0, 0, i, csr_nbrs)
+        expect = sorted(nbrs.get_npy_array())
+        assert sorted(csr_nbrs.get_npy_array()) == expect
+        assert sorted(indices[offsets[i]:offsets[i + 1]]) == expect
+
+    # When
+    pa.x[:] += 0.01
+    csr_nps.update()
+    offsets, indices = csr_nps.get_neighbor_csr(0, 0)
+
+    # Then
+    nps.update()
+    nps.set_context(0, 0)
+    for i in range(500):
+        nps.get_nearest_particles(0, 0, i, nbrs)
+        expect = sorted(nbrs.get_npy_array())
+        assert sorted(indices[offsets[i]:offsets[i + 1]]) == expect
+
+
+def test_compressed_neighbor_cache_matches_regular_cache():
+    # Given
+    x, y, z = numpy.random.random((3, 500))
+    pa = get_particle_array(name='fluid', x=x, y=y, z=z, h=0.1)
+    nps = nnps.LinkedListNNPS(dim=3, particles=[pa], cache=True)
+    compressed = nnps.LinkedListNNPS(dim=3, particles=[pa])
+
+    # When
+    compressed.set_cache_compression(True)
+    offsets, indices = compressed.get_neighbor_csr(0, 0)
+    stats = compressed.get_cache_compression_stats()
+
+    # Then
+    nbrs, c_nbrs = UIntArray(), UIntArray()
+    nps.set_context(0, 0)
+    compressed.set_context(0, 0)
+    for i in range(500):
+        nps.get_nearest_particles(0, 0, i, nbrs)
+        compressed.get_nearest_particles(0, 0, i, c_nbrs)
+        expect = sorted(nbrs.get_npy_array())
+        assert list(c_nbrs.get_npy_array()) == expect
+        assert list(indices[offsets[i]:offsets[i + 1]]) == expect
+    assert stats['n_neighbors'] == len(indices)
+    assert stats['ratio'] > 1.0
+    assert stats['decode_overhead'] > 0.0
+
+
+def test_compressed_neighbor_cache_does_not_support_sort_gids():
+    x, y, z = numpy.random.random((3, 10))
+    pa = get_particle_array(name='fluid', x=x, y=y, z=z, h=0.1)
+    nps = nnps.LinkedListNNPS(dim=3, particles=[pa], sort_gids=True)
+    with pytest.raises(ValueError):
+        nps.set_cache_compression(True)
+
+
+def test_get_all_neighbors_matches_per_particle_queries():
+    # Given
+    x, y, z = numpy.random.random((3, 200))
+    dst = get_particle_array(name='dst', x=x, y=y, z=z, h=0.1)
+    x, y, z = numpy.random.random((3, 300))
+    src = get_particle_array(name='src', x=x, y=y, z=z, h=0.1)
+    nps = nnps.LinkedListNNPS(dim=3, particles=[dst, src])
+    indices = [5, 0, 199, 5]
+
+    # When
+    offsets, nbrs = nps.get_all_neighbors(1, 0)
+    s_offsets, s_nbrs, dists = nps.get_all_neighbors(
+        1, 0, indices=indices, distances=True
+    )
+
+    # Then
+    assert len(offsets) == 201
+    assert len(s_offsets) == 5
+    expect = UIntArray()
+    for i in range(200):
+        nps.get_nearest_particles(1, 0, i, expect)
+        assert list(nbrs[offsets[i]:offsets[i + 1]]) == \
+            list(expect.get_npy_array())
+    for i, d_idx in enumerate(indices):
+        found = s_nbrs[s_offsets[i]:s_offsets[i + 1]]
+        assert list(found) == list(nbrs[offsets[d_idx]:offsets[d_idx + 1]])
+        expect_dist = numpy.sqrt(
+            (dst.x[d_idx] - src.x[found])**2 +
+            (dst.y[d_idx] - src.y[found])**2 +
+            (dst.z[d_idx] - src.z[found])**2
+        )
+        numpy.testing.assert_allclose(
+            dists[s_offsets[i]:s_offsets[i + 1]], expect_dist
+        )
+    with pytest.raises(IndexError):
+        nps.get_all_neighbors(1, 0, indices=[200])
+
+
 nnps_classes = [
     nnps.BoxSortNNPS,
     nnps.CellIndexingNNPS,
@@ -1065,6 +1286,49 @@ def test_corner_case_1d_few_cells(cls):
         assert sorted(nbrs) == sorted(bf_nbrs), 'Failed for particle: %d' % i
 
 
+@pytest.mark.parametrize("cls", [
+    nnps.BoxSortNNPS,
+    nnps.CellIndexingNNPS,
+    nnps.ExtendedSpatialHashNNPS,
+    nnps.LinkedListNNPS,
+    nnps.SpatialHashNNPS,
+    nnps.ZOrderNNPS
+])
+def test_parallel_binning_matches_serial_binning(cls):
+    # Given
+    n_threads = get_number_of_threads()
+    set_number_of_threads(4)
+    if get_number_of_threads() < 2:
+        set_number_of_threads(n_threads)
+        pytest.skip("Parallel binning needs OpenMP.")
+
+    x, y, z = numpy.random.random((3, 20000))
+    pa = get_particle_array(name='fluid', x=x, y=y, z=z, h=0.02)
+
+    # When
+    try:
+        parallel = cls(dim=3, particles=[pa])
+        # The constructor bins the particles, so build the serial NNPS
+        # with a single thread.
+        set_number_of_threads(1)
+        serial = cls(dim=3, particles=[pa])
+        serial.parallel_bin = False
+        set_number_of_threads(4)
+        serial.update()
+    finally:
+        set_number_of_threads(n_threads)
+
+    # Then
+    nbrs, serial_nbrs, bf_nbrs = UIntArray(), UIntArray(), UIntArray()
+    for i in range(0, 20000, 97):
+        parallel.get_nearest_particles(0, 0, i, nbrs)
+        serial.get_nearest_particles(0, 0, i, serial_nbrs)
+        serial.brute_force_neighbors(0, 0, i, bf_nbrs)
+        assert list(nbrs.get_npy_array()) == \
+            list(serial_nbrs.get_npy_array())
+        assert sorted(nbrs) == sorted(bf_nbrs), 'Failed for particle: %d' % i
+
+
 def test_use_2d_for_1d_data_with_llnps():
     y = numpy.array([1.0, 1.5])
     h = numpy.ones_like(y)
@@ -1007,6 +1007,34 @@ class ParticleArrayUtils(unittest.TestCase):
         self.assertTrue(numpy.allclose(numpy.ones(4), pa.rho))
         self.assertTrue(numpy.allclose(numpy.ravel(data), pa.data))
 
+    def test_set_precision_keeps_positions_in_double(self):
+        # Given
+        x = numpy.linspace(0, 1, 5)
+        pa = utils.get_particle_array_wcsph(x=x, rho=x + 1.0)
+
+        # When
+        utils.set_precision([pa], 'single')
+
+        # Then
+        for prop in ('x', 'y', 'z', 'h'):
+            self.assertEqual(pa.get_carray(prop).get_c_type(), 'double')
+        for prop in ('rho', 'u', 'au', 'x0'):
+            self.assertEqual(pa.get_carray(prop).get_c_type(), 'float')
+        self.assertEqual(pa.get_carray('tag').get_c_type(), 'int')
+        self.assertTrue(numpy.allclose(pa.rho, x + 1.0))
+
+    def test_get_particle_array_with_mixed_precision(self):
+        # Given/When
+        x = numpy.linspace(0, 1, 5)
+        pa = utils.get_particle_array_wcsph(x=x, precision='mixed')
+
+        # Then
+        for prop in ('x', 'h', 'au', 'arho', 'x0'):
+            self.assertEqual(pa.get_carray(prop).get_c_type(), 'double')
+        for prop in ('rho', 'u', 'm', 'p'):
+            self.assertEqual(pa.get_carray(prop).get_c_type(), 'float')
+        self.assertRaises(ValueError, utils.set_precision, pa, 'half')
+
 
 class ParticleArrayTestCPU(unittest.TestCase, ParticleArrayTest):
     """
@@ -1043,6 +1071,30 @@ class ParticleArrayTestCPU(unittest.TestCase, ParticleArrayTest):
         self.assertEqual(len(p1.c), len(p2.c))
         check_array(p1.c, p2.c)
 
+    def test_set_property_type(self):
+        # Given
+        p = particle_array.ParticleArray(x=[1., 2., 3.], u=[0.5, 1.5, 2.5])
+        p.add_property('A', data=numpy.arange(6), stride=2)
+
+        # When
+        p.set_property_type('u', 'float')
+        p.set_property_type('A', 'float')
+
+        # Then
+        self.assertEqual(p.get_carray('u').get_c_type(), 'float')
+        self.assertTrue(check_array(p.u, [0.5, 1.5, 2.5]))
+        self.assertTrue(check_array(p.A, numpy.arange(6)))
+
+        # When
+        p.copy_over_properties({'x': 'u'})
+        p.extend(1)
+
+        # Then
+        self.assertTrue(
+            check_array(p.get_carray('u').get_npy_array(), [1., 2., 3., 0.])
+        )
+        self.assertEqual(p.get_carray('A').length, 8)
+
     def test_set(self):
         """
         Tests the set function.
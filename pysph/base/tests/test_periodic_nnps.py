@@ -224,6 +224,124 @@ class PeriodicChannel2DExtendedSpatialHash(PeriodicChannel2DTestCase):
         self._test_summation_density()
 
 
+class PeriodicChannel2DVirtualImages(PeriodicChannel2DTestCase):
+    def setUp(self):
+        PeriodicChannel2DTestCase.setUp(self)
+        self.domain = DomainManager(xmin=0, xmax=1.0, periodic_in_x=True,
+                                    virtual_periodic=True)
+        self.num_particles = [pa.get_number_of_particles()
+                              for pa in self.particles]
+        self.nnps = LinkedListNNPS(
+            dim=2, particles=self.particles,
+            domain=self.domain,
+            radius_scale=self.kernel.radius_scale)
+
+    def test_periodicity_flags(self):
+        self._test_periodicity_flags()
+        self.assertTrue(self.domain.manager.virtual_periodic)
+        self.assertEqual(self.nnps.n_images, 2)
+
+    def test_no_ghosts_are_created(self):
+        for pa, n in zip(self.particles, self.num_particles):
+            self.assertEqual(pa.get_number_of_particles(), n)
+
+    def test_neighbors_match_minimum_image_brute_force(self):
+        fluid, channel = self.particles
+        nbrs = UIntArray()
+        radius_scale = self.kernel.radius_scale
+        for src_index, src in enumerate(self.particles):
+            for i in range(0, fluid.get_number_of_particles(), 37):
+                # When
+                self.nnps.get_nearest_particles(
+                    src_index=src_index, dst_index=0, d_idx=i, nbrs=nbrs)
+
+                # Then
+                xij = fluid.x[i] - src.x
+                xij -= np.round(xij)
+                yij = fluid.y[i] - src.y
+                r = np.sqrt(xij*xij + yij*yij)
+                expect = np.where(
+                    (r < radius_scale*fluid.h[i]) | (r < radius_scale*src.h)
+                )[0]
+                self.assertListEqual(sorted(nbrs.get_npy_array()),
+                                     list(expect))
+
+    def test_get_all_neighbors_uses_nearest_image_distances(self):
+        # Given
+        fluid = self.particles[0]
+        radius_scale = self.kernel.radius_scale
+
+        # When
+        offsets, nbrs, dists = self.nnps.get_all_neighbors(
+            0, 0, distances=True
+        )
+
+        # Then
+        for i in range(0, fluid.get_number_of_particles(), 37):
+            found = nbrs[offsets[i]:offsets[i + 1]]
+            xij = fluid.x[i] - fluid.x[found]
+            xij -= np.round(xij)
+            yij = fluid.y[i] - fluid.y[found]
+            np.testing.assert_allclose(
+                dists[offsets[i]:offsets[i + 1]],
+                np.sqrt(xij*xij + yij*yij)
+            )
+        self.assertTrue(np.all(dists < radius_scale*fluid.h.max()))
+
+    def test_unsupported_nnps_raises(self):
+        self.assertRaises(
+            NotImplementedError, SpatialHashNNPS, dim=2,
+            particles=self.particles, domain=self.domain,
+            radius_scale=self.kernel.radius_scale
+        )
+
+
+class TestGhostReuse(unittest.TestCase):
+    def _make_particles(self):
+        x, y = np.mgrid[0.0125:1:0.025, 0.0125:1:0.025]
+        x, y = x.ravel(), y.ravel()
+        h = np.ones_like(x) * 0.03
+        rho = np.sin(2 * np.pi * x) * np.cos(2 * np.pi * y)
+        return get_particle_array(name='fluid', x=x, y=y, h=h, rho=rho)
+
+    def _make_domain(self, pa, reuse_ghosts):
+        domain = DomainManager(xmin=0, xmax=1, ymin=0, ymax=1,
+                               periodic_in_x=True, periodic_in_y=True)
+        domain.manager.reuse_ghosts = reuse_ghosts
+        nnps = LinkedListNNPS(dim=2, particles=[pa], domain=domain)
+        return domain, nnps
+
+    def test_reused_ghosts_match_new_ghosts(self):
+        # Given
+        pa1 = self._make_particles()
+        pa2 = self._make_particles()
+        domain1, nnps1 = self._make_domain(pa1, reuse_ghosts=True)
+        domain2, nnps2 = self._make_domain(pa2, reuse_ghosts=False)
+        np.random.seed(123)
+
+        for step in range(5):
+            # When
+            n = pa1.num_real_particles
+            # Small steps keep the ghost layers, the last one crosses the
+            # periodic boundaries.
+            scale = 0.02 if step == 4 else 1e-4
+            dx = np.random.uniform(-scale, scale, n)
+            for pa in (pa1, pa2):
+                pa.x[:n] += dx
+                pa.rho[:n] += dx
+            domain1.update()
+            domain2.update()
+
+            # Then
+            self.assertEqual(pa1.get_number_of_particles(),
+                             pa2.get_number_of_particles())
+            for prop in ('x', 'y', 'rho', 'tag', 'gid'):
+                np.testing.assert_array_equal(
+                    pa1.get(prop, only_real_particles=False),
+                    pa2.get(prop, only_real_particles=False)
+                )
+
+
 class TestPeriodicChannel3D(unittest.TestCase):
 
     def setUp(self):
@@ -44,8 +44,58 @@ DEFAULT_PROPS = set(
 )
 
 
+# Properties that are always stored in double precision on the CPU as the
+# NNPS uses them to bin the particles.
+DOUBLE_PRECISION_PROPS = set(('x', 'y', 'z', 'h'))
+
+# Properties that are also stored in double precision with mixed precision,
+# these are the positions saved by the integrators and the accelerations.
+MIXED_PRECISION_PROPS = set(
+    ('x0', 'y0', 'z0', 'au', 'av', 'aw', 'ax', 'ay', 'az', 'arho', 'ae')
+)
+
+
+def set_precision(particles, precision):
+    """Set the precision used to store the floating point properties.
+
+    Parameters
+    ----------
+
+    particles : list
+        A list of particle arrays or a single particle array.
+
+    precision : str
+        One of 'double', 'single' or 'mixed'. With 'single', the double
+        properties other than those in `DOUBLE_PRECISION_PROPS` are stored as
+        floats. With 'mixed', the properties in `MIXED_PRECISION_PROPS` are
+        also kept in double precision. 'double' leaves the arrays unchanged.
+
+    Notes
+    -----
+
+    This is only supported with the Cython backend. The generated code uses
+    the type of each property array, and the intermediate computations in
+    the equations are still done in double precision.
+    """
+    if precision not in ('double', 'single', 'mixed'):
+        raise ValueError('Unknown precision: %s' % precision)
+    if precision == 'double':
+        return
+    if isinstance(particles, ParticleArray):
+        particles = [particles]
+
+    keep = set(DOUBLE_PRECISION_PROPS)
+    if precision == 'mixed':
+        keep.update(MIXED_PRECISION_PROPS)
+
+    for pa in particles:
+        for name, arr in list(pa.properties.items()):
+            if name not in keep and arr.get_c_type() == 'double':
+                pa.set_property_type(name, 'float')
+
+
 def get_particle_array(additional_props=None, constants=None, backend=None,
-                       **props):
+                       precision=None, **props):
     """Create and return a particle array with default properties.
 
     The default properties are ['x', 'y', 'z', 'u', 'v', 'w', 'm', 'h', 'rho',
@@ -62,6 +112,10 @@ def get_particle_array(additional_props=None, constants=None, backend=None,
     constants : dict
         Any constants to be added to the particle array.
 
+    precision : str
+        If specified, the precision of the floating point properties, see
+        :py:func:`set_precision`.
+
     Other Parameters
     ----------------
     props : dict
@@ -146,6 +200,9 @@ def get_particle_array(additional_props=None, constants=None, backend=None,
     pa.set_output_arrays(['x', 'y', 'z', 'u', 'v', 'w', 'rho', 'm', 'h',
                           'pid', 'gid', 'tag'])
 
+    if precision is not None:
+        set_precision(pa, precision)
+
     return pa
 
 
@@ -3,6 +3,10 @@
 #include <iostream>
 #include <algorithm>
 #include <cmath>
+#include <utility>
+#include <vector>
+
+#include "parallel_utils.h"
 
 #ifdef _WIN32
     typedef unsigned int uint32_t;
@@ -45,6 +49,29 @@ inline uint64_t get_key(uint64_t i, uint64_t j, uint64_t k)
     return (i | (j << 1) | (k << 2));
 }
 
+// Sort the particle ids on their keys and the keys, using all the OpenMP
+// threads if parallel is true. Particles with the same key are ordered on
+// their id so that the result is the same whether it is sorted serially or in
+// parallel.
+inline void sort_by_key(uint32_t* pids, uint64_t* keys, long n, bool parallel)
+{
+    vector< pair<uint64_t, uint32_t> > data(n);
+
+    #pragma omp parallel for if(parallel)
+    for(long i=0; i<n; i++)
+        data[i] = make_pair(keys[i], pids[i]);
+
+    if(n > 0)
+        parallel_sort(&data[0], n, parallel);
+
+    #pragma omp parallel for if(parallel)
+    for(long i=0; i<n; i++)
+    {
+        keys[i] = data[i].first;
+        pids[i] = data[i].second;
+    }
+}
+
 class CompareSortWrapper
 {
 private:
@@ -11,6 +11,8 @@ cdef extern from "z_order.h":
     ctypedef unsigned long long uint64_t
     ctypedef unsigned int uint32_t
     inline uint64_t get_key(uint64_t i, uint64_t j, uint64_t k) nogil
+    inline void sort_by_key(uint32_t* pids, uint64_t* keys, long n,
+            bint parallel) nogil
 
     cdef cppclass CompareSortWrapper:
         CompareSortWrapper() nogil except +
@@ -53,7 +55,7 @@ cdef class ZOrderNNPS(NNPS):
 
     cdef void fill_array(self, NNPSParticleArrayWrapper pa_wrapper, int pa_index,
             UIntArray indices, uint32_t* current_pids, uint64_t* current_keys,
-            key_to_idx_t* current_indices)
+            key_to_idx_t* current_indices, bint parallel)
 
     cpdef _refresh(self)
 
@@ -6,6 +6,7 @@ from libcpp.vector cimport vector
 from libcpp.map cimport map
 
 from cython.operator cimport dereference as deref, preincrement as inc
+from cython.parallel import prange
 
 # Cython for compiler directives
 cimport cython
@@ -210,31 +211,34 @@ cdef class ZOrderNNPS(NNPS):
 
     cdef void fill_array(self, NNPSParticleArrayWrapper pa_wrapper, int pa_index,
             UIntArray indices, uint32_t* current_pids, uint64_t* current_keys,
-            key_to_idx_t* current_indices):
+            key_to_idx_t* current_indices, bint parallel):
         cdef double* x_ptr = pa_wrapper.x.data
         cdef double* y_ptr = pa_wrapper.y.data
         cdef double* z_ptr = pa_wrapper.z.data
 
         cdef double* xmin = self.xmin.data
 
+        cdef double cell_size = self.cell_size
         cdef int c_x, c_y, c_z
 
         cdef int i, n
-        for i from 0<=i<indices.length:
-            find_cell_id_raw(
-                    x_ptr[i] - xmin[0],
-                    y_ptr[i] - xmin[1],
-                    z_ptr[i] - xmin[2],
-                    self.cell_size,
-                    &c_x, &c_y, &c_z
-                    )
-            current_pids[i] = i
-            current_keys[i] = get_key(c_x, c_y, c_z)
-
-        cdef CompareSortWrapper sort_wrapper = \
-                CompareSortWrapper(current_pids, current_keys, indices.length)
+        if parallel:
+            for i in prange(indices.length, nogil=True):
+                c_x = real_to_int(x_ptr[i] - xmin[0], cell_size)
+                c_y = real_to_int(y_ptr[i] - xmin[1], cell_size)
+                c_z = real_to_int(z_ptr[i] - xmin[2], cell_size)
+                current_pids[i] = i
+                current_keys[i] = get_key(c_x, c_y, c_z)
+        else:
+            for i in range(indices.length):
+                c_x = real_to_int(x_ptr[i] - xmin[0], cell_size)
+                c_y = real_to_int(y_ptr[i] - xmin[1], cell_size)
+                c_z = real_to_int(z_ptr[i] - xmin[2], cell_size)
+                current_pids[i] = i
+                current_keys[i] = get_key(c_x, c_y, c_z)
 
-        sort_wrapper.compare_sort()
+        with nogil:
+            sort_by_key(current_pids, current_keys, indices.length, parallel)
 
         cdef pair[uint64_t, pair[uint32_t, uint32_t]] temp
         cdef pair[uint32_t, uint32_t] cell
@@ -307,5 +311,5 @@ cdef class ZOrderNNPS(NNPS):
         cdef key_to_idx_t* current_indices = self.pid_indices[pa_index]
 
         self.fill_array(pa_wrapper, pa_index, indices, current_pids, current_keys,
-                current_indices)
+                current_indices, self._use_parallel_bin(indices.length))
 
@@ -28,7 +28,7 @@ from pysph.solver.controller import CommandManager
 from pysph.solver.utils import mkdir, load, get_files
 
 # conditional parallel imports
-from pysph import has_mpi, has_zoltan, in_parallel
+from pysph import has_h5py, has_mpi, has_zoltan, in_parallel
 
 if in_parallel():
     from pysph.parallel.parallel_manager import ZoltanParallelManagerGeometric
@@ -389,6 +389,15 @@ class Application(object):
             help="Frequency between spatially reordering particles."
         )
 
+        parser.add_argument(
+            '--reorder-threshold', action="store", dest="reorder_threshold",
+            default=0.0, type=float,
+            help="Only reorder the particles (along a Z-order curve) when "
+            "the average index distance between neighbors has grown by "
+            "this factor since the last reorder. The distance is checked "
+            "every --reorder-freq iterations (default 10)."
+        )
+
         # --detailed-output.
         parser.add_argument(
             "--detailed-output",
@@ -406,6 +415,24 @@ class Application(object):
             default=False,
             help="Compress generated output files.")
 
+        # --output-series
+        parser.add_argument(
+            "--output-series",
+            action="store_true",
+            dest="output_series",
+            default=False,
+            help="Append all the output to a single HDF5 file "
+            "(<fname>_series.hdf5) instead of a file per dump, needs h5py.")
+
+        # --async-output
+        parser.add_argument(
+            "--async-output",
+            action="store_true",
+            dest="async_output",
+            default=False,
+            help="Write the output files in a background thread while "
+            "the simulation continues.")
+
         # --output-remote
         parser.add_argument(
             "--output-dump-remote",
@@ -447,6 +474,55 @@ class Application(object):
             help="""Schedule how loop iterations
             are divided amongst multiple threads""")
 
+        # --fuse-stages
+        parser.add_argument(
+            "--fuse-stages",
+            action="store_true",
+            dest="fuse_stages",
+            default=False,
+            help="Do consecutive integrator stages (e.g. initialize and "
+            "stage1) in one pass over the particles where possible "
+            "(CPU only).")
+
+        # --fuse-groups
+        parser.add_argument(
+            "--fuse-groups",
+            action="store_true",
+            dest="fuse_groups",
+            default=False,
+            help="Merge adjacent groups of equations that do not use each "
+            "other's results so that the neighbors are looped over once, "
+            "the fused groups are listed in the log file.")
+
+        # --symmetric-loops
+        parser.add_argument(
+            "--symmetric-loops",
+            action="store_true",
+            dest="symmetric_loops",
+            default=False,
+            help="Evaluate equations with a symmetric loop_pair once per "
+            "pair of particles, only correct if the neighbors are symmetric, "
+            "e.g. with a constant smoothing length (CPU only).")
+
+        # --compile-jobs
+        parser.add_argument(
+            "--compile-jobs",
+            action="store",
+            dest="compile_jobs",
+            type=int,
+            default=None,
+            help="Maximum number of processes used to compile the generated "
+            "code, defaults to the number of CPUs.")
+
+        # --compile-only
+        parser.add_argument(
+            "--compile-only",
+            action="store_true",
+            dest="compile_only",
+            default=False,
+            help="Only set up the simulation and compile the generated code "
+            "into the cache (~/.pysph/source), do not run it.")
+
         # --opencl
         parser.add_argument(
             "--opencl",
@@ -478,7 +554,9 @@ class Application(object):
             action="store_true",
             dest="profile",
             default=False,
-            help="Enable profiling with OpenCL.")
+            help="Enable profiling. With Cython, the groups, equations and "
+            "NNPS updates are timed and the timings are saved to "
+            "profile.json in the output directory.")
 
         # --use-double
         parser.add_argument(
@@ -488,6 +566,25 @@ class Application(object):
             default=False,
             help="Use double precision for OpenCL code.")
 
+        # --single-precision
+        parser.add_argument(
+            "--single-precision",
+            action="store_true",
+            dest="single_precision",
+            default=False,
+            help="Store the floating point properties of the particles in "
+            "single precision with the Cython backend. The positions and "
+            "smoothing lengths are always stored in double precision.")
+
+        # --mixed-precision
+        parser.add_argument(
+            "--mixed-precision",
+            action="store_true",
+            dest="mixed_precision",
+            default=False,
+            help="Like --single-precision but also keep the positions saved "
+            "by the integrator and the accelerations in double precision.")
+
         # --kernel
         all_kernels = list_all_kernels()
         parser.add_argument(
@@ -593,6 +690,62 @@ class Application(object):
             default=self.cache_nnps,
             help="Option to enable the use of neighbor caching.")
 
+        nnps_options.add_argument(
+            "--cache-pair-values",
+            dest="cache_pair_values",
+            action="store_true",
+            default=False,
+            help="Store precomputed pairwise values (WIJ, DWIJ, XIJ etc.) "
+            "shared by several groups once per neighbor pair and reuse them "
+            "(implies --cache-nnps, CPU only).")
+
+        nnps_options.add_argument(
+            "--cache-nnps-csr",
+            dest="cache_nnps_csr",
+            action="store_true",
+            default=False,
+            help="Store the cached neighbors contiguously in destination "
+            "order, built in two parallel passes (implies --cache-nnps, "
+            "CPU only).")
+
+        nnps_options.add_argument(
+            "--compress-nnps-cache",
+            dest="compress_nnps_cache",
+            action="store_true",
+            default=False,
+            help="Store the cached neighbors as 16 bit differences of the "
+            "sorted indices to save memory, the compression ratio and decode "
+            "overhead are reported at the end of the run (implies "
+            "--cache-nnps-csr, CPU only).")
+
+        nnps_options.add_argument(
+            "--virtual-periodic",
+            dest="virtual_periodic",
+            action="store_true",
+            default=False,
+            help="Do not create ghost particles for periodic domains, the "
+            "neighbors across the periodic boundaries are found by the NNPS "
+            "and their nearest image is used (only with the 'll' and 'box' "
+            "NNPS, serial CPU runs only).")
+
+        nnps_options.add_argument(
+            "--nnps-skin",
+            dest="nnps_skin",
+            type=float,
+            default=0.0,
+            help="Verlet skin as a fraction of the kernel radius. Cached "
+            "neighbors are reused across updates until particles move by "
+            "more than half the skin (implies --cache-nnps, CPU only).")
+
+        nnps_options.add_argument(
+            "--nnps-incremental",
+            dest="nnps_incremental",
+            action="store_true",
+            default=False,
+            help="Only rebin the particles that changed cells when updating "
+            "the NNPS, arrays that did not move are skipped (only supported "
+            "by the linked list NNPS, serial, CPU only).")
+
         nnps_options.add_argument(
             "--sort-gids",
             dest="sort_gids",
@@ -940,6 +1093,14 @@ class Application(object):
             config.use_double = options.use_double
         if options.profile:
             config.profile = options.profile
+        if options.single_precision or options.mixed_precision:
+            if config.use_opencl or config.use_cuda:
+                raise RuntimeError(
+                    'Single/mixed precision storage is only supported with '
+                    'Cython, use --use-double to control the GPU precision.'
+                )
+            precision = 'mixed' if options.mixed_precision else 'single'
+            utils.set_precision(self.particles, precision)
         for pa in self.particles:
             pa.update_backend()
 
@@ -965,8 +1126,13 @@ class Application(object):
         # changed after the initial load-balancing.
         self._setup_parallel_manager_and_initial_load_balance()
 
+        if options.virtual_periodic and self.domain is not None and \
+           not options.with_opencl:
+            manager = self.domain.manager
+            manager.virtual_periodic = manager.is_periodic
+
         if self.nnps is None:
-            cache = options.cache_nnps
+            cache = options.cache_nnps or options.cache_pair_values
 
             # create the NNPS object
             if options.with_opencl:
@@ -1108,6 +1274,15 @@ class Application(object):
                     leaf_max_particles=options.leaf_max_particles,
                     sort_gids=options.sort_gids)
 
+            if options.nnps_skin > 0.0 and not options.with_opencl:
+                nnps.set_skin(options.nnps_skin)
+            if options.nnps_incremental and not options.with_opencl:
+                nnps.set_incremental(True)
+            if options.cache_nnps_csr and not options.with_opencl:
+                nnps.set_csr_cache(True)
+            if options.compress_nnps_cache and not options.with_opencl:
+                nnps.set_cache_compression(True)
+
             self.nnps = nnps
 
         nnps = self.nnps
@@ -1147,14 +1322,36 @@ class Application(object):
         solver.set_output_fname(fname)
 
         solver.set_compress_output(options.compress_output)
+        solver.set_async_output(options.async_output)
+        if options.output_series:
+            if not has_h5py():
+                raise RuntimeError('--output-series requires h5py.')
+            solver.set_output_series(True)
         # disable_output
         solver.set_disable_output(options.disable_output)
 
+        if options.cache_pair_values:
+            solver.cache_pair_values = True
+        if options.fuse_stages:
+            solver.fuse_stages = True
+        if options.fuse_groups:
+            solver.fuse_groups = True
+        if options.symmetric_loops:
+            solver.symmetric_loops = True
+        if options.compress_nnps_cache and not options.with_opencl:
+            solver.compressed_neighbors = True
+        if options.compile_jobs is not None:
+            solver.compile_jobs = options.compile_jobs
+
         if options.reorder_freq is None:
             if options.with_opencl:
                 solver.set_reorder_freq(50)
+            elif options.reorder_threshold > 0.0:
+                solver.set_reorder_freq(10)
         else:
             solver.set_reorder_freq(options.reorder_freq)
+        if options.reorder_threshold > 0.0 and not options.with_opencl:
+            solver.set_reorder_threshold(options.reorder_threshold)
 
         # output print frequency
         if options.freq is not None:
@@ -1358,6 +1555,22 @@ class Application(object):
             if not self.options.quiet:
                 print(s)
 
+    def _write_profile(self, run_duration):
+        from pysph.sph.profile import get_profiler
+        profiler = get_profiler()
+        if self.rank == 0:
+            profiler.print_table(run_duration)
+        if self.num_procs > 1:
+            fname = 'profile_%d.json' % self.rank
+        else:
+            fname = 'profile.json'
+        fname = os.path.join(self.output_dir, fname)
+        profiler.save(
+            fname, run_duration=run_duration, rank=self.rank,
+            iterations=self.solver.count
+        )
+        self._message("Profile written to %s" % fname)
+
     def _write_info(self, filename, **kw):
         """Write the information dictionary to given filename. Any extra
         keyword arguments are written to the file.
@@ -1503,6 +1716,11 @@ class Application(object):
             self._message("Setup took: %.5f secs" % (setup_duration))
             self._write_info(self.info_filename, completed=False, cpu_time=0)
 
+        if self.options.compile_only:
+            self._message("Compiled code, not running as --compile-only "
+                          "was given.")
+            return
+
         self.customize_output()
 
         start_time = time.time()
@@ -1510,9 +1728,40 @@ class Application(object):
         end_time = time.time()
         run_duration = end_time - start_time
         self._message("Run took: %.5f secs" % (run_duration))
+        if self.solver.cache_pair_values:
+            nbytes = sum(
+                ae.get_pair_cache_nbytes()
+                for ae in self.solver.acceleration_evals
+            )
+            self._message("Pair value cache used %d bytes" % nbytes)
+        if self.options.nnps_skin > 0.0 and not self.options.with_opencl:
+            self._message(
+                "Neighbors rebuilt %d times, reused %d times" %
+                (self.nnps.n_rebuilds, self.nnps.n_reuses)
+            )
+        if getattr(self.options, 'compress_nnps_cache', False):
+            stats = self.nnps.get_cache_compression_stats()
+            if stats is not None:
+                self._message(
+                    "Neighbor cache compressed %.2fx (%d bytes), decoding "
+                    "takes %.2fx the time of reading plain indices" %
+                    (stats['ratio'], stats['nbytes'],
+                     stats['decode_overhead'])
+                )
+        if self.solver.reorder_threshold > 0.0:
+            self._message(
+                "Particles reordered %d times" % self.solver.n_reorders
+            )
+        if self.options.nnps_incremental and not self.options.with_opencl:
+            self._message(
+                "Static arrays skipped %d times during NNPS updates" %
+                self.nnps.n_static_skips
+            )
         if self.options.with_opencl and self.options.profile:
             from compyle.opencl import print_profile
             print_profile()
+        elif self.options.profile:
+            self._write_profile(run_duration)
         self._write_info(
             self.info_filename, completed=True, cpu_time=run_duration)
 
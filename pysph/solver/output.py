@@ -4,7 +4,14 @@ An interface to output the data in various format
 
 import numpy
 import os
+import struct
 import sys
+import threading
+import zipfile
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 from pysph.base.particle_array import ParticleArray
 from pysph.base.utils import get_particles_info, get_particle_array
@@ -49,6 +56,242 @@ def gather_array_data(all_array_data, comm):
     return all_array_data
 
 
+class LazyParticleArray(object):
+    """A light-weight, read-only view of a particle array in an output file.
+
+    The properties are only read from the file when they are first accessed
+    as attributes (or using :py:meth:`get`). Where the file format allows,
+    the data is memory mapped and should not be modified. The constants are
+    read when the file is opened.
+    """
+
+    def __init__(self, name, loaders, constants, output_property_arrays,
+                 num_particles):
+        self.name = name
+        self.constants = constants
+        self.output_property_arrays = list(output_property_arrays)
+        self.property_names = list(loaders.keys())
+        self._loaders = loaders
+        self._num_particles = num_particles
+        self._data = {}
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name in self._data:
+            return self._data[name]
+        elif name in self._loaders:
+            data = self._data[name] = self._loaders[name]()
+            return data
+        elif name in self.constants:
+            return self.constants[name]
+        else:
+            msg = "Array %s has no property %s" % (self.name, name)
+            raise AttributeError(msg)
+
+    def get_number_of_particles(self):
+        return self._num_particles
+
+    def get(self, *props):
+        """Return the array (or a list of arrays) for the given properties.
+        """
+        result = [getattr(self, x) for x in props]
+        return result[0] if len(result) == 1 else result
+
+
+def _select(names, props):
+    if props is None:
+        return list(names)
+    return [x for x in names if x in props]
+
+
+def _get_number_of_particles(loaders, properties):
+    for prop, loader in loaders.items():
+        stride = properties[prop].get('stride', 1) or 1
+        return loader.shape[0] // stride
+    return 0
+
+
+def _lazy_from_arrays(data, props):
+    """Wrap the particle arrays of already loaded `data` as
+    :py:class:`LazyParticleArray` instances.
+    """
+    arrays = {}
+    for name, pa in data['arrays'].items():
+        loaders = dict(
+            (prop, _Loaded(pa.get(prop, only_real_particles=False)))
+            for prop in _select(pa.properties, props)
+        )
+        constants = dict(
+            (cname, pa.get(cname)) for cname in pa.constants
+        )
+        arrays[name] = LazyParticleArray(
+            name, loaders, constants, pa.output_property_arrays,
+            pa.get_number_of_particles()
+        )
+    return dict(arrays=arrays, solver_data=data['solver_data'])
+
+
+class _Loaded(object):
+    def __init__(self, data):
+        self.data = data
+
+    def __call__(self):
+        return self.data
+
+
+def _read_npy_header(fp):
+    version = numpy.lib.format.read_magic(fp)
+    if version == (1, 0):
+        return numpy.lib.format.read_array_header_1_0(fp)
+    else:
+        return numpy.lib.format.read_array_header_2_0(fp)
+
+
+def _memmap(fname, dtype, offset, shape, fortran=False):
+    if numpy.prod(shape) == 0:
+        return numpy.empty(shape, dtype=dtype)
+    return numpy.memmap(
+        fname, dtype=dtype, mode='r', offset=offset, shape=shape,
+        order='F' if fortran else 'C'
+    )
+
+
+class _NpzMember(object):
+    """Read an array stored in an npz file, the array is memory mapped if it
+    is stored uncompressed.
+    """
+
+    def __init__(self, fname, zf, info):
+        self.fname = fname
+        self.member = info.filename
+        with zf.open(info) as fp:
+            self.shape, self.fortran, self.dtype = _read_npy_header(fp)
+            header_size = fp.tell()
+        self.offset = None
+        if info.compress_type == zipfile.ZIP_STORED and \
+           not self.dtype.hasobject:
+            # Skip the local file header of the zip member.
+            with open(fname, 'rb') as f:
+                f.seek(info.header_offset + 26)
+                name_size, extra_size = struct.unpack('<HH', f.read(4))
+            self.offset = info.header_offset + 30 + name_size + \
+                extra_size + header_size
+
+    def __call__(self):
+        if self.offset is not None:
+            return _memmap(
+                self.fname, self.dtype, self.offset, self.shape, self.fortran
+            )
+        with zipfile.ZipFile(self.fname) as zf:
+            with zf.open(self.member) as fp:
+                return numpy.lib.format.read_array(fp)
+
+
+class _HDFDataset(object):
+    """Read a dataset of an HDF5 file, the data is memory mapped if the
+    dataset is contiguous and uncompressed.
+    """
+
+    def __init__(self, fname, dset):
+        self.fname = fname
+        self.path = dset.name
+        self.shape = dset.shape
+        self.dtype = dset.dtype
+        self.offset = None
+        if dset.chunks is None and dset.compression is None:
+            self.offset = dset.id.get_offset()
+
+    def __call__(self):
+        if self.offset is not None:
+            return _memmap(self.fname, self.dtype, self.offset, self.shape)
+        import h5py
+        with h5py.File(self.fname, 'r') as f:
+            return numpy.array(f[self.path])
+
+
+class _SeriesField(object):
+    """Read the values of one snapshot from the data of a field of a time
+    series output file.
+    """
+
+    def __init__(self, fname, path, start, size):
+        self.fname = fname
+        self.path = path
+        self.start = start
+        self.shape = (size,)
+
+    def __call__(self):
+        import h5py
+        with h5py.File(self.fname, 'r') as f:
+            return f[self.path][self.start:self.start + self.shape[0]]
+
+
+class AsyncWriter(object):
+    """Write output files in a background thread.
+
+    The data to be written is copied when it is submitted, so the particles
+    may be modified as soon as :py:meth:`submit` returns. At most
+    `max_pending` outputs are held in memory; if the writer falls behind,
+    :py:meth:`submit` blocks until an earlier output has been written.
+    Errors raised while writing are re-raised by the next call to
+    :py:meth:`submit`, :py:meth:`flush` or :py:meth:`close`.
+    """
+
+    def __init__(self, max_pending=2):
+        self.max_pending = max_pending
+        # Number of times a submit had to wait for the writer.
+        self.n_waits = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._error = None
+
+    def submit(self, output, fname):
+        """Write the data held by the `output` (an :py:class:`Output`
+        instance) to `fname` in the background.
+        """
+        self._check_error()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+        if self._queue.full():
+            self.n_waits += 1
+        self._queue.put((output, fname))
+
+    def flush(self):
+        """Wait till all the submitted outputs are written."""
+        self._queue.join()
+        self._check_error()
+
+    def close(self):
+        """Write any pending outputs and stop the background thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self._check_error()
+
+    def _check_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                output, fname = item
+                try:
+                    output._dump(fname)
+                except Exception as e:
+                    self._error = e
+            finally:
+                self._queue.task_done()
+
+
 class Output(object):
     """ Class that handles output for simulation """
     def __init__(self, detailed_output=False, only_real=True, mpi_comm=None,
@@ -58,7 +301,12 @@ class Output(object):
         self.only_real = only_real
         self.mpi_comm = mpi_comm
 
-    def dump(self, fname, particles, solver_data):
+    def dump(self, fname, particles, solver_data, writer=None):
+        """Dump the particles and the solver data to `fname`.
+
+        If an :py:class:`AsyncWriter` is passed as the `writer`, a copy of
+        the data is written by it in the background.
+        """
         self.particle_data = dict(get_particles_info(particles))
         self.all_array_data = {}
         for array in particles:
@@ -73,11 +321,39 @@ class Output(object):
             )
         self.solver_data = solver_data
         if mpi_comm is None or mpi_comm.Get_rank() == 0:
-            self._dump(fname)
+            if writer is None:
+                self._dump(fname)
+            else:
+                self._copy_data()
+                writer.submit(self, fname)
+
+    def _copy_data(self):
+        """Copy the data so it is not modified while it is written."""
+        self.solver_data = dict(self.solver_data)
+        self.all_array_data = dict(
+            (name, dict((prop, numpy.array(data, copy=True))
+                        for prop, data in arrays.items()))
+            for name, arrays in self.all_array_data.items()
+        )
+        for info in self.particle_data.values():
+            info['constants'] = dict(
+                (name, numpy.array(data, copy=True))
+                for name, data in info['constants'].items()
+            )
+            info['output_property_arrays'] = list(
+                info['output_property_arrays']
+            )
 
     def load(self, fname):
         return self._load(fname)
 
+    def load_lazy(self, fname, props=None):
+        """Load the file returning :py:class:`LazyParticleArray` instances
+        instead of particle arrays. If `props` is given only these
+        properties are available.
+        """
+        return self._load_lazy(fname, props)
+
     def _dump(self, fname):
         """ Implement the method for writing the output to a file here """
         raise NotImplementedError()
@@ -86,6 +362,10 @@ class Output(object):
         """ Implement the method for loading from file here """
         raise NotImplementedError()
 
+    def _load_lazy(self, fname, props):
+        """ Implement the method for lazily loading from file here """
+        raise NotImplementedError()
+
 
 def _dict_bytes_to_str(d):
     # This craziness is needed as if the npz file is saved in Python2
@@ -113,15 +393,23 @@ def _get_dict_from_arrays(arrays):
         return res
 
 
+def _npz_key(array_name, prop):
+    return 'arrays/%s/%s' % (array_name, prop)
+
+
 class NumpyOutput(Output):
 
     def _dump(self, filename):
+        # Each property is saved as a separate member so it can be read
+        # (or memory mapped) on its own.
         save_method = numpy.savez_compressed if self.compress else numpy.savez
         output_data = {"particles": self.particle_data,
                        "solver_data": self.solver_data}
         for name, arrays in self.all_array_data.items():
-            self.particle_data[name]["arrays"] = arrays
-        save_method(filename, version=2, **output_data)
+            self.particle_data[name]["arrays"] = list(arrays.keys())
+            for prop, data in arrays.items():
+                output_data[_npz_key(name, prop)] = data
+        save_method(filename, version=3, **output_data)
 
     def _load(self, fname):
         data = numpy.load(fname, encoding='bytes', allow_pickle=True)
@@ -142,12 +430,19 @@ class NumpyOutput(Output):
                                            **arrays[array_name])
                 ret["arrays"][array_name] = array
 
-        elif version == 2:
+        elif version in (2, 3):
             particles = _get_dict_from_arrays(data["particles"])
 
             for array_name, array_info in particles.items():
-                for prop, data in array_info['arrays'].items():
-                    array_info['properties'][prop]['data'] = data
+                if version == 2:
+                    stored = array_info['arrays'].items()
+                else:
+                    stored = [
+                        (prop, data[_npz_key(array_name, prop)])
+                        for prop in array_info['arrays']
+                    ]
+                for prop, prop_data in stored:
+                    array_info['properties'][prop]['data'] = prop_data
                 array = ParticleArray(name=array_name,
                                       constants=array_info["constants"],
                                       **array_info["properties"])
@@ -160,6 +455,32 @@ class NumpyOutput(Output):
             raise RuntimeError("Version not understood!")
         return ret
 
+    def _load_lazy(self, fname, props):
+        data = numpy.load(fname, encoding='bytes', allow_pickle=True)
+        if 'version' not in data.files or data['version'] != 3:
+            # Older files store all the properties in one member so there is
+            # nothing to be gained by reading them lazily.
+            return _lazy_from_arrays(self._load(fname), props)
+
+        ret = {}
+        ret["solver_data"] = _get_dict_from_arrays(data["solver_data"])
+        ret["arrays"] = {}
+        particles = _get_dict_from_arrays(data["particles"])
+        with zipfile.ZipFile(fname) as zf:
+            for array_name, array_info in particles.items():
+                loaders = {}
+                for prop in _select(array_info['arrays'], props):
+                    info = zf.getinfo(_npz_key(array_name, prop) + '.npy')
+                    loaders[prop] = _NpzMember(fname, zf, info)
+                ret["arrays"][array_name] = LazyParticleArray(
+                    array_name, loaders, array_info["constants"],
+                    array_info.get('output_property_arrays', []),
+                    _get_number_of_particles(
+                        loaders, array_info['properties']
+                    )
+                )
+        return ret
+
 
 class HDFOutput(Output):
 
@@ -191,6 +512,36 @@ class HDFOutput(Output):
             ret["arrays"] = self._get_particles(particles_grp)
         return ret
 
+    def _load_lazy(self, fname, props):
+        if has_h5py():
+            import h5py
+        else:
+            msg = "Install python-h5py to load this file"
+            raise ImportError(msg)
+
+        ret = {}
+        with h5py.File(fname, 'r') as f:
+            ret["solver_data"] = self._get_solver_data(f['solver_data'])
+            ret["arrays"] = arrays = {}
+            for name, grp in f['particles'].items():
+                name = _to_str(name)
+                loaders, properties, stored = {}, {}, []
+                for pname, h5obj in grp['arrays'].items():
+                    if not h5obj.attrs['stored']:
+                        continue
+                    prop_name = _to_str(h5obj.attrs['name'])
+                    stored.append(_to_str(pname))
+                    if props is None or prop_name in props:
+                        loaders[prop_name] = _HDFDataset(fname, h5obj)
+                        properties[prop_name] = dict(
+                            stride=h5obj.attrs.get('stride', 1)
+                        )
+                arrays[name] = LazyParticleArray(
+                    name, loaders, self._get_constants(grp['constants']),
+                    stored, _get_number_of_particles(loaders, properties)
+                )
+        return ret
+
     def _get_particles(self, grp):
 
         particles = {}
@@ -242,13 +593,15 @@ class HDFOutput(Output):
             if propname in data:
                 array = data[propname]
                 if self.compress:
-                    prop = ptype_grp.create_dataset(
-                            propname, data=array)
-                else:
                     prop = ptype_grp.create_dataset(
                             propname, data=array,
                             compression="gzip", compression_opts=9
                             )
+                else:
+                    # Uncompressed datasets are contiguous and may be
+                    # memory mapped when loaded lazily.
+                    prop = ptype_grp.create_dataset(
+                            propname, data=array)
 
                 prop.attrs['stored'] = True
             else:
@@ -265,7 +618,325 @@ class HDFOutput(Output):
             grp.attrs[name] = data
 
 
-def load(fname):
+SERIES_SUFFIX = '_series.hdf5'
+
+
+def is_series(fname):
+    """Return True if `fname` is a time series output file."""
+    return fname.endswith(SERIES_SUFFIX)
+
+
+def _create_field(grp, name, dtype, size, compress):
+    field = grp.create_group(name)
+    chunk = max(1024, min(size, 1 << 16))
+    field.create_dataset(
+        'data', shape=(0,), maxshape=(None,), dtype=dtype,
+        chunks=(chunk,), compression="gzip" if compress else None
+    )
+    field.create_dataset(
+        'index', shape=(0, 2), maxshape=(None, 2), dtype=numpy.int64,
+        chunks=(1024, 2)
+    )
+    return field
+
+
+def _append_field(grp, name, data, index, compress):
+    """Append the 1D `data` for the snapshot `index` to the field `name`.
+
+    A field is a group with a resizable ``data`` dataset holding the values
+    of all the snapshots and an ``index`` dataset with the start and the
+    size of the values of each snapshot in ``data``. The size is -1 for
+    the snapshots for which the field was not written.
+    """
+    if name in grp:
+        field = grp[name]
+    else:
+        field = _create_field(grp, name, data.dtype, data.size, compress)
+    values, _index = field['data'], field['index']
+    end = values.shape[0]
+    n = _index.shape[0]
+    _index.resize((index + 1, 2))
+    if n < index:
+        _index[n:index] = (end, -1)
+    _index[index] = (end, data.size)
+    values.resize((end + data.size,))
+    values[end:] = data
+    return field
+
+
+def _truncate_field(field, n):
+    """Remove all but the first `n` snapshots from the field."""
+    _index = field['index']
+    if _index.shape[0] > n:
+        end = int(_index[n][0])
+        _index.resize((n, 2))
+        field['data'].resize((end,))
+
+
+def _read_field(field, index):
+    """Return the data of the field for the snapshot `index`, or None if it
+    was not written for that snapshot.
+    """
+    _index = field['index']
+    if _index.shape[0] <= index:
+        return None
+    start, size = _index[index]
+    if size < 0:
+        return None
+    return field['data'][start:start + size]
+
+
+class HDFSeriesOutput(Output):
+    """Append the output to a single HDF5 file holding all the snapshots of
+    a run, see :py:class:`TimeSeries` to read them.
+
+    Each property of each array, each constant and each item of the solver
+    data is stored in a resizable dataset (see :py:func:`_append_field`) so
+    any snapshot can be read directly.
+
+    If `keep_before` is given, the snapshots in an existing file from the
+    iteration count `keep_before` onwards are removed before appending, so
+    a new run (``keep_before=0``) starts a new file and a restarted run
+    replaces the snapshots written after the restart point.
+    """
+
+    def __init__(self, detailed_output=False, only_real=True, mpi_comm=None,
+                 compress=False, keep_before=None):
+        super(HDFSeriesOutput, self).__init__(
+            detailed_output, only_real, mpi_comm, compress
+        )
+        self.keep_before = keep_before
+
+    def _dump(self, filename):
+        import h5py
+        with h5py.File(filename, 'a') as f:
+            if self.keep_before is not None:
+                self._truncate(f, self.keep_before)
+            index = int(f.attrs.get('n_snapshots', 0))
+            solver_grp = f.require_group('solver_data')
+            for name, value in self.solver_data.items():
+                _append_field(
+                    solver_grp, name, numpy.asarray([value]), index, False
+                )
+            particles_grp = f.require_group('particles')
+            for ptype, pdata in self.particle_data.items():
+                ptype_grp = particles_grp.require_group(ptype)
+                ptype_grp.attrs['output_property_arrays'] = numpy.array(
+                    pdata['output_property_arrays'], dtype='S'
+                )
+                self._append_properties(
+                    pdata, ptype_grp.require_group('arrays'),
+                    self.all_array_data[ptype], index
+                )
+                const_grp = ptype_grp.require_group('constants')
+                for name, value in pdata['constants'].items():
+                    _append_field(
+                        const_grp, name, numpy.ravel(value), index,
+                        self.compress
+                    )
+            f.attrs['n_snapshots'] = index + 1
+
+    def _truncate(self, f, keep_before):
+        import h5py
+        n = int(f.attrs.get('n_snapshots', 0))
+        if n == 0:
+            return
+        # Keep the leading snapshots written before keep_before.
+        below = numpy.array(f['solver_data/count/data']) < keep_before
+        n = min(n, len(below) if below.all() else int(numpy.argmin(below)))
+        fields = []
+
+        def _find_fields(name, obj):
+            if isinstance(obj, h5py.Group) and 'index' in obj and \
+               'data' in obj:
+                fields.append(obj)
+
+        f.visititems(_find_fields)
+        for field in fields:
+            _truncate_field(field, n)
+        f.attrs['n_snapshots'] = n
+
+    def _append_properties(self, pdata, arrays_grp, data, index):
+        for propname, attributes in pdata['properties'].items():
+            if propname in data:
+                field = _append_field(
+                    arrays_grp, propname, numpy.ravel(data[propname]), index,
+                    self.compress
+                )
+            elif propname not in arrays_grp:
+                field = _create_field(
+                    arrays_grp, propname, numpy.float64, 0, self.compress
+                )
+            else:
+                continue
+            for attname, value in attributes.items():
+                if value is None:
+                    value = 'None'
+                field.attrs[attname] = value
+
+    def _load(self, fname):
+        series = TimeSeries(fname)
+        return series.load(len(series) - 1)
+
+    def _load_lazy(self, fname, props):
+        series = TimeSeries(fname)
+        return series.load_lazy(len(series) - 1, props)
+
+
+class TimeSeries(object):
+    """Read the snapshots saved in a time series output file.
+
+    Examples
+    --------
+    >>> series = TimeSeries('dam_break_2d_output/dam_break_2d_series.hdf5')
+    >>> len(series)
+    101
+    >>> series.get_index()['t']
+    array([0.   , 0.005, ...])
+    >>> data = series.load(-1)
+    >>> fluid = data['arrays']['fluid']
+    """
+
+    def __init__(self, fname):
+        if not has_h5py():
+            msg = "Install python-h5py to load this file"
+            raise ImportError(msg)
+        if not os.path.isfile(fname):
+            raise RuntimeError("File not present")
+        self.fname = fname
+
+    def __len__(self):
+        import h5py
+        with h5py.File(self.fname, 'r') as f:
+            return int(f.attrs.get('n_snapshots', 0))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.load(i)
+
+    def get_index(self):
+        """Return a dictionary of arrays with the solver data (for example
+        the count, t and dt) of each snapshot.
+        """
+        import h5py
+        with h5py.File(self.fname, 'r') as f:
+            return dict(
+                (_to_str(name), numpy.array(field['data']))
+                for name, field in f['solver_data'].items()
+            )
+
+    def find(self, count):
+        """Return the index of the snapshot at the iteration `count`."""
+        counts = self.get_index()['count']
+        idx = numpy.where(counts == count)[0]
+        if len(idx) == 0:
+            msg = "No snapshot with iteration count %s" % count
+            raise IndexError(msg)
+        return int(idx[-1])
+
+    def load(self, index):
+        """Load the snapshot `index` (negative values count from the end),
+        returns a dictionary like :py:func:`load`.
+        """
+        import h5py
+        index = self._check_index(index)
+        with h5py.File(self.fname, 'r') as f:
+            solver_data = self._get_solver_data(f, index)
+            arrays = {}
+            for name, grp in f['particles'].items():
+                arrays[_to_str(name)] = self._get_array(
+                    _to_str(name), grp, index
+                )
+        return dict(arrays=arrays, solver_data=solver_data)
+
+    def load_lazy(self, index, props=None):
+        """Load the snapshot `index` returning :py:class:`LazyParticleArray`
+        instances, see :py:meth:`Output.load_lazy`.
+        """
+        import h5py
+        index = self._check_index(index)
+        with h5py.File(self.fname, 'r') as f:
+            solver_data = self._get_solver_data(f, index)
+            arrays = {}
+            for name, grp in f['particles'].items():
+                name = _to_str(name)
+                arrays[name] = self._get_lazy_array(name, grp, index, props)
+        return dict(arrays=arrays, solver_data=solver_data)
+
+    def _check_index(self, index):
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("Snapshot %d out of range" % index)
+        return index
+
+    def _get_solver_data(self, f, index):
+        solver_data = {}
+        for name, field in f['solver_data'].items():
+            value = _read_field(field, index)
+            if value is not None:
+                solver_data[_to_str(name)] = value[0]
+        return solver_data
+
+    def _get_constants(self, grp, index):
+        constants = {}
+        for cname, field in grp['constants'].items():
+            value = _read_field(field, index)
+            if value is not None:
+                constants[_to_str(cname)] = value
+        return constants
+
+    def _get_lazy_array(self, name, grp, index, props):
+        loaders, properties, output_arrays = {}, {}, []
+        for pname, field in grp['arrays'].items():
+            prop_name = _to_str(field.attrs['name'])
+            _index = field['index']
+            if _index.shape[0] <= index:
+                continue
+            start, size = _index[index]
+            if size < 0:
+                continue
+            output_arrays.append(_to_str(pname))
+            if props is None or prop_name in props:
+                loaders[prop_name] = _SeriesField(
+                    self.fname, field['data'].name, start, size
+                )
+                properties[prop_name] = dict(
+                    stride=field.attrs.get('stride', 1)
+                )
+        saved = grp.attrs.get('output_property_arrays', [])
+        saved = [_to_str(x) for x in saved]
+        return LazyParticleArray(
+            name, loaders, self._get_constants(grp, index),
+            saved or output_arrays,
+            _get_number_of_particles(loaders, properties)
+        )
+
+    def _get_array(self, name, grp, index):
+        constants = self._get_constants(grp, index)
+        array = ParticleArray(name, constants=constants)
+        output_arrays = []
+        for pname, field in grp['arrays'].items():
+            prop_name = _to_str(field.attrs['name'])
+            type_ = _to_str(field.attrs['type'])
+            stride = field.attrs.get('stride', 1)
+            data = _read_field(field, index)
+            if data is not None:
+                output_arrays.append(_to_str(pname))
+                array.add_property(
+                    prop_name, type=type_, default=field.attrs['default'],
+                    data=data, stride=stride
+                )
+            else:
+                array.add_property(prop_name, type=type_, stride=stride)
+        saved = grp.attrs.get('output_property_arrays', [])
+        saved = [_to_str(x) for x in saved]
+        array.set_output_arrays(saved or output_arrays)
+        return array
+
+
+def load(fname, lazy=False, props=None):
     """
     Load the output data
 
@@ -273,6 +944,12 @@ def load(fname):
     ----------
     fname: str
         Name of the file or full path
+    lazy: bool
+        Return :py:class:`LazyParticleArray` instances which only read the
+        properties when they are accessed instead of particle arrays.
+    props: sequence(str)
+        Names of the properties to make available when `lazy` is True,
+        all the saved properties are available by default.
 
 
     Examples
@@ -288,13 +965,24 @@ def load(fname):
     pysph.base.particle_array.ParticleArray
     >>> data['solver_data']
     {'count': 100, 'dt': 4.6416394784204199e-05, 't': 0.0039955855395528766}
+
+    For a time series output file (see :py:func:`append_series`) the last
+    snapshot is loaded, use :py:class:`TimeSeries` to load the others.
+
+    >>> data = load('elliptical_drop_100.npz', lazy=True, props=['x', 'y'])
+    >>> fluid = data['arrays']['fluid']
+    >>> fluid.x  # Only read now.
     """
 
     if fname.endswith('npz'):
         output = NumpyOutput()
+    elif is_series(fname):
+        output = HDFSeriesOutput()
     elif fname.endswith('hdf5'):
         output = HDFOutput()
     if os.path.isfile(fname):
+        if lazy:
+            return output.load_lazy(fname, props)
         return output.load(fname)
     else:
         msg = "File not present"
@@ -302,7 +990,7 @@ def load(fname):
 
 
 def dump(filename, particles, solver_data, detailed_output=False,
-         only_real=True, mpi_comm=None, compress=False):
+         only_real=True, mpi_comm=None, compress=False, writer=None):
 
     """
     Dump the given particles and solver data to the given filename.
@@ -331,6 +1019,9 @@ def dump(filename, particles, solver_data, detailed_output=False,
     compress: bool
         Specify if the  file is to be compressed or not.
 
+    writer: AsyncWriter
+        Optional writer used to write the file in the background.
+
     If `mpi_comm` is not passed or is set to None the local particles alone
     are dumped, otherwise only rank 0 dumps the output.
 
@@ -347,4 +1038,26 @@ def dump(filename, particles, solver_data, detailed_output=False,
         output = NumpyOutput(detailed_output, only_real, mpi_comm, compress)
         file_format = 'npz'
     filename = fname + '.' + file_format
-    output.dump(filename, particles, solver_data)
+    output.dump(filename, particles, solver_data, writer=writer)
+
+
+def append_series(filename, particles, solver_data, detailed_output=False,
+                  only_real=True, mpi_comm=None, compress=False, writer=None,
+                  keep_before=None):
+    """Append the given particles and solver data as a new snapshot to the
+    time series output file `filename`, which is created if needed.
+
+    The arguments are the same as for :py:func:`dump`. If `keep_before` is
+    given, the existing snapshots from that iteration count onwards are
+    removed first, use 0 to start a new file. This requires h5py, the
+    snapshots may be read using :py:class:`TimeSeries`.
+    """
+    if not has_h5py():
+        msg = "Install python-h5py to write time series output"
+        raise ImportError(msg)
+    if not is_series(filename):
+        filename = os.path.splitext(filename)[0] + SERIES_SUFFIX
+    output = HDFSeriesOutput(
+        detailed_output, only_real, mpi_comm, compress, keep_before
+    )
+    output.dump(filename, particles, solver_data, writer=writer)
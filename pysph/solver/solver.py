@@ -10,6 +10,9 @@ from pysph.sph.acceleration_eval import make_acceleration_evals
 from pysph.sph.sph_compiler import SPHCompiler
 
 from pysph.solver.utils import ProgressBar, load, dump
+from pysph.solver.output import (
+    AsyncWriter, append_series, SERIES_SUFFIX, TimeSeries
+)
 
 import logging
 logger = logging.getLogger(__name__)
@@ -73,6 +76,39 @@ class Solver(object):
             The number of iterations after which particles should
             be re-ordered.  If zero, do not do this.
 
+        reorder_threshold : double
+            If positive, the particles are only re-ordered (along a Z-order
+            curve) when the locality metric has grown by this factor since
+            the last re-ordering, it is checked every `reorder_freq`
+            iterations.
+
+        cache_pair_values : bint
+            Flag to store the precomputed pairwise values (``WIJ``, ``DWIJ``,
+            ``XIJ`` etc.) shared by several groups once per neighbor pair
+            and reuse them.  This trades memory for fewer kernel evaluations.
+
+        fuse_stages : bint
+            Flag to do consecutive integrator stages (for example the
+            ``initialize`` and ``stage1`` of a PEC integrator) in a single
+            loop over the particles where possible.
+
+        fuse_groups : bint
+            Flag to merge adjacent groups of equations that do not use each
+            other's results so that their neighbors are looped over once.
+
+        symmetric_loops : bint
+            Flag to evaluate equations with a symmetric ``loop_pair`` once
+            per pair of particles.  This is only correct if the neighbors
+            are symmetric, for example with a constant smoothing length.
+
+        compressed_neighbors : bint
+            Flag to generate the code to decode the neighbors when the NNPS
+            compresses its cache, see ``NNPS.set_cache_compression``.
+
+        compile_jobs : int
+            Maximum number of processes used to compile the generated
+            extension modules concurrently, defaults to the number of CPUs.
+
         Example
         -------
 
@@ -117,6 +153,14 @@ class Solver(object):
         self.compress_output = False
         self.disable_output = False
 
+        # Write the output in a background thread.
+        self.async_output = False
+
+        # Append all the output to a single time series file.
+        self.output_series = False
+        self._series_started = False
+        self._writer = None
+
         # the process id for parallel runs
         self.pid = None
 
@@ -171,6 +215,29 @@ class Solver(object):
 
         self.reorder_freq = 0
 
+        # adaptive reordering based on the locality of the neighbors.
+        self.reorder_threshold = 0.0
+        self.n_reorders = 0
+        self._locality_ref = None
+
+        # flag to cache the precomputed values shared by groups.
+        self.cache_pair_values = False
+
+        # flag to fuse consecutive integrator stages.
+        self.fuse_stages = False
+
+        # flag to fuse independent adjacent groups of equations.
+        self.fuse_groups = False
+
+        # flag to evaluate symmetric equations once per pair of particles.
+        self.symmetric_loops = False
+
+        # flag to decode the compressed neighbors of the NNPS.
+        self.compressed_neighbors = False
+
+        # number of processes used to compile the extension modules.
+        self.compile_jobs = None
+
         # Set all extra keyword arguments
         for attr, value in kwargs.items():
             if hasattr(self, attr):
@@ -200,14 +267,34 @@ class Solver(object):
             self.kernel = kernel
 
         mode = 'mpi' if self.in_parallel else 'serial'
+        domain = getattr(nnps, 'domain', None)
+        virtual_periodic = domain is not None and \
+            domain.manager.virtual_periodic
+        if virtual_periodic and self.in_parallel:
+            raise NotImplementedError(
+                'Virtual periodic images are not supported in parallel.'
+            )
         self.acceleration_evals = make_acceleration_evals(
-            particles, equations, self.kernel, mode
+            particles, equations, self.kernel, mode,
+            cache_pair_values=self.cache_pair_values,
+            virtual_periodic=virtual_periodic, fuse_groups=self.fuse_groups,
+            symmetric_loops=self.symmetric_loops,
+            compressed_neighbors=self.compressed_neighbors
         )
+        for ae in self.acceleration_evals:
+            for line in ae.fusion_report:
+                logger.info(line)
+            for dest, source, symbols, stride in ae.pair_cache_info:
+                logger.info(
+                    "Caching %s for %s <- %s: %d bytes per neighbor.",
+                    ', '.join(symbols), dest, source, 8*stride
+                )
 
+        self.integrator.fuse_stages = self.fuse_stages
         sph_compiler = SPHCompiler(
             self.acceleration_evals, self.integrator
         )
-        sph_compiler.compile()
+        sph_compiler.compile(n_jobs=self.compile_jobs)
 
         # Set the nnps for all concerned objects.
         self.nnps = nnps
@@ -293,11 +380,55 @@ class Solver(object):
 
     def reorder_particles(self):
         """Re-order particles so as to coalesce memory access.
+
+        With adaptive re-ordering (see :py:meth:`set_reorder_threshold`) the
+        particles are ordered along a Z-order curve if the NNPS supports it.
         """
+        adaptive = self.reorder_threshold > 0.0 and \
+            hasattr(self.nnps, 'morton_order_particles')
         for i in range(len(self.particles)):
-            self.nnps.spatially_order_particles(i)
+            if adaptive:
+                self.nnps.morton_order_particles(i)
+            else:
+                self.nnps.spatially_order_particles(i)
         # We must update after the reorder.
         self.nnps.update()
+        self.n_reorders += 1
+        if adaptive:
+            self._locality_ref = self.get_locality_metric()
+
+    def get_locality_metric(self):
+        """Return the average distance between the indices of the particles
+        and their neighbors in the same array, averaged over all the arrays.
+
+        This is a cheap measure of the cache locality of the neighbor
+        accesses, see :py:meth:`NNPS.get_locality_metric`.
+        """
+        metrics = [
+            self.nnps.get_locality_metric(i)
+            for i, pa in enumerate(self.particles)
+            if pa.get_number_of_particles() > 0
+        ]
+        if len(metrics) == 0:
+            return 0.0
+        return sum(metrics)/len(metrics)
+
+    def _reorder_if_needed(self):
+        if self.reorder_threshold <= 0.0 or \
+           not hasattr(self.nnps, 'get_locality_metric'):
+            self.reorder_particles()
+            return
+
+        metric = self.get_locality_metric()
+        ref = self._locality_ref
+        reorder = ref is None or metric > self.reorder_threshold*ref
+        logger.info(
+            "Iteration=%d, locality metric=%g (%g after the last reorder)%s",
+            self.count, metric, ref if ref is not None else metric,
+            ", reordering" if reorder else ""
+        )
+        if reorder:
+            self.reorder_particles()
 
     def set_adaptive_timestep(self, value):
         """Set it to True to use adaptive timestepping based on
@@ -384,6 +515,25 @@ class Solver(object):
         """
         self.compress_output = compress
 
+    def set_async_output(self, value):
+        """Write the output files in a background thread so the time
+        stepping continues while the files are written.
+        """
+        self.async_output = value
+
+    def set_output_series(self, value):
+        """Append all the output to a single time series file named
+        ``<fname>_series.hdf5`` instead of writing a file per dump. This
+        requires h5py.
+        """
+        self.output_series = value
+
+    def flush_output(self):
+        """Wait till any output being written in the background is done."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
     def set_parallel_output_mode(self, mode="collected"):
         """Set the default solver dump mode in parallel.
 
@@ -416,6 +566,15 @@ class Solver(object):
         """
         self.reorder_freq = freq
 
+    def set_reorder_threshold(self, threshold):
+        """Only re-order the particles when the locality metric (see
+        :py:meth:`get_locality_metric`) has grown by the factor `threshold`
+        since the last re-ordering. The metric is checked every
+        `reorder_freq` iterations. A value of zero re-orders the particles
+        unconditionally.
+        """
+        self.reorder_threshold = threshold
+
     def barrier(self):
         if self.comm:
             self.comm.barrier()
@@ -494,7 +653,7 @@ class Solver(object):
             self.update_particle_time()
 
             if reorder_freq > 0 and (self.count % reorder_freq == 0):
-                self.reorder_particles()
+                self._reorder_if_needed()
 
             if self.execute_commands is not None:
                 if self.count % self.command_interval == 0:
@@ -505,6 +664,7 @@ class Solver(object):
 
         # final output save
         self.dump_output()
+        self.flush_output()
 
     def update_particle_time(self):
         for array in self.particles:
@@ -553,17 +713,31 @@ class Solver(object):
                 self.t, self.count, self.dt)
             logger.info(msg)
 
-        fname = os.path.join(self.output_directory,
-                             self.fname + '_' + str(self.count))
-
         comm = None
         if self.parallel_output_mode == "collected" and self.in_parallel:
             comm = self.comm
 
-        dump(fname, self.particles, self._get_solver_data(),
+        kw = {}
+        if self.output_series:
+            func = append_series
+            fname = self.fname + SERIES_SUFFIX
+            if not self._series_started:
+                # Remove the snapshots of an earlier run from this count
+                # onwards, all of them unless this run is a restart.
+                kw['keep_before'] = self.count
+                self._series_started = True
+        else:
+            func = dump
+            fname = self.fname + '_' + str(self.count)
+        fname = os.path.join(self.output_directory, fname)
+
+        if self.async_output and self._writer is None:
+            self._writer = AsyncWriter()
+
+        func(fname, self.particles, self._get_solver_data(),
              detailed_output=self.detailed_output,
              only_real=self.output_only_real, mpi_comm=comm,
-             compress=self.compress_output)
+             compress=self.compress_output, writer=self._writer, **kw)
 
     def load_output(self, count):
         """Load particle data from dumped output file.
@@ -583,11 +757,25 @@ class Solver(object):
         functioning required that all the relevant properties of arrays be
         dumped.
 
+        With :py:meth:`set_output_series` the snapshot is read from the time
+        series file. The snapshots written after it are removed from the
+        file by the next :py:meth:`dump_output`.
+
         """
-        # get the list of available files
-        available_files = [i.rsplit('_', 1)[1][:-4]
-                           for i in os.listdir(self.output_directory)
-                           if i.startswith(self.fname) and i.endswith('.npz')]
+        if self.output_series:
+            series = TimeSeries(os.path.join(
+                self.output_directory, self.fname + SERIES_SUFFIX
+            ))
+            available_files = [
+                str(x) for x in series.get_index()['count']
+            ]
+        else:
+            # get the list of available files
+            available_files = [
+                i.rsplit('_', 1)[1][:-4]
+                for i in os.listdir(self.output_directory)
+                if i.startswith(self.fname) and i.endswith('.npz')
+            ]
 
         if count == '?':
             return sorted(set(available_files), key=int)
@@ -602,8 +790,11 @@ class Solver(object):
         array_names = [pa.name for pa in self.particles]
 
         # load the output file
-        data = load(os.path.join(self.output_directory,
-                                 self.fname+'_'+str(count)+'.npz'))
+        if self.output_series:
+            data = series.load(series.find(int(count)))
+        else:
+            data = load(os.path.join(self.output_directory,
+                                     self.fname+'_'+str(count)+'.npz'))
 
         arrays = [data["arrays"][i] for i in array_names]
 
@@ -615,6 +806,7 @@ class Solver(object):
         self.t = float(solver_data['t'])
         self.dt = float(solver_data['dt'])
         self.count = int(solver_data['count'])
+        self._series_started = False
 
     def get_options(self, arg_parser):
         """ Implement this to add additional options for the application """
@@ -9,9 +9,16 @@ try:
 except ImportError:
     import mock
 
+import os
+import shutil
+import tempfile
+
 import numpy as np
 import numpy.testing as npt
 
+from pysph import has_h5py
+from pysph.base.utils import get_particle_array
+from pysph.solver.output import TimeSeries
 from pysph.solver.solver import Solver
 
 
@@ -78,6 +85,48 @@ class TestSolver(TestCase):
             [0.1]*len(record_dt), record_dt, decimal=12
         )
 
+    def test_solver_starts_and_restarts_series_output(self):
+        # Given
+        if not has_h5py():
+            self.skipTest('h5py module is not present')
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+
+        def make_solver():
+            solver = Solver(integrator=self.integrator, tf=1.0, dt=0.1)
+            solver.set_output_directory(root)
+            solver.set_output_fname('sim')
+            solver.set_output_series(True)
+            solver.particles = [
+                get_particle_array(name='fluid', x=np.linspace(0, 1, 5))
+            ]
+            return solver
+
+        def run(solver, counts):
+            for count in counts:
+                solver.count = count
+                solver.t = 0.01*count
+                solver.dump_output()
+
+        # When
+        run(make_solver(), [0, 10, 20])
+        run(make_solver(), [0, 10, 20])
+
+        # Then
+        series = TimeSeries(os.path.join(root, 'sim_series.hdf5'))
+        npt.assert_array_equal(series.get_index()['count'], [0, 10, 20])
+
+        # When
+        solver = make_solver()
+        available = solver.load_output('?')
+        solver.load_output('10')
+        run(solver, [10, 15])
+
+        # Then
+        self.assertEqual(available, ['0', '10', '20'])
+        npt.assert_array_equal(series.get_index()['count'], [0, 10, 15])
+        self.assertRaises(IOError, solver.load_output, '20')
+
     def test_solver_honors_set_time_step(self):
         # Given
         dt = 0.1
@@ -109,6 +158,35 @@ class TestSolver(TestCase):
             np.max(np.abs(expected - record)) < 1e-12, error_message
         )
 
+    def test_solver_reorders_when_locality_degrades(self):
+        # Given
+        dt = 0.1
+        tf = 1.0
+        solver = Solver(
+            integrator=self.integrator, tf=tf, dt=dt, adaptive_timestep=False
+        )
+        solver.acceleration_evals = [self.a_eval]
+        pa = mock.Mock()
+        pa.get_number_of_particles.return_value = 10
+        solver.particles = [pa]
+        solver.dump_output = mock.Mock()
+        solver.nnps = mock.Mock()
+        # The metric just after each reorder and at each check.
+        metrics = [1.0, 1.5, 2.5, 1.0, 1.2, 1.8]
+        solver.nnps.get_locality_metric.side_effect = metrics
+        solver.set_max_steps(8)
+        solver.set_reorder_freq(2)
+        solver.set_reorder_threshold(2.0)
+
+        # When
+        solver.solve(show_progress=False)
+
+        # Then
+        self.assertEqual(solver.n_reorders, 2)
+        self.assertEqual(solver.nnps.morton_order_particles.call_count, 2)
+        self.assertEqual(solver.nnps.spatially_order_particles.call_count, 0)
+        self.assertEqual(solver.nnps.get_locality_metric.call_count, 6)
+
 
 if __name__ == '__main__':
     main()
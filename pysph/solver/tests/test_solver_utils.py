@@ -12,7 +12,10 @@ except ImportError:
     from unittest import TestCase, main, skipUnless
 
 from pysph.base.utils import get_particle_array, get_particle_array_wcsph
-from pysph.solver.utils import dump, load, dump_v1, get_files
+from pysph.solver.utils import (
+    dump, load, dump_v1, get_files, append_series, iter_output, TimeSeries
+)
+from pysph.solver.output import AsyncWriter
 
 
 class TestGetFiles(TestCase):
@@ -76,7 +79,8 @@ class TestOutputNumpy(TestCase):
         self.assertTrue(np.allclose(pa.y, pa1.y, atol=1e-14))
 
     def test_dump_and_load_works_with_compress(self):
-        x = np.linspace(0, 1.0, 10)
+        # Use enough particles that compression pays off.
+        x = np.linspace(0, 1.0, 1000)
         y = x*2.0
         dt = 1.0
         pa = get_particle_array(name='fluid', x=x, y=y)
@@ -152,6 +156,67 @@ class TestOutputNumpy(TestCase):
         self.assertEqual(set(pa.output_property_arrays), set(output_arrays))
         self.assertEqual(set(pa1.output_property_arrays), set(output_arrays))
 
+    def test_lazy_load_reads_only_requested_properties(self):
+        # Given
+        x = np.linspace(0, 1.0, 10)
+        pa = get_particle_array_wcsph(name='fluid', x=x, y=2*x,
+                                      constants={'c1': 1.0})
+        pa.add_property('A', data=2.0, stride=2)
+        pa.set_output_arrays(['x', 'y', 'A'])
+        fname = self._get_filename('simple')
+        dump(fname, [pa], solver_data={'dt': 1.0})
+
+        # When
+        data = load(fname, lazy=True, props=['x', 'A'])
+        pa1 = data['arrays']['fluid']
+
+        # Then
+        self.assertEqual(data['solver_data']['dt'], 1.0)
+        self.assertEqual(pa1.get_number_of_particles(), 10)
+        self.assertEqual(sorted(pa1.property_names), ['A', 'x'])
+        self.assertEqual(set(pa1.output_property_arrays),
+                         set(['x', 'y', 'A']))
+        self.assertTrue(np.allclose(pa1.x, x, atol=1e-14))
+        self.assertTrue(np.allclose(pa1.get('A'), 2.0, atol=1e-14))
+        self.assertTrue(np.allclose(pa1.c1, 1.0, atol=1e-14))
+        self.assertRaises(AttributeError, getattr, pa1, 'y')
+
+    def test_async_dump_writes_a_copy_of_the_data(self):
+        # Given
+        x = np.linspace(0, 1.0, 10)
+        pa = get_particle_array(name='fluid', x=x, constants={'c1': 1.0})
+        writer = AsyncWriter(max_pending=1)
+        fnames = [self._get_filename('async_%d' % i) for i in range(3)]
+
+        # When
+        for i, fname in enumerate(fnames):
+            dump(fname, [pa], solver_data={'count': i}, writer=writer)
+            # Changing the particles should not change the output.
+            pa.x[:] += 1.0
+            pa.c1[0] += 1.0
+        writer.close()
+
+        # Then
+        for i, fname in enumerate(fnames):
+            data = load(fname)
+            pa1 = data['arrays']['fluid']
+            self.assertEqual(data['solver_data']['count'], i)
+            self.assertTrue(np.allclose(pa1.x, x + i, atol=1e-14))
+            self.assertTrue(np.allclose(pa1.c1, 1.0 + i, atol=1e-14))
+
+    def test_async_writer_reraises_errors(self):
+        # Given
+        pa = get_particle_array(name='fluid', x=[0.0, 1.0])
+        writer = AsyncWriter()
+        fname = join(self.root, 'missing', 'error') + \
+            os.path.splitext(self._get_filename('x'))[1]
+
+        # When
+        dump(fname, [pa], solver_data={}, writer=writer)
+
+        # Then
+        self.assertRaises(Exception, writer.close)
+
 
 class TestOutputHdf5(TestOutputNumpy):
     @skipUnless(has_h5py(), "h5py module is not present")
@@ -162,6 +227,86 @@ class TestOutputHdf5(TestOutputNumpy):
         return join(self.root, fname) + '.hdf5'
 
 
+class TestOutputSeries(TestCase):
+    @skipUnless(has_h5py(), "h5py module is not present")
+    def setUp(self):
+        self.root = mkdtemp()
+        self.fname = join(self.root, 'sim_series.hdf5')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _dump_snapshots(self, n):
+        x = np.linspace(0, 1.0, 10)
+        pa = get_particle_array(name='fluid', x=x, constants={'c1': 1.0})
+        pa.add_property('A', data=2.0, stride=2)
+        pa.set_output_arrays(['x', 'A'])
+        for i in range(n):
+            solver_data = {'count': 10*i, 't': 0.1*i, 'dt': 0.1}
+            append_series(self.fname, [pa], solver_data)
+            pa.x[:] += 1.0
+            pa.A[:] += 1.0
+            pa.c1[0] += 1.0
+            # Change the number of particles.
+            pa.add_particles(x=[-1.0])
+        return pa
+
+    def test_append_and_load_snapshots(self):
+        # Given
+        self._dump_snapshots(3)
+
+        # When
+        series = TimeSeries(self.fname)
+        index = series.get_index()
+
+        # Then
+        self.assertEqual(len(series), 3)
+        np.testing.assert_array_equal(index['count'], [0, 10, 20])
+        np.testing.assert_allclose(index['t'], [0.0, 0.1, 0.2])
+        self.assertEqual(series.find(10), 1)
+        self.assertRaises(IndexError, series.find, 5)
+        for i in (0, 1, 2):
+            data = series.load(i)
+            pa = data['arrays']['fluid']
+            self.assertEqual(data['solver_data']['count'], 10*i)
+            self.assertEqual(pa.get_number_of_particles(), 10 + i)
+            x = np.linspace(0, 1.0, 10) + i
+            self.assertTrue(np.allclose(pa.x[:10], x, atol=1e-14))
+            self.assertTrue(np.allclose(pa.A[:20], 2.0 + i, atol=1e-14))
+            self.assertTrue(np.allclose(pa.c1, 1.0 + i, atol=1e-14))
+            self.assertEqual(set(pa.output_property_arrays), set(['x', 'A']))
+        self.assertEqual(series.load(-1)['solver_data']['count'], 20)
+
+    def test_load_and_iter_output_with_series(self):
+        # Given
+        self._dump_snapshots(3)
+
+        # When
+        files = get_files(self.root, 'sim')
+        counts = [sd['count'] for sd, fluid in iter_output(files, 'fluid')]
+
+        # Then
+        self.assertEqual(files, [self.fname])
+        self.assertEqual(counts, [0, 10, 20])
+        self.assertEqual(load(self.fname)['solver_data']['count'], 20)
+
+    def test_iter_output_lazily_with_series(self):
+        # Given
+        self._dump_snapshots(3)
+
+        # When
+        files = get_files(self.root, 'sim')
+        result = list(iter_output(files, 'fluid', props=['x']))
+
+        # Then
+        self.assertEqual(len(result), 3)
+        for i, (sd, fluid) in enumerate(result):
+            self.assertEqual(fluid.get_number_of_particles(), 10 + i)
+            x = np.linspace(0, 1.0, 10) + i
+            self.assertTrue(np.allclose(fluid.x[:10], x, atol=1e-14))
+            self.assertEqual(fluid.property_names, ['x'])
+
+
 class TestOutputNumpyV1(TestCase):
     def setUp(self):
         self.root = mkdtemp()
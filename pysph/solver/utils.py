@@ -11,6 +11,9 @@ import numpy
 
 import pysph
 from pysph.solver.output import load, dump, output_formats  # noqa: 401
+from pysph.solver.output import (  # noqa: 401
+    append_series, is_series, TimeSeries
+)
 from pysph.solver.output import gather_array_data as _gather_array_data
 
 ASCII_FMT = " 123456789#"
@@ -306,6 +309,11 @@ def get_files(dirname=None, fname=None, endswith=output_formats):
         part of the dirname.
     endswith: str
         The extension of the file to load.
+
+    If there are no files for the individual dumps but there is a time
+    series output file (see :py:func:`append_series`), a list with only
+    that file is returned, :py:func:`iter_output` iterates over all its
+    snapshots.
     """
 
     if dirname is None:
@@ -319,7 +327,10 @@ def get_files(dirname=None, fname=None, endswith=output_formats):
 
     # get all the output files in the directory
     files = [f for f in files if f.startswith(fname) and f.endswith(endswith)]
-    files = [os.path.join(path, f) for f in files]
+    series = [os.path.join(path, f) for f in files if is_series(f)]
+    files = [os.path.join(path, f) for f in files if not is_series(f)]
+    if len(files) == 0:
+        return series
 
     # sort the files
     def _key_func(arg):
@@ -331,11 +342,25 @@ def get_files(dirname=None, fname=None, endswith=output_formats):
     return files
 
 
-def iter_output(files, *arrays):
+def _iter_data(files, lazy=False, props=None):
+    for file in files:
+        if is_series(file):
+            series = TimeSeries(file)
+            for i in range(len(series)):
+                if lazy:
+                    yield series.load_lazy(i, props)
+                else:
+                    yield series.load(i)
+        else:
+            yield load(file, lazy=lazy, props=props)
+
+
+def iter_output(files, *arrays, **kw):
     """Given an iterable of the solution files, this loads the files, and
     yields the solver data and the requested arrays.
 
-    If arrays is not supplied, it returns a dictionary of the arrays.
+    If arrays is not supplied, it returns a dictionary of the arrays. All
+    the snapshots of time series output files are yielded.
 
     Parameters
     ----------
@@ -346,6 +371,13 @@ def iter_output(files, *arrays):
     *arrays : strings
         Optional series of array names of arrays to return.
 
+    lazy : bool
+        Yield light-weight views of the arrays that only read the properties
+        as they are accessed, see :py:func:`load`. Implied by `props`.
+
+    props : sequence(str)
+        Names of the only properties to make available.
+
     Examples
     --------
 
@@ -357,9 +389,16 @@ def iter_output(files, *arrays):
     >>> for solver_data, fluid in iter_output(files, 'fluid'):
     ...     print(solver_data['t'], fluid.name)
 
+    >>> for sd, fluid in iter_output(files, 'fluid', props=['m', 'u', 'v']):
+    ...     print(sd['t'], 0.5*numpy.sum(fluid.m*(fluid.u**2 + fluid.v**2)))
+
     """
-    for file in files:
-        data = load(file)
+    props = kw.pop('props', None)
+    lazy = kw.pop('lazy', props is not None)
+    if kw:
+        msg = "Unexpected keyword arguments: %s" % ', '.join(kw)
+        raise TypeError(msg)
+    for data in _iter_data(files, lazy, props):
         solver_data = data['solver_data']
         if len(arrays) == 0:
             yield solver_data, data['arrays']
@@ -6,8 +6,9 @@ except ImportError:
 
 from compyle.config import get_config
 from pysph.sph.equation import (
-    CUDAGroup, CythonGroup, Group, MultiStageEquations, OpenCLGroup,
-    get_arrays_used_in_equation)
+    Context, CUDAGroup, CythonGroup, Group, MultiStageEquations, OpenCLGroup,
+    get_arrays_used_in_equation, get_arrays_written_by_equation,
+    getfullargspec)
 
 
 ###############################################################################
@@ -28,6 +29,20 @@ def group_equations(equations):
         return equations
 
 
+def get_all_equations(groups):
+    """Return the equations in the given groups (and their sub-groups) in the
+    order in which they appear.
+    """
+    all_equations = []
+    for group in groups:
+        if group.has_subgroups:
+            for g in group.equations:
+                all_equations.extend(g.equations)
+        else:
+            all_equations.extend(group.equations)
+    return all_equations
+
+
 ###############################################################################
 def check_equation_array_properties(equation, particle_arrays):
     """Given an equation and the particle arrays, check if the particle arrays
@@ -74,7 +89,10 @@ def check_equation_array_properties(equation, particle_arrays):
 
 
 def make_acceleration_evals(particle_arrays, equations, kernel,
-                            mode='serial', backend=None):
+                            mode='serial', backend=None,
+                            cache_pair_values=False, virtual_periodic=False,
+                            fuse_groups=False, symmetric_loops=False,
+                            compressed_neighbors=False):
     '''Returns a list of acceleration evaluators.
 
     If a MultiStageEquations object is given the resulting list will have
@@ -85,11 +103,321 @@ def make_acceleration_evals(particle_arrays, equations, kernel,
     else:
         groups = [equations]
     return [
-        AccelerationEval(particle_arrays, group, kernel, mode, backend)
+        AccelerationEval(particle_arrays, group, kernel, mode, backend,
+                         cache_pair_values, virtual_periodic, fuse_groups,
+                         symmetric_loops, compressed_neighbors)
         for group in groups
     ]
 
 
+###############################################################################
+def setup_symmetric_loops(mega_groups):
+    """Use the symmetric pair loop for all neighbor loops where the
+    destination and source are the same and some of the equations define a
+    symmetric ``loop_pair``. Loops where an equation modifies a precomputed
+    symbol like ``DWIJ`` are not changed as the symbol is then no longer
+    the same for both particles of a pair. Returns True if any such loop
+    was found.
+    """
+    found = False
+    for mega_group in mega_groups:
+        if mega_group.has_subgroups:
+            groups = mega_group.data
+        else:
+            groups = [mega_group]
+        for group in groups:
+            for dest, (eqs_with_no_source, sources, all_eqs) in \
+                    group.data.items():
+                for source, eq_group in sources.items():
+                    if source == dest and eq_group.has_loop_pair() and \
+                       len(eq_group.get_precomputed_writes()) == 0:
+                        eq_group.set_symmetric(True)
+                        found = True
+    return found
+
+
+_POSITION_ARRAYS = set(
+    prefix + prop for prefix in ('d_', 's_') for prop in ('x', 'y', 'z', 'h')
+)
+
+
+def _changes_positions(group):
+    for equation in group.equations:
+        if get_arrays_written_by_equation(equation) & _POSITION_ARRAYS:
+            return True
+    return False
+
+
+def setup_periodic_images(mega_groups):
+    """Use the nearest periodic image of the sources in all the loops over
+    neighbors, see :py:meth:`pysph.sph.equation.Group.set_periodic_images`.
+    """
+    for mega_group in mega_groups:
+        if mega_group.has_subgroups:
+            groups = mega_group.data
+        else:
+            groups = [mega_group]
+        for group in groups:
+            for dest, (eqs_with_no_source, sources, all_eqs) in \
+                    group.data.items():
+                for source, eq_group in sources.items():
+                    eq_group.set_periodic_images(True)
+
+
+def _get_neighbor_loops(mega_groups):
+    """Return a list of (segment, dest, source, real, group) for each loop
+    over neighbors in the order in which these are executed. Positions and
+    smoothing lengths are unchanged for loops with the same segment number.
+    """
+    loops = []
+    segment = 0
+    for mega_group in mega_groups:
+        if mega_group.has_subgroups:
+            groups = mega_group.data
+        else:
+            groups = [mega_group]
+        if mega_group.iterate:
+            segment += 1
+        start = segment
+        group_loops = []
+        for group in groups:
+            if group.pre:
+                segment += 1
+            for dest, (eqs_with_no_source, sources, all_eqs) in \
+                    group.data.items():
+                changes = _changes_positions(all_eqs)
+                if changes:
+                    segment += 1
+                for source, eq_group in sources.items():
+                    if eq_group.has_loop():
+                        group_loops.append(
+                            (segment, dest, source, group.real, eq_group)
+                        )
+                if changes:
+                    segment += 1
+            if group.update_nnps or group.post:
+                segment += 1
+        if mega_group.iterate:
+            # Values cannot be shared when the positions change within an
+            # iteration as the next iteration would read stale values.
+            if segment == start:
+                loops.extend(group_loops)
+            segment += 1
+        else:
+            loops.extend(group_loops)
+    return loops
+
+
+def setup_pair_cache(mega_groups):
+    """Setup the groups to share pairwise precomputed symbols.
+
+    The precomputed symbols that depend only on the positions and smoothing
+    lengths (see ``PAIR_CACHEABLE_SYMBOLS``) and are used by more than one
+    loop over the same destination and source are stored per neighbor pair
+    by the first loop and read back by the others. Symbols are never shared
+    across ``pre``/``post`` callbacks, NNPS updates or equations that change
+    the positions or smoothing lengths.
+
+    Returns the number of cache buffers required and a list of (dest,
+    source, symbols, stride) for each shared set of symbols where stride is
+    the number of values stored per pair.
+    """
+    keyed = OrderedDict()
+    for segment, dest, source, real, group in _get_neighbor_loops(
+            mega_groups):
+        keyed.setdefault((segment, dest, source, real), []).append(group)
+
+    buffers = {}
+    info = []
+    for (segment, dest, source, real), groups in keyed.items():
+        users = defaultdict(list)
+        for group in groups:
+            for sym in group.get_pair_cacheable_symbols():
+                users[sym].append(group)
+        shared = sorted(sym for sym, u in users.items() if len(u) > 1)
+        if len(shared) == 0:
+            continue
+
+        slots = {}
+        stride = 0
+        for sym in shared:
+            slots[sym] = stride
+            value = Group.pre_comp[sym].context[sym]
+            stride += len(value) if isinstance(value, (list, tuple)) else 1
+
+        index = buffers.setdefault((dest, source, real), len(buffers))
+        setup = True
+        for group in groups:
+            symbols = [sym for sym in shared if group in users[sym]]
+            if len(symbols) == 0:
+                continue
+            stores = [sym for sym in symbols if users[sym][0] is group]
+            loads = [sym for sym in symbols if users[sym][0] is not group]
+            group.set_pair_cache(Context(
+                index=index, stride=stride, slots=slots, loads=loads,
+                stores=stores, setup=setup
+            ))
+            setup = False
+        info.append((dest, source, shared, stride))
+
+    return len(buffers), info
+
+
+def _get_qualified_names(equation, names):
+    """Return the set of (array, property) for the ``d_``/``s_`` names used
+    by the equation.
+    """
+    result = set()
+    for name in names:
+        prop = name[2:]
+        if name.startswith('d_'):
+            result.add((equation.dest, prop))
+        elif not equation.no_source:
+            result.update((src, prop) for src in equation.sources)
+    return result
+
+
+def _get_precomputed_arrays(equation):
+    """Return the arrays used to compute the precomputed symbols, for
+    example ``d_h`` and ``s_h`` for ``WIJ``, used by the equation.
+    """
+    pre_comp = Group.pre_comp
+    todo = set()
+    for meth_name in ('initialize_pair', 'loop', 'loop_all'):
+        meth = getattr(equation, meth_name, None)
+        if meth is not None:
+            todo.update(x for x in getfullargspec(meth).args if x in pre_comp)
+    arrays = set()
+    done = set()
+    while todo:
+        sym = todo.pop()
+        done.add(sym)
+        block = pre_comp[sym]
+        arrays.update(block.src_arrays)
+        arrays.update(block.dest_arrays)
+        todo.update(
+            x for x in block.symbols if x in pre_comp and x not in done
+        )
+    return arrays
+
+
+def _get_group_reads_writes(group):
+    """Return the (array, property) read and written by the group's equations.
+    Every array in the signatures, or used by the precomputed symbols in
+    them, is considered to be read.
+    """
+    reads, writes = set(), set()
+    for equation in group.equations:
+        src, dest = get_arrays_used_in_equation(equation)
+        used = src | dest | _get_precomputed_arrays(equation)
+        reads.update(_get_qualified_names(equation, used))
+        writes.update(_get_qualified_names(
+            equation, get_arrays_written_by_equation(equation)
+        ))
+    return reads, writes
+
+
+def _format_names(names):
+    return ', '.join(sorted('%s.%s' % x for x in names))
+
+
+def _get_fusion_blocker(first, second, reads, writes):
+    """Return why the group `second` cannot be merged into the preceding
+    group `first`, or None if it can. `reads` and `writes` are those of
+    `first`.
+
+    In a merged group, the ``initialize`` of the equations of `second` would
+    run before the ``loop`` of those in `first` and the sources of `second`
+    would not be complete, so no property written by one group may be used by
+    the other.
+    """
+    if first.has_subgroups or second.has_subgroups:
+        return 'has sub-groups'
+    if first.iterate or second.iterate:
+        return 'is iterated'
+    if first.update_nnps:
+        return 'the previous group updates the NNPS'
+    if first.post is not None or second.pre is not None:
+        return 'has pre/post callbacks'
+    if first.real != second.real:
+        return 'the real flags differ'
+    if any(hasattr(eq, 'reduce') for eq in first.equations):
+        return 'the previous group has a reduce'
+    if any(hasattr(eq, 'py_initialize') for eq in second.equations):
+        return 'has a py_initialize'
+    _reads, _writes = _get_group_reads_writes(second)
+    if writes & _reads:
+        return 'reads %s written before' % _format_names(writes & _reads)
+    if _writes & reads:
+        return 'writes %s used before' % _format_names(_writes & reads)
+    return None
+
+
+def _make_group_like(group, equations, **kw):
+    args = dict(
+        real=group.real, update_nnps=group.update_nnps,
+        iterate=group.iterate, max_iterations=group.max_iterations,
+        min_iterations=group.min_iterations, pre=group.pre, post=group.post
+    )
+    args.update(kw)
+    return group.__class__(equations=equations, **args)
+
+
+def fuse_adjacent_groups(groups, prefix='group '):
+    """Merge adjacent groups that do not depend on each other so that their
+    neighbor loops are done in a single sweep.
+
+    Two groups are merged when no property (of any array) written by one is
+    used by the other, see ``_get_fusion_blocker`` for the other conditions.
+    The sub-groups of a group are also merged. Returns the list of groups and
+    a report as a list of strings.
+    """
+    result = []
+    report = []
+    block = []
+    reads = writes = None
+    for index, group in enumerate(groups):
+        name = '%s%d' % (prefix, index)
+        if group.has_subgroups:
+            sub_groups, sub_report = fuse_adjacent_groups(
+                group.equations, prefix=name + '.'
+            )
+            report.extend(sub_report)
+            if len(sub_groups) < len(group.equations):
+                group = _make_group_like(group, sub_groups)
+
+        reason = None
+        if block:
+            reason = _get_fusion_blocker(result[-1], group, reads, writes)
+        if block and reason is None:
+            result[-1] = _make_group_like(
+                result[-1], result[-1].equations + group.equations,
+                update_nnps=group.update_nnps, post=group.post
+            )
+            block.append(name)
+            _reads, _writes = _get_group_reads_writes(group)
+            reads |= _reads
+            writes |= _writes
+            continue
+
+        if len(block) > 1:
+            report.append('Fused %s.' % ', '.join(block))
+        if reason is not None:
+            report.append('Not fusing %s with %s: %s.' % (
+                name, block[-1], reason
+            ))
+        result.append(group)
+        block = [name]
+        if group.has_subgroups:
+            reads, writes = set(), set()
+        else:
+            reads, writes = _get_group_reads_writes(group)
+
+    if len(block) > 1:
+        report.append('Fused %s.' % ', '.join(block))
+    return result, report
+
+
 ###############################################################################
 class MegaGroup(object):
     """A mega-group refactors actual equation Groups into a more
@@ -164,7 +492,9 @@ class MegaGroup(object):
 ###############################################################################
 class AccelerationEval(object):
     def __init__(self, particle_arrays, equations, kernel, mode='serial',
-                 backend=None):
+                 backend=None, cache_pair_values=False, virtual_periodic=False,
+                 fuse_groups=False, symmetric_loops=False,
+                 compressed_neighbors=False):
         """
 
         Parameters
@@ -176,11 +506,35 @@ class AccelerationEval(object):
         mode: str: One of 'serial', 'mpi'.
         backend: str: indicates the backend to use.
             one of ('opencl', 'cython', 'cuda', '', None)
+        cache_pair_values: bool: store the precomputed symbols shared by
+            several groups per neighbor pair and reuse them, only supported
+            with the cython backend.
+        virtual_periodic: bool: the domain is periodic without any ghost
+            particles and the nearest periodic image of the neighbors is
+            used, only supported with the cython backend.
+        fuse_groups: bool: merge adjacent groups that do not use each
+            other's results into a single loop over the neighbors, see
+            :py:func:`fuse_adjacent_groups`. The `fusion_report` attribute
+            lists the groups that were fused and why the others were not.
+        symmetric_loops: bool: evaluate the equations with a symmetric
+            ``loop_pair`` once per pair of particles when the destination
+            and source are the same, see :py:func:`setup_symmetric_loops`.
+            This requires the neighbors to be symmetric and is only
+            supported with the cython backend.
+        compressed_neighbors: bool: generate the code to decode the
+            neighbors of an NNPS using
+            :py:meth:`pysph.base.nnps_base.NNPS.set_cache_compression`,
+            only supported with the cython backend.
         """
         assert backend in ('opencl', 'cython', 'cuda', '', None)
         self.backend = self._get_backend(backend)
         self.particle_arrays = particle_arrays
         self.equation_groups = group_equations(equations)
+        self.fusion_report = []
+        if fuse_groups:
+            self.equation_groups, self.fusion_report = fuse_adjacent_groups(
+                self.equation_groups
+            )
         self.kernel = kernel
         self.nnps = None
         self.mode = mode
@@ -191,13 +545,7 @@ class AccelerationEval(object):
         elif self.backend == 'cuda':
             self.Group = CUDAGroup
 
-        all_equations = []
-        for group in self.equation_groups:
-            if group.has_subgroups:
-                for g in group.equations:
-                    all_equations.extend(g.equations)
-            else:
-                all_equations.extend(group.equations)
+        all_equations = get_all_equations(self.equation_groups)
         self.all_group = self.Group(equations=all_equations)
 
         for equation in all_equations:
@@ -205,6 +553,24 @@ class AccelerationEval(object):
 
         self.mega_groups = [MegaGroup(g, self.Group)
                             for g in self.equation_groups]
+        if symmetric_loops and self.backend == 'cython':
+            if setup_symmetric_loops(self.mega_groups):
+                self.all_group.set_symmetric(True)
+        self.compressed_neighbors = compressed_neighbors and \
+            self.backend == 'cython'
+        self.virtual_periodic = virtual_periodic
+        if virtual_periodic:
+            if self.backend != 'cython':
+                raise NotImplementedError(
+                    'Virtual periodic images are only supported with the '
+                    'cython backend.'
+                )
+            setup_periodic_images(self.mega_groups)
+        self.n_pair_cache_buffers = 0
+        self.pair_cache_info = []
+        if cache_pair_values and self.backend == 'cython':
+            self.n_pair_cache_buffers, self.pair_cache_info = \
+                setup_pair_cache(self.mega_groups)
         self.c_acceleration_eval = None
 
     ##########################################################################
@@ -230,6 +596,28 @@ class AccelerationEval(object):
         """
         self.c_acceleration_eval.compute(t, dt)
 
+    def get_pair_cache_nbytes(self):
+        """Return the memory used by the pair cache in bytes.
+        """
+        if self.n_pair_cache_buffers == 0:
+            return 0
+        return self.c_acceleration_eval.get_pair_cache_nbytes()
+
+    def get_residual_history(self):
+        """Return the residuals of each iteration of the last call to
+        compute as a dictionary of numpy arrays keyed on the ``var_name`` of
+        the equations which define a ``residual`` method.
+        """
+        if self.backend != 'cython':
+            raise NotImplementedError(
+                'The residual history is only supported with the cython '
+                'backend.'
+            )
+        history = self.c_acceleration_eval.residual_history
+        return dict(
+            (name, arr.get_npy_array().copy()) for name, arr in history.items()
+        )
+
     def set_compiled_object(self, c_acceleration_eval):
         """Set the high-performance compiled object to call internally.
         """
@@ -239,6 +627,65 @@ class AccelerationEval(object):
         self.nnps = nnps
         self.c_acceleration_eval.set_nnps(nnps)
 
+    def update_equations(self, equations):
+        """Set the parameters of the equations used by this evaluator from
+        the given equations, without generating or compiling any code.
+
+        The given equations must be structured exactly like the ones this
+        evaluator was created with, i.e. the same equation classes in the
+        same order and with the same destination and sources, only the
+        values of their numerical parameters may differ.  This is useful for
+        parameter sweeps, for example::
+
+            a_eval.update_equations(scheme.get_equations())
+
+        Parameters
+        ----------
+
+        equations: list: A list of equations/groups.
+        """
+        if self.backend != 'cython':
+            raise NotImplementedError(
+                'Updating the equations is only supported with the cython '
+                'backend.'
+            )
+        new_equations = get_all_equations(group_equations(equations))
+        old_equations = self.all_group.equations
+        if len(new_equations) != len(old_equations):
+            raise ValueError(
+                'Expected %d equations but got %d.' %
+                (len(old_equations), len(new_equations))
+            )
+        updates = []
+        for old, new in zip(old_equations, new_equations):
+            data = dict(new.__dict__)
+            data.pop('var_name', None)
+            if type(old) is not type(new) or old.dest != new.dest or \
+               old.sources != new.sources or \
+               set(data) != set(old.__dict__) - set(['var_name']):
+                raise ValueError(
+                    'The equation %r does not match %r, the code needs to '
+                    'be generated again.' % (new, old)
+                )
+            wrapper = None
+            if self.c_acceleration_eval is not None:
+                wrapper = getattr(self.c_acceleration_eval, old.var_name)
+            for name, value in data.items():
+                if wrapper is not None and \
+                   isinstance(getattr(wrapper, name), int) and \
+                   isinstance(value, float) and value != int(value):
+                    raise ValueError(
+                        'The integer parameter %s of %r cannot be set to %r.'
+                        % (name, old, value)
+                    )
+            updates.append((old, wrapper, data))
+
+        for old, wrapper, data in updates:
+            old.__dict__.update(data)
+            if wrapper is not None:
+                for name, value in data.items():
+                    setattr(wrapper, name, value)
+
     def update_particle_arrays(self, particle_arrays):
         """Call this to update the particle arrays with new ones.  Make sure
         though that the same properties exist in both or you will get a
@@ -23,6 +23,8 @@ ${indent(helper.get_pre_call(group), 0)}
 ## Setup destination array pointers.
 #######################################################################
 
+<% g_label = helper.get_group_label(group) %>\
+${indent(helper.get_timer_start('_pt_dest'), 0)}
 dst = self.${dest}
 ${indent(helper.get_dest_array_setup(dest, eqs_with_no_source, sources, group.real), 0)}
 dst_array_index = dst.index
@@ -36,8 +38,10 @@ ${indent(all_eqs.get_py_initialize_code(), 0)}
 #######################################################################
 % if all_eqs.has_initialize():
 # Initialization for destination ${dest}.
-for d_idx in range(NP_DEST):
-    ${indent(all_eqs.get_initialize_code(helper.object.kernel), 1)}
+${indent(helper.get_timer_start('_pt_phase'), 0)}
+${helper.get_dest_loop(all_eqs, 'initialize')}
+        ${indent(all_eqs.get_initialize_code(helper.object.kernel), 2)}
+${indent(helper.get_timer_stop('_pt_phase', g_label + '/' + dest + '/initialize', all_eqs), 0)}
 % endif
 #######################################################################
 ## Handle all the equations that do not have a source.
@@ -45,8 +49,10 @@ for d_idx in range(NP_DEST):
 % if len(eqs_with_no_source.equations) > 0:
 % if eqs_with_no_source.has_loop():
 # SPH Equations with no sources.
-for d_idx in range(NP_DEST):
-    ${indent(eqs_with_no_source.get_loop_code(helper.object.kernel), 1)}
+${indent(helper.get_timer_start('_pt_phase'), 0)}
+${helper.get_dest_loop(eqs_with_no_source, 'loop')}
+        ${indent(eqs_with_no_source.get_loop_code(helper.object.kernel), 2)}
+${indent(helper.get_timer_stop('_pt_phase', g_label + '/' + dest + '/loop', eqs_with_no_source), 0)}
 % endif
 % endif
 #######################################################################
@@ -59,13 +65,14 @@ for d_idx in range(NP_DEST):
 ## Setup source array pointers.
 #######################################################################
 
+${indent(helper.get_timer_start('_pt_phase'), 0)}
 src = self.${source}
 ${indent(helper.get_src_array_setup(source, eq_group), 0)}
 src_array_index = src.index
 
 % if eq_group.has_initialize_pair():
-for d_idx in range(NP_DEST):
-    ${indent(eq_group.get_initialize_pair_code(helper.object.kernel), 1)}
+${helper.get_dest_loop(eq_group, 'initialize_pair')}
+        ${indent(eq_group.get_initialize_pair_code(helper.object.kernel), 2)}
 % endif
 
 % if eq_group.has_loop() or eq_group.has_loop_all():
@@ -73,29 +80,75 @@ for d_idx in range(NP_DEST):
 ## Iterate over destination particles.
 #######################################################################
 nnps.set_context(src_array_index, dst_array_index)
+% if eq_group.pair_cache is not None:
+${indent(helper.get_pair_cache_setup(eq_group), 0)}
+% endif
+% if eq_group.symmetric:
+${indent(helper.get_symmetric_buffer_setup(eq_group), 0)}
+% endif
 
-${helper.get_parallel_block()}
+% for loop_all_code, loop_code in helper.get_neighbor_loops(eq_group):
+## The symmetric equations are always in the last loop.
+${helper.get_parallel_block(eq_group.symmetric and loop.last)}
     thread_id = threadid()
     ${indent(eq_group.get_variable_array_setup(), 1)}
+% if eq_group.symmetric and loop.last:
+    ${indent(helper.get_symmetric_thread_setup(eq_group), 1)}
+% endif
     for d_idx in ${helper.get_parallel_range("NP_DEST")}:
         ###############################################################
         ## Find and iterate over neighbors.
         ###############################################################
+% if loop_all_code:
+        nnps.get_nearest_neighbors(d_idx, <UIntArray>self.nbrs[thread_id])
+        NBRS = (<UIntArray>self.nbrs[thread_id]).data
+        N_NBRS = (<UIntArray>self.nbrs[thread_id]).length
+        ${indent(loop_all_code, 2)}
+% elif helper.object.compressed_neighbors:
+        ## Compressed neighbors are decoded while iterating over them.
+        ZNBRS = nnps.get_compressed_neighbors(d_idx)
+        if ZNBRS == NULL:
+            nnps.get_nearest_neighbors(d_idx, <UIntArray>self.nbrs[thread_id])
+            NBRS = (<UIntArray>self.nbrs[thread_id]).data
+            N_NBRS = (<UIntArray>self.nbrs[thread_id]).length
+        else:
+            N_NBRS = ZNBRS[0]
+            ZPOS = 1
+            if N_NBRS == 0xFFFF:
+                N_NBRS = ZNBRS[1] | (<unsigned int>ZNBRS[2] << 16)
+                ZPOS = 3
+        s_idx = 0
+% else:
         nnps.get_nearest_neighbors(d_idx, <UIntArray>self.nbrs[thread_id])
         NBRS = (<UIntArray>self.nbrs[thread_id]).data
         N_NBRS = (<UIntArray>self.nbrs[thread_id]).length
-% if eq_group.has_loop_all():
-        ${indent(eq_group.get_loop_all_code(helper.object.kernel), 2)}
 % endif
-% if eq_group.has_loop():
+% if loop_code:
         for nbr_idx in range(N_NBRS):
+% if loop_all_code or not helper.object.compressed_neighbors:
             s_idx = <long>(NBRS[nbr_idx])
+% else:
+            if ZNBRS == NULL:
+                s_idx = <long>(NBRS[nbr_idx])
+            else:
+                ZDELTA = ZNBRS[ZPOS]
+                ZPOS = ZPOS + 1
+                if ZDELTA == 0xFFFF:
+                    ZDELTA = ZNBRS[ZPOS] | (<unsigned int>ZNBRS[ZPOS + 1] << 16)
+                    ZPOS = ZPOS + 2
+                s_idx = s_idx + ZDELTA
+% endif
             ###########################################################
             ## Iterate over the equations for the same set of neighbors.
             ###########################################################
-            ${indent(eq_group.get_loop_code(helper.object.kernel), 3)}
-% endif ## if has_loop
+            ${indent(loop_code, 3)}
+% endif ## if loop_code
+% endfor
+% if eq_group.symmetric:
+${indent(helper.get_symmetric_reduction(eq_group), 0)}
+% endif
 % endif ## if eq_group.has_loop() or has_loop_all():
+${indent(helper.get_timer_stop('_pt_phase', g_label + '/' + dest + '<-' + source + '/loop', eq_group), 0)}
 # Source ${source} done.
 # --------------------------------------
 % endfor
@@ -104,16 +157,34 @@ ${helper.get_parallel_block()}
 ###################################################################
 % if all_eqs.has_post_loop():
 # Post loop for destination ${dest}.
-for d_idx in range(NP_DEST):
-    ${indent(all_eqs.get_post_loop_code(helper.object.kernel), 1)}
+${indent(helper.get_timer_start('_pt_phase'), 0)}
+${helper.get_dest_loop(all_eqs, 'post_loop')}
+        ${indent(all_eqs.get_post_loop_code(helper.object.kernel), 2)}
+${indent(helper.get_timer_stop('_pt_phase', g_label + '/' + dest + '/post_loop', all_eqs), 0)}
+% endif
+
+###################################################################
+## Reduce the residuals of the equations over the destination.
+###################################################################
+% if all_eqs.has_residual():
+# Residuals for destination ${dest}.
+${indent(helper.get_timer_start('_pt_phase'), 0)}
+${indent(helper.get_residual_setup(all_eqs), 0)}
+${helper.get_dest_loop(all_eqs, 'residual')}
+        ${indent(helper.get_residual_code(all_eqs), 2)}
+${indent(helper.get_residual_reduction(all_eqs), 0)}
+${indent(helper.get_timer_stop('_pt_phase', g_label + '/' + dest + '/residual', all_eqs), 0)}
 % endif
 
 ###################################################################
 ## Do any reductions for the destination.
 ###################################################################
 % if all_eqs.has_reduce():
+${indent(helper.get_timer_start('_pt_phase'), 0)}
 ${indent(all_eqs.get_reduce_code(), 0)}
+${indent(helper.get_timer_stop('_pt_phase', g_label + '/' + dest + '/reduce', all_eqs), 0)}
 % endif
+${indent(helper.get_timer_stop('_pt_dest', g_label + '/' + dest, all_eqs), 0)}
 
 # Destination ${dest} done.
 # ---------------------------------------------------------------------
@@ -123,8 +194,10 @@ ${indent(all_eqs.get_reduce_code(), 0)}
 #######################################################################
 % if group.update_nnps:
 # Updating NNPS.
+${indent(helper.get_timer_start('_pt_phase'), 0)}
 nnps.update_domain()
 nnps.update()
+${indent(helper.get_timer_stop('_pt_phase', g_label + '/update_nnps'), 0)}
 % endif
 
 % endfor
@@ -158,11 +231,28 @@ from pysph.base.reduce_array import mpi_reduce_array as parallel_reduce_array
 % endif
 
 from pysph.base.nnps import get_number_of_threads
-from cyarray.carray cimport (DoubleArray, FloatArray, IntArray, LongArray, UIntArray,
-    aligned, aligned_free, aligned_malloc)
+% if helper.config.profile:
+from pysph.sph.profile import get_profiler
+from timeit import default_timer as _timer
+% endif
+from cyarray.carray cimport (BaseArray, DoubleArray, FloatArray, IntArray,
+    LongArray, UIntArray, aligned, aligned_free, aligned_malloc)
 
 ${helper.get_header()}
 
+% if helper.object.virtual_periodic:
+cdef inline void nearest_image(double* xij, double* length) nogil:
+    # Use the nearest periodic image of the source, the length is zero along
+    # the directions which are not periodic.
+    cdef int i
+    for i in range(3):
+        if length[i] > 0.0:
+            if xij[i] > 0.5*length[i]:
+                xij[i] = xij[i] - length[i]
+            elif xij[i] < -0.5*length[i]:
+                xij[i] = xij[i] + length[i]
+% endif
+
 # #############################################################################
 cdef class ParticleArrayWrapper:
     cdef public int index
@@ -197,8 +287,19 @@ cdef class AccelerationEval:
     cdef public int n_threads
     cdef public list _nbr_refs
     cdef void **nbrs
+    # Cache of precomputed values shared by groups for each neighbor pair.
+    cdef public list _pair_cache_offsets, _pair_cache_values
+    # Per-thread buffers for the updates in symmetric pair loops.
+    cdef public dict _symmetric_buffers
+    # The residual of each iteration of the last call to compute for the
+    # equations with a residual.
+    cdef public dict residual_history
+    # Accumulates the timings when profiling.
+    cdef object _profiler
     # CFL time step conditions
     cdef public double dt_cfl, dt_force, dt_viscous
+    # Lengths of the periodic domain for virtual periodic images.
+    cdef double periodic_length[3]
     cdef object groups
     cdef object all_equations
     ${indent(helper.get_kernel_defs(), 1)}
@@ -222,6 +323,20 @@ cdef class AccelerationEval:
             self.nbrs[i] = <void*>_arr
             self._nbr_refs.append(_arr)
 
+        self._pair_cache_offsets = [
+            LongArray() for i in range(${helper.object.n_pair_cache_buffers})
+        ]
+        self._pair_cache_values = [
+            DoubleArray() for i in range(${helper.object.n_pair_cache_buffers})
+        ]
+        self._symmetric_buffers = {}
+        self.residual_history = dict(
+            (name, DoubleArray()) for name in ${helper.get_residual_names()}
+        )
+        % if helper.config.profile:
+        self._profiler = get_profiler()
+        % endif
+
         ${indent(helper.get_kernel_init(), 2)}
         ${indent(helper.get_equation_init(), 2)}
         all_equations = {}
@@ -233,18 +348,84 @@ cdef class AccelerationEval:
         aligned_free(self.nbrs)
 
     def set_nnps(self, NNPS nnps):
+        % if not helper.object.compressed_neighbors:
+        if any(cache.compress for cache in nnps.cache):
+            raise RuntimeError(
+                'The NNPS compresses the cached neighbors, use '
+                'compressed_neighbors=True for the AccelerationEval.'
+            )
+        % endif
         self.nnps = nnps
+        % if helper.object.virtual_periodic:
+        manager = nnps.domain.manager
+        lengths = [
+            manager.xtranslate if manager.periodic_in_x else 0.0,
+            manager.ytranslate if manager.periodic_in_y else 0.0,
+            manager.ztranslate if manager.periodic_in_z else 0.0
+        ]
+        for i in range(3):
+            self.periodic_length[i] = lengths[i]
+        % endif
 
     def update_particle_arrays(self, particle_arrays):
         for pa in particle_arrays:
             name = pa.name
             getattr(self, name).set_array(pa)
 
+    def get_pair_cache_nbytes(self):
+        cdef LongArray offsets
+        cdef DoubleArray values
+        cdef long nbytes = 0
+        for offsets in self._pair_cache_offsets:
+            nbytes += offsets.alloc*sizeof(long)
+        for values in self._pair_cache_values:
+            nbytes += values.alloc*sizeof(double)
+        return nbytes
+
+    cdef BaseArray _get_symmetric_buffer(self, name, cls, long size):
+        # Return a carray of the type cls with per-thread buffers of the
+        # given size for the property.
+        cdef BaseArray buffer
+        key = (name, cls)
+        if key not in self._symmetric_buffers:
+            self._symmetric_buffers[key] = cls()
+        buffer = self._symmetric_buffers[key]
+        buffer.resize(size*self.n_threads)
+        return buffer
+
+    cdef _setup_pair_cache(self, int index, long np_dest, int stride):
+        # Find the offset of the values for the neighbors of each
+        # destination particle in the pair cache and resize it to fit.
+        cdef LongArray offsets = self._pair_cache_offsets[index]
+        cdef DoubleArray values = self._pair_cache_values[index]
+        cdef NNPS nnps = self.nnps
+        cdef long d_idx
+        cdef long* counts
+        cdef int thread_id
+        offsets.resize(np_dest + 1)
+        counts = offsets.data
+        ${helper.get_parallel_block()}
+            thread_id = threadid()
+            for d_idx in ${helper.get_parallel_range("np_dest")}:
+                nnps.get_nearest_neighbors(
+                    d_idx, <UIntArray>self.nbrs[thread_id]
+                )
+                counts[d_idx + 1] = (<UIntArray>self.nbrs[thread_id]).length
+        counts[0] = 0
+        for d_idx in range(np_dest):
+            counts[d_idx + 1] += counts[d_idx]
+        values.resize(counts[np_dest]*stride)
+
     cpdef compute(self, double t, double dt):
         cdef long nbr_idx, NP_SRC, NP_DEST
         cdef long s_idx, d_idx
         cdef int thread_id, N_NBRS
         cdef unsigned int* NBRS
+        % if helper.object.compressed_neighbors:
+        cdef unsigned short* ZNBRS
+        cdef long ZPOS
+        cdef unsigned int ZDELTA
+        % endif
         cdef NNPS nnps = self.nnps
         cdef ParticleArrayWrapper src, dst
 
@@ -261,7 +442,21 @@ cdef class AccelerationEval:
         # Variables.\
 
         cdef int src_array_index, dst_array_index
+        % if helper.object.n_pair_cache_buffers > 0:
+        cdef long* _pc_offsets
+        cdef double* _pc_values
+        cdef double* _pc_record
+        % endif
+        ${indent(helper.get_symmetric_declarations(), 2)}
+        ${indent(helper.get_residual_declarations(), 2)}
+        % if helper.config.profile:
+        cdef double _pt_group, _pt_dest, _pt_phase
+        % endif
         ${indent(helper.get_variable_declarations(), 2)}
+        % if len(helper.get_residual_names()) > 0:
+        for _history in self.residual_history.values():
+            (<DoubleArray>_history).reset()
+        % endif
         #######################################################################
         ## Iterate over groups:
         ## Groups are organized as {destination: (eqs_with_no_source, sources, all_eqs)}
@@ -273,6 +468,7 @@ cdef class AccelerationEval:
         % if len(group.data) > 0: # No equations in this group.
         # ---------------------------------------------------------------------
         # Group ${g_idx}.
+        ${indent(helper.get_timer_start('_pt_group'), 2)}
         % if group.iterate:
         max_iterations = ${group.max_iterations}
         min_iterations = ${group.min_iterations}
@@ -302,6 +498,7 @@ cdef class AccelerationEval:
             _iteration_count += 1
             % endif
 
+        ${indent(helper.get_timer_stop('_pt_group', helper.get_group_label(group)), 2)}
         # Group ${g_idx} done.
         # ---------------------------------------------------------------------
         % endif # (if len(group.data) > 0)
@@ -1,5 +1,5 @@
 from collections import defaultdict
-from os.path import dirname, join, expanduser, realpath
+from os.path import dirname, join, realpath
 
 from mako.template import Template
 from cyarray import carray
@@ -7,7 +7,9 @@ from cyarray import carray
 from compyle.config import get_config
 from compyle.cython_generator import (CythonGenerator, KnownType,
                                       get_parallel_range)
-from compyle.ext_module import ExtModule, get_platform_dir
+
+from .compile_cache import CachedExtModule
+from .equation import get_residual_op
 
 
 ###############################################################################
@@ -107,6 +109,22 @@ def get_known_types_for_arrays(array_names):
     return result
 
 
+# The initial value of the per-thread buffers for each kind of pair update.
+_PAIR_UPDATE_IDENTITY = {'sum': '0.0', 'max': '-1e300', 'min': '1e300'}
+
+# The carray used for the per-thread buffers of a property of a C type.
+_CARRAY_FOR_TYPE = {
+    'double': 'DoubleArray', 'float': 'FloatArray', 'int': 'IntArray',
+    'unsigned int': 'UIntArray', 'long': 'LongArray'
+}
+
+_PAIR_UPDATE_MERGE = {
+    'sum': 'd_{prop}[d_idx] += {buf}',
+    'max': 'd_{prop}[d_idx] = fmax(d_{prop}[d_idx], {buf})',
+    'min': 'd_{prop}[d_idx] = fmin(d_{prop}[d_idx], {buf})'
+}
+
+
 ###############################################################################
 class AccelerationEvalCythonHelper(object):
     def __init__(self, acceleration_eval):
@@ -120,6 +138,8 @@ class AccelerationEvalCythonHelper(object):
         )
         self._ext_mod = None
         self._module = None
+        # The equations timed by each timer when profiling.
+        self._timer_equations = {}
         self._compute_group_map()
 
     ##########################################################################
@@ -129,15 +149,37 @@ class AccelerationEvalCythonHelper(object):
         # Given all the groups, create a mapping from the group to an index of
         # sorts that can be used when adding the pre/post callback code.
         mapping = {}
+        labels = {}
         for g_idx, group in enumerate(self.object.mega_groups):
             mapping[group] = 'self.groups[%d]' % g_idx
+            labels[group] = 'g%d' % g_idx
             if group.has_subgroups:
                 for sg_idx, sub_group in enumerate(group.data):
                     code = 'self.groups[{gid}].data[{sgid}]'.format(
                         gid=g_idx, sgid=sg_idx
                     )
                     mapping[sub_group] = code
+                    labels[sub_group] = 'g%d.%d' % (g_idx, sg_idx)
         self._group_map = mapping
+        self._group_labels = labels
+
+    def _get_symmetric_groups(self):
+        result = []
+        for group in self.object.mega_groups:
+            groups = group.data if group.has_subgroups else [group]
+            for g in groups:
+                for dest, (eqs, sources, all_eqs) in g.data.items():
+                    result.extend(
+                        x for x in sources.values() if x.symmetric
+                    )
+        return result
+
+    def _use_symmetric_buffers(self, eq_group):
+        return eq_group.symmetric and self.config.use_openmp
+
+    def _get_c_type(self, prop):
+        # The C type of the values of the destination property.
+        return self.known_types['d_' + prop].type.rstrip('*').strip()
 
     ##########################################################################
     # Public interface.
@@ -156,20 +198,29 @@ class AccelerationEvalCythonHelper(object):
             object.particle_arrays, object.mega_groups
         )
         object.set_compiled_object(acceleration_eval)
-
-    def compile(self, code):
+        if self.config.profile:
+            from pysph.sph.profile import get_profiler
+            profiler = get_profiler()
+            for label, equations in self._timer_equations.items():
+                profiler.describe(label, equations)
+
+    def get_ext_module(self, code):
+        """Return the (unbuilt) ExtModule for the given code.
+        """
         # Note, we do not add carray or particle_array as nnps_base would
         # have been rebuilt anyway if they changed.
-        root = expanduser(join('~', '.pysph', 'source', get_platform_dir()))
         depends = ["pysph.base.nnps_base"]
         # Add pysph/base directory to inc_dirs for including spatial_hash.h
         # for SpatialHashNNPS
         extra_inc_dirs = [join(dirname(dirname(realpath(__file__))), 'base')]
-        self._ext_mod = ExtModule(
-            code, verbose=False, root=root, depends=depends,
+        self._ext_mod = CachedExtModule(
+            code, verbose=False, depends=depends,
             extra_inc_dirs=extra_inc_dirs
         )
-        self._module = self._ext_mod.load()
+        return self._ext_mod
+
+    def compile(self, code):
+        self._module = self.get_ext_module(code).load()
         return self._module
 
     ##########################################################################
@@ -266,8 +317,208 @@ class AccelerationEvalCythonHelper(object):
                   for n in sorted(src_arrays)]
         return '\n'.join(lines)
 
-    def get_parallel_block(self):
-        if self.config.use_openmp:
+    def get_pair_cache_setup(self, eq_group):
+        pair_cache = eq_group.pair_cache
+        lines = []
+        if pair_cache.setup:
+            lines.append(
+                'self._setup_pair_cache(%d, NP_DEST, %d)' % (
+                    pair_cache.index, pair_cache.stride
+                )
+            )
+        lines += [
+            '_pc_offsets = (<LongArray>self._pair_cache_offsets[%d]).data'
+            % pair_cache.index,
+            '_pc_values = (<DoubleArray>self._pair_cache_values[%d]).data'
+            % pair_cache.index
+        ]
+        return '\n'.join(lines)
+
+    def get_neighbor_loops(self, eq_group):
+        """Return a list of the loops over the neighbors of the destination
+        particles needed for `eq_group`, each is a tuple of the code for
+        ``loop_all`` and the code called for each neighbor. Either may be
+        empty.
+
+        A symmetric group has a separate loop for the symmetric equations
+        so the pairs seen from the other particle are skipped early.
+        """
+        kernel = self.object.kernel
+        loop_all = ''
+        if eq_group.has_loop_all():
+            loop_all = eq_group.get_loop_all_code(kernel)
+        if not eq_group.symmetric:
+            loop = eq_group.get_loop_code(kernel) if eq_group.has_loop() \
+                else ''
+            return [(loop_all, loop)]
+        loops = []
+        others = eq_group.get_non_symmetric_loop_code(kernel)
+        if loop_all or others:
+            loops.append((loop_all, others))
+        loops.append((
+            '', eq_group.get_symmetric_loop_code(
+                kernel, self._use_symmetric_buffers(eq_group)
+            )
+        ))
+        return loops
+
+    def get_symmetric_declarations(self):
+        props = set()
+        for eq_group in self._get_symmetric_groups():
+            if self._use_symmetric_buffers(eq_group):
+                props.update(eq_group.get_pair_updates())
+        if len(props) == 0:
+            return ''
+        lines = ['cdef int _thread', 'cdef long _sb_idx']
+        for prop in sorted(props):
+            c_type = self._get_c_type(prop)
+            lines.append('cdef %s* _sb_%s' % (c_type, prop))
+            lines.append('cdef %s* _tb_%s' % (c_type, prop))
+        return '\n'.join(lines)
+
+    def get_symmetric_buffer_setup(self, eq_group):
+        """Return the code to get the per-thread buffers of the properties
+        updated by the symmetric equations. The buffers have the C type of
+        the property, e.g. ``float`` when using single precision.
+        """
+        if not self._use_symmetric_buffers(eq_group):
+            return ''
+        lines = []
+        for prop in sorted(eq_group.get_pair_updates()):
+            cls = _CARRAY_FOR_TYPE[self._get_c_type(prop)]
+            lines.append(
+                "_sb_{prop} = (<{cls}>self._get_symmetric_buffer("
+                "'{prop}', {cls}, NP_DEST)).data".format(prop=prop, cls=cls)
+            )
+        return '\n'.join(lines)
+
+    def get_symmetric_thread_setup(self, eq_group):
+        """Return the code run by each thread to find and initialize its own
+        buffers for the symmetric equations.
+        """
+        if not self._use_symmetric_buffers(eq_group):
+            return ''
+        updates = sorted(eq_group.get_pair_updates().items())
+        lines = [
+            '_tb_{prop} = _sb_{prop} + thread_id*NP_DEST'.format(prop=prop)
+            for prop, kind in updates
+        ]
+        lines.append('for _sb_idx in range(NP_DEST):')
+        for prop, kind in updates:
+            lines.append('    _tb_{prop}[_sb_idx] = {value}'.format(
+                prop=prop, value=_PAIR_UPDATE_IDENTITY[kind]
+            ))
+        return '\n'.join(lines)
+
+    def get_symmetric_reduction(self, eq_group):
+        if not self._use_symmetric_buffers(eq_group):
+            return ''
+        lines = [
+            '# Combine the per-thread updates of the symmetric equations.',
+            self.get_parallel_block(),
+            '    for d_idx in %s:' % self.get_parallel_range('NP_DEST'),
+            '        for _thread in range(self.n_threads):'
+        ]
+        for prop, kind in sorted(eq_group.get_pair_updates().items()):
+            buf = '_sb_{prop}[_thread*NP_DEST + d_idx]'.format(prop=prop)
+            lines.append(
+                ' '*12 + _PAIR_UPDATE_MERGE[kind].format(prop=prop, buf=buf)
+            )
+        return '\n'.join(lines)
+
+    def get_residual_names(self):
+        return [eq.var_name for eq in self.object.all_group.equations
+                if hasattr(eq, 'residual')]
+
+    def get_residual_declarations(self):
+        if len(self.get_residual_names()) == 0:
+            return ''
+        return '\n'.join(
+            ['cdef double* _rb', 'cdef double _rv', 'cdef int _r_thread']
+        )
+
+    def _get_residual_stride(self, eq_group):
+        # Pad the values of each thread to avoid false sharing.
+        n = len(eq_group.get_residual_equations())
+        return 8*((n + 7)//8)
+
+    def get_residual_setup(self, eq_group):
+        stride = self._get_residual_stride(eq_group)
+        lines = [
+            "_rb = (<DoubleArray>self._get_symmetric_buffer("
+            "'_residual', DoubleArray, %d)).data" % stride,
+            'for _r_thread in range(self.n_threads):'
+        ]
+        for i, eq in enumerate(eq_group.get_residual_equations()):
+            value = '-INFINITY' if get_residual_op(eq) == 'max' else '0.0'
+            lines.append(
+                '    _rb[_r_thread*%d + %d] = %s' % (stride, i, value)
+            )
+        return '\n'.join(lines)
+
+    def get_residual_code(self, eq_group):
+        return eq_group.get_residual_code(
+            '_rb', self._get_residual_stride(eq_group)
+        )
+
+    def get_residual_reduction(self, eq_group):
+        """Return the code combining the residuals accumulated by each thread
+        (and each MPI process) and recording them on the equations.
+        """
+        stride = self._get_residual_stride(eq_group)
+        mpi = self.object.mode == 'mpi'
+        lines = []
+        for i, eq in enumerate(eq_group.get_residual_equations()):
+            kind = get_residual_op(eq)
+            slot = '_rb[_r_thread*%d + %d]' % (stride, i)
+            lines.append('_rv = %s' % ('-INFINITY' if kind == 'max' else '0.0'))
+            lines.append('for _r_thread in range(self.n_threads):')
+            if kind == 'max':
+                lines.append('    _rv = fmax(_rv, %s)' % slot)
+            else:
+                lines.append('    _rv += %s' % slot)
+            if kind == 'mean':
+                if mpi:
+                    lines.extend([
+                        '_rs = parallel_reduce_array('
+                        'numpy.array([_rv, NP_DEST]), "sum")',
+                        '_rv = _rs[0]/max(_rs[1], 1.0)'
+                    ])
+                else:
+                    lines.append('_rv = _rv/max(NP_DEST, 1)')
+            elif mpi:
+                lines.append(
+                    '_rv = parallel_reduce_array(numpy.array([_rv]), '
+                    '"%s")[0]' % kind
+                )
+            lines.extend([
+                'self.%s.residual_value = _rv' % eq.var_name,
+                "(<DoubleArray>self.residual_history['%s']).append(_rv)" %
+                eq.var_name
+            ])
+        return '\n'.join(lines)
+
+    def get_dest_loop(self, eq_group, kind):
+        """Return the start of the loop over the destination particles to
+        call the `kind` methods of the equations in `eq_group`. This is run
+        in parallel when using OpenMP unless an equation is not thread safe.
+        """
+        if self.config.use_openmp and eq_group.is_thread_safe(kind):
+            block = self.get_parallel_block()
+            loop_range = self.get_parallel_range('NP_DEST')
+        else:
+            block = 'if True: # Serial loop.'
+            loop_range = 'range(NP_DEST)'
+        return '%s\n    for d_idx in %s:' % (block, loop_range)
+
+    def get_parallel_block(self, all_threads=False):
+        """Return the start of a parallel block. With `all_threads` the
+        block uses `self.n_threads` threads, which is needed when each thread
+        initializes its own part of the per-thread buffers.
+        """
+        if self.config.use_openmp and all_threads:
+            return "with nogil, parallel(num_threads=self.n_threads):"
+        elif self.config.use_openmp:
             return "with nogil, parallel():"
         else:
             return "if True: # Placeholder used for OpenMP."
@@ -284,3 +535,20 @@ class AccelerationEvalCythonHelper(object):
 
     def get_post_call(self, group):
         return self._group_map[group] + '.post()'
+
+    def get_group_label(self, group):
+        return self._group_labels[group]
+
+    def get_timer_start(self, var):
+        if not self.config.profile:
+            return ''
+        return '%s = _timer()' % var
+
+    def get_timer_stop(self, var, label, eq_group=None):
+        if not self.config.profile:
+            return ''
+        if eq_group is not None:
+            self._timer_equations[label] = [
+                eq.__class__.__name__ for eq in eq_group.equations
+            ]
+        return 'self._profiler.add(%r, _timer() - %s)' % (label, var)
@@ -87,11 +87,11 @@ from pysph.base.device_helper import DeviceHelper
 from pysph.sph.acceleration_nnps_helper import generate_body, \
     get_kernel_args_list
 
-from compyle.ext_module import get_platform_dir
 from compyle.config import get_config
 from compyle.translator import (CStructHelper, CUDAConverter, OpenCLConverter,
                                 ocl_detect_type, ocl_detect_pointer_base_type)
 
+from .compile_cache import get_cache_dir
 from .equation import get_predefined_types, KnownType
 from .acceleration_eval_cython_helper import (
     get_all_array_names, get_known_types_for_arrays
@@ -488,9 +488,7 @@ class AccelerationEvalGPUHelper(object):
             ext = '.cu'
             backend = 'CUDA'
         code = convert_to_float_if_needed(code)
-        path = os.path.expanduser(os.path.join(
-            '~', '.pysph', 'source', get_platform_dir()
-        ))
+        path = get_cache_dir()
         if not os.path.exists(path):
             os.makedirs(path)
         fname = os.path.join(path, 'generated' + ext)
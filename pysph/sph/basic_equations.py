@@ -173,7 +173,13 @@ class ContinuityEquation(Equation):
     :math:`\frac{d\rho_a}{dt} = \sum_b m_b \boldsymbol{v}_{ab}\cdot
     \nabla_a W_{ab}`
 
+    The term :math:`\boldsymbol{v}_{ab}\cdot\nabla_a W_{ab}` is symmetric so
+    each pair of particles is evaluated once when the destination and source
+    are the same.
+
     """
+    symmetric = True
+
     def initialize(self, d_idx, d_arho):
         d_arho[d_idx] = 0.0
 
@@ -181,6 +187,11 @@ class ContinuityEquation(Equation):
         vijdotdwij = DWIJ[0]*VIJ[0] + DWIJ[1]*VIJ[1] + DWIJ[2]*VIJ[2]
         d_arho[d_idx] += s_m[s_idx]*vijdotdwij
 
+    def loop_pair(self, d_idx, d_arho, d_m, s_idx, s_arho, s_m, DWIJ, VIJ):
+        vijdotdwij = DWIJ[0]*VIJ[0] + DWIJ[1]*VIJ[1] + DWIJ[2]*VIJ[2]
+        d_arho[d_idx] += s_m[s_idx]*vijdotdwij
+        s_arho[s_idx] += d_m[d_idx]*vijdotdwij
+
 
 class MonaghanArtificialViscosity(Equation):
     r"""Classical Monaghan style artificial viscosity [Monaghan2005]_
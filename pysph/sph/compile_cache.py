@@ -0,0 +1,301 @@
+"""Manage the cache of compiled PySPH extension modules.
+
+The generated code is compiled into a content addressed cache.  Each module
+is keyed on the MD5 sum of its source along with a build signature which
+includes the compiler, the compiler flags, the versions of Cython and NumPy
+and the PySPH headers it is compiled against.  Modules are stored as
+``<cache-dir>/<platform-dir>/<key[:2]>/m_<key>.<ext>``.
+
+The cache directory defaults to ``~/.pysph/source`` and may be set with the
+``PYSPH_CACHE_DIR`` environment variable.  Additional, possibly read-only,
+cache directories (for example one shared by all the nodes of a cluster) may
+be given as a ``os.pathsep`` separated list in ``PYSPH_SHARED_CACHE``, these
+are looked up before compiling anything.
+
+Use ``pysph cache`` to see the size of the cache and to clean stale entries,
+for example::
+
+    $ pysph cache --info
+    $ pysph cache --clean --max-age 30 --max-size 2000
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import glob
+import hashlib
+import os
+from os.path import dirname, exists, expanduser, getmtime, join
+import shutil
+import sys
+import sysconfig
+import time
+
+from compyle.ext_module import (ExtModule, get_ext_extension, get_md5,
+                                get_openmp_flags, get_platform_dir)
+
+
+CACHE_DIR_ENV = 'PYSPH_CACHE_DIR'
+SHARED_CACHE_ENV = 'PYSPH_SHARED_CACHE'
+
+_headers_md5 = None
+
+
+def get_cache_dir():
+    """Return the writable cache directory for this platform.
+    """
+    root = os.environ.get(CACHE_DIR_ENV)
+    if not root:
+        root = join('~', '.pysph', 'source')
+    return join(expanduser(root), get_platform_dir())
+
+
+def get_shared_cache_dirs():
+    """Return the list of the shared cache directories for this platform.
+    """
+    roots = os.environ.get(SHARED_CACHE_ENV, '').split(os.pathsep)
+    return [
+        join(expanduser(root), get_platform_dir()) for root in roots if root
+    ]
+
+
+def _get_headers_md5():
+    # The generated code cimports from pysph.base, so any change to the
+    # declarations there needs a rebuild.
+    global _headers_md5
+    if _headers_md5 is None:
+        base = join(dirname(dirname(__file__)), 'base')
+        md5 = hashlib.md5()
+        for pattern in ('*.pxd', '*.h'):
+            for fname in sorted(glob.glob(join(base, pattern))):
+                with open(fname, 'rb') as f:
+                    md5.update(f.read())
+        _headers_md5 = md5.hexdigest()
+    return _headers_md5
+
+
+def get_build_signature(extra_compile_args=None, extra_link_args=None):
+    """Return a string identifying everything other than the source that the
+    compiled extension module depends on.
+    """
+    import Cython
+    import numpy
+    from compyle.config import get_config
+
+    compile_args = list(extra_compile_args or []) + ['-O3']
+    link_args = list(extra_link_args or [])
+    if get_config().use_openmp:
+        omp_compile, omp_link = get_openmp_flags()
+        compile_args = list(omp_compile) + compile_args
+        link_args = list(omp_link) + link_args
+    compiler = [
+        os.environ.get(var, sysconfig.get_config_var(var) or '')
+        for var in ('CC', 'CXX', 'CFLAGS', 'LDFLAGS')
+    ]
+    return 'cython={0} numpy={1} headers={2} compiler={3} flags={4}'.format(
+        Cython.__version__, numpy.__version__, _get_headers_md5(),
+        ' '.join(compiler), ' '.join(compile_args + link_args)
+    )
+
+
+class CachedExtModule(ExtModule):
+    """An ExtModule stored in the content addressed cache.
+
+    The build signature is added to the source so that the name of the module
+    changes with it.  The module is looked up in the shared cache directories
+    first and is otherwise built into the writable cache directory.  The
+    extension is built under a lock into a temporary file which is then
+    renamed, so concurrent jobs never load a partially written module.
+    """
+    def __init__(self, src, root=None, shared_roots=None, **kw):
+        src = src + '\n# Build: %s\n' % get_build_signature(
+            kw.get('extra_compile_args'), kw.get('extra_link_args')
+        )
+        key = get_md5(src)
+        if root is None:
+            root = get_cache_dir()
+        if shared_roots is None:
+            shared_roots = get_shared_cache_dirs()
+        name = 'm_' + key + get_ext_extension()
+        for shared in shared_roots:
+            if exists(join(shared, key[:2], name)):
+                root = shared
+                break
+        super(CachedExtModule, self).__init__(
+            src, root=join(root, key[:2]), **kw
+        )
+
+    def write_and_build(self):
+        """Write source and build the extension module"""
+        if exists(self.ext_path):
+            self._message("Precompiled code from:", self.src_path)
+            return
+        with self._lock(timeout=600):
+            if exists(self.ext_path):
+                return
+            self._write_source(self.src_path)
+            ext_path = self.ext_path
+            self.ext_path = '%s.%d.tmp' % (ext_path, os.getpid())
+            try:
+                self.build(force=True)
+                os.replace(self.ext_path, ext_path)
+            finally:
+                self.ext_path = ext_path
+
+    def load(self):
+        module = super(CachedExtModule, self).load()
+        # Mark the module as recently used for the cache eviction.
+        try:
+            os.utime(self.ext_path, None)
+        except OSError:
+            pass
+        return module
+
+
+###############################################################################
+def get_cache_entries(root=None):
+    """Return the modules in the cache as a list of dictionaries, sorted with
+    the least recently used first.  Each entry has the ``name`` of the module,
+    its ``files``, their total size in ``nbytes`` and the ``mtime`` at which
+    it was last used.  Modules being built (which are locked) are skipped.
+    """
+    if root is None:
+        root = get_cache_dir()
+    entries = {}
+    for path, dirs, files in os.walk(root):
+        if 'build' in dirs:
+            dirs.remove('build')
+        locked = set(d[:-5] for d in dirs if d.endswith('.lock'))
+        for fname in files:
+            if not fname.startswith('m_'):
+                continue
+            name = fname.split('.')[0]
+            if name in locked:
+                continue
+            fpath = join(path, fname)
+            entry = entries.setdefault(
+                join(path, name),
+                dict(name=name, files=[], nbytes=0, mtime=0.0)
+            )
+            entry['files'].append(fpath)
+            entry['nbytes'] += os.path.getsize(fpath)
+            entry['mtime'] = max(entry['mtime'], getmtime(fpath))
+    return sorted(entries.values(), key=lambda x: x['mtime'])
+
+
+def clean_cache(root=None, max_age=None, max_size=None, dry_run=False):
+    """Remove stale modules from the cache.
+
+    Parameters
+    ----------
+
+    root: str: the cache directory, defaults to the writable cache directory.
+    max_age: float: remove the modules not used in these many days.
+    max_size: int: remove the least recently used modules until the cache is
+        at most these many bytes.
+    dry_run: bool: only return the entries without removing them.
+
+    Returns the list of the removed entries.
+    """
+    if root is None:
+        root = get_cache_dir()
+    entries = get_cache_entries(root)
+    removed = []
+    if max_age is None and max_size is None:
+        removed, entries = entries, []
+    if max_age is not None:
+        cutoff = time.time() - max_age*86400
+        removed = [e for e in entries if e['mtime'] < cutoff]
+        entries = [e for e in entries if e['mtime'] >= cutoff]
+    if max_size is not None:
+        total = sum(e['nbytes'] for e in entries)
+        while entries and total > max_size:
+            entry = entries.pop(0)
+            total -= entry['nbytes']
+            removed.append(entry)
+    if not dry_run:
+        for entry in removed:
+            for fname in entry['files']:
+                try:
+                    os.remove(fname)
+                except OSError:
+                    pass
+        if max_age is None and max_size is None:
+            # The intermediate build files are only needed during a build.
+            for path, dirs, files in os.walk(root):
+                if 'build' in dirs:
+                    dirs.remove('build')
+                    shutil.rmtree(join(path, 'build'), ignore_errors=True)
+    return removed
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(
+        prog='cache', description=__doc__, add_help=False,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "-h", "--help", action="store_true", default=False, dest="help",
+        help="show this help message and exit"
+    )
+    parser.add_argument(
+        "-d", "--dir", action="store", dest="root", default=None,
+        help="Cache directory to use (defaults to %s)." % get_cache_dir()
+    )
+    parser.add_argument(
+        "--info", action="store_true", default=False, dest="info",
+        help="Print the number and size of the cached modules."
+    )
+    parser.add_argument(
+        "--clean", action="store_true", default=False, dest="clean",
+        help="Remove stale modules, everything if no limits are given."
+    )
+    parser.add_argument(
+        "--max-age", action="store", type=float, default=None,
+        dest="max_age", help="Remove modules not used in these many days."
+    )
+    parser.add_argument(
+        "--max-size", action="store", type=float, default=None,
+        dest="max_size",
+        help="Remove the least recently used modules until the cache is "
+        "at most this size in MB."
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", default=False, dest="dry_run",
+        help="Only print the modules that would be removed."
+    )
+
+    options = parser.parse_args(argv)
+    if options.help:
+        parser.print_help()
+        sys.exit()
+
+    root = options.root if options.root else get_cache_dir()
+    if options.clean:
+        max_size = options.max_size
+        if max_size is not None:
+            max_size = int(max_size*1024*1024)
+        removed = clean_cache(
+            root, max_age=options.max_age, max_size=max_size,
+            dry_run=options.dry_run
+        )
+        verb = "Would remove" if options.dry_run else "Removed"
+        for entry in removed:
+            print("%s %s" % (verb, entry['name']))
+        nbytes = sum(e['nbytes'] for e in removed)
+        print("%s %d modules, %.1f MB" % (
+            verb, len(removed), nbytes/1024.0/1024.0
+        ))
+    else:
+        entries = get_cache_entries(root)
+        nbytes = sum(e['nbytes'] for e in entries)
+        print("Cache directory: %s" % root)
+        print("%d modules, %.1f MB" % (len(entries), nbytes/1024.0/1024.0))
+
+
+if __name__ == '__main__':
+    main()
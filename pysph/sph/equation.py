@@ -15,6 +15,7 @@ import re
 from copy import deepcopy
 import inspect
 import itertools
+import numbers
 import numpy
 from textwrap import dedent
 
@@ -285,6 +286,14 @@ def precomputed_symbols():
     return c
 
 
+# Precomputed symbols that only depend on the positions and smoothing lengths
+# of a pair of particles, these may be cached and reused across groups.
+PAIR_CACHEABLE_SYMBOLS = (
+    'DWI', 'DWIJ', 'DWJ', 'EPS', 'GHI', 'GHIJ', 'GHJ', 'HIJ', 'R2IJ', 'RIJ',
+    'WDASHI', 'WDASHIJ', 'WDASHJ', 'WDP', 'WI', 'WIJ', 'WJ', 'XIJ'
+)
+
+
 def sort_precomputed(precomputed, all_pre_comp):
     """Sorts the precomputed equations in the given dictionary as per the
     dependencies of the symbols and returns an ordered dict.
@@ -298,7 +307,7 @@ def sort_precomputed(precomputed, all_pre_comp):
     # Find the dependent pre-computed symbols for each in the precomputed.
     depends = dict((x, None) for x in precomputed)
     for pre, cb in precomputed.items():
-        depends[pre] = [x for x in cb.symbols if x in pre_comp and x != pre]
+        depends[pre] = [x for x in cb.symbols if x in precomputed and x != pre]
 
     # The basic algorithm is to assign weights to each of the precomputed
     # symbols based on the maximum weight of the dependencies of the
@@ -352,7 +361,8 @@ def get_arrays_used_in_equation(equation):
     src_arrays = set()
     dest_arrays = set()
     methods = (
-        'initialize', 'initialize_pair', 'loop', 'loop_all', 'post_loop'
+        'initialize', 'initialize_pair', 'loop', 'loop_all', 'post_loop',
+        'residual'
     )
     for meth_name in methods:
         meth = getattr(equation, meth_name, None)
@@ -364,6 +374,297 @@ def get_arrays_used_in_equation(equation):
     return src_arrays, dest_arrays
 
 
+def get_arrays_written_by_equation(equation):
+    """Return the set of arrays, for example ``d_au``, that are assigned to in
+    any of the methods of the equation.
+    """
+    written = set()
+    methods = (
+        'initialize', 'initialize_pair', 'loop', 'loop_all', 'post_loop'
+    )
+    for meth_name in methods:
+        meth = getattr(equation, meth_name, None)
+        if meth is None:
+            continue
+        tree = ast.parse(dedent(inspect.getsource(meth)))
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Assign):
+                targets = node.targets
+            elif isinstance(node, ast.AugAssign):
+                targets = [node.target]
+            else:
+                continue
+            for target in targets:
+                for sub in ast.walk(target):
+                    if isinstance(sub, ast.Subscript) and \
+                       isinstance(sub.value, ast.Name):
+                        name = sub.value.id
+                        if name.startswith(('d_', 's_')) and \
+                           name not in ('d_idx', 's_idx'):
+                            written.add(name)
+    return written
+
+
+def get_precomputed_written_by_equation(equation):
+    """Return the set of precomputed symbols, for example ``DWIJ``, that are
+    assigned to in the ``loop`` or ``loop_pair`` of the equation.
+    """
+    symbols = set(Group.pre_comp.keys())
+    written = set()
+    for meth_name in ('loop', 'loop_pair'):
+        meth = getattr(equation, meth_name, None)
+        if meth is None:
+            continue
+        tree = ast.parse(dedent(inspect.getsource(meth)))
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Assign):
+                targets = node.targets
+            elif isinstance(node, ast.AugAssign):
+                targets = [node.target]
+            else:
+                continue
+            for target in targets:
+                names = target.elts if isinstance(target, ast.Tuple) \
+                    else [target]
+                for name in names:
+                    if isinstance(name, ast.Subscript):
+                        name = name.value
+                    if isinstance(name, ast.Name) and name.id in symbols:
+                        written.add(name.id)
+    return written
+
+
+def is_symmetric_equation(equation):
+    """Return True if the equation can be evaluated once per pair using its
+    ``loop_pair`` method.
+
+    The ``loop_pair`` must be defined along with the ``loop`` so that a
+    subclass overriding only the ``loop`` is not evaluated incorrectly.
+    """
+    if not getattr(equation, 'symmetric', False):
+        return False
+    for cls in type(equation).__mro__:
+        if 'loop' in cls.__dict__:
+            return 'loop_pair' in cls.__dict__
+    return False
+
+
+def _is_same_subscript(a, b):
+    return (isinstance(a, ast.Subscript) and isinstance(b, ast.Subscript) and
+            isinstance(a.value, ast.Name) and isinstance(b.value, ast.Name) and
+            a.value.id == b.value.id and
+            ast.dump(a.slice) == ast.dump(b.slice))
+
+
+def get_pair_updates(equation):
+    """Return a dictionary mapping each property updated by the
+    ``loop_pair`` method of the equation to the kind of update, one of
+    'sum', 'max' or 'min'.
+
+    Only increments (``d_au[d_idx] += ...``) and updates of the form
+    ``d_dt_cfl[d_idx] = max(d_dt_cfl[d_idx], ...)`` are supported as these
+    can be accumulated separately and combined later.
+    """
+    tree = ast.parse(dedent(inspect.getsource(equation.loop_pair)))
+    updates = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.AugAssign):
+            targets = [node.target]
+            kind = 'sum' if isinstance(node.op, (ast.Add, ast.Sub)) else None
+        elif isinstance(node, ast.Assign):
+            targets = node.targets
+            kind = None
+            value = node.value
+            if isinstance(value, ast.Call) and \
+               isinstance(value.func, ast.Name) and \
+               value.func.id in ('max', 'min') and len(targets) == 1 and \
+               any(_is_same_subscript(targets[0], x) for x in value.args):
+                kind = value.func.id
+        else:
+            continue
+        for target in targets:
+            if not isinstance(target, ast.Subscript) or \
+               not isinstance(target.value, ast.Name):
+                continue
+            name = target.value.id
+            if not name.startswith(('d_', 's_')):
+                continue
+            prop = name[2:]
+            if kind is None or updates.get(prop, kind) != kind:
+                msg = ('Unsupported update of %s in %s.loop_pair, only '
+                       '"+=", "-=", max and min may be used.' %
+                       (name, equation.__class__.__name__))
+                raise RuntimeError(msg)
+            updates[prop] = kind
+    return updates
+
+
+def _uses_names(node, names):
+    return any(isinstance(x, ast.Name) and x.id in names
+               for x in ast.walk(node))
+
+
+def is_thread_safe(obj, method):
+    """Return True if the given per-particle `method` of the equation (or
+    integrator step) `obj` may be called concurrently for different
+    destination particles.
+
+    If the object sets a ``thread_safe`` attribute that is used. Otherwise
+    the method is considered thread safe unless it sets an attribute of the
+    object or writes to an array at an index that does not depend on
+    ``d_idx``, for example ``d_total_mass[0] += d_m[d_idx]``. Storing a value
+    that does not depend on ``d_idx``, like ``d_total_mass[0] = 0.0``, is
+    fine.
+    """
+    thread_safe = getattr(obj, 'thread_safe', None)
+    if thread_safe is not None:
+        return thread_safe
+    tree = ast.parse(dedent(inspect.getsource(getattr(obj, method))))
+
+    # Find the local variables computed from d_idx, e.g. i4 = 4*d_idx.
+    local = set(['d_idx'])
+    n = 0
+    while n != len(local):
+        n = len(local)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Assign) and \
+               _uses_names(node.value, local):
+                local.update(x.id for x in node.targets
+                             if isinstance(x, ast.Name))
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign):
+            targets = node.targets
+        elif isinstance(node, ast.AugAssign):
+            targets = [node.target]
+        else:
+            continue
+        for target in targets:
+            if isinstance(target, ast.Attribute):
+                return False
+            if isinstance(target, ast.Subscript) and \
+               isinstance(target.value, ast.Name) and \
+               target.value.id.startswith(('d_', 's_')) and \
+               not _uses_names(target.slice, local):
+                # Every particle storing the same value is harmless.
+                if isinstance(node, ast.Assign) and \
+                   not _uses_names(node.value, local):
+                    continue
+                return False
+    return True
+
+
+def get_residual_op(equation):
+    """Return how the ``residual`` of the given equation is reduced over the
+    destination particles, one of 'sum' (the default), 'max' or 'mean'.
+    """
+    kind = getattr(equation, 'residual_reduction', 'sum')
+    if kind not in ('sum', 'max', 'mean'):
+        msg = ('Unsupported residual_reduction %r in %s, must be one of '
+               '"sum", "max" or "mean".' %
+               (kind, equation.__class__.__name__))
+        raise RuntimeError(msg)
+    return kind
+
+
+# The types of the local variables that may only hold integers.
+_INT_TYPES = ('int', 'long', 'short', 'char', 'size_t')
+
+
+def _get_self_attributes(node):
+    return set(x.attr for x in ast.walk(node)
+               if isinstance(x, ast.Attribute) and
+               isinstance(x.value, ast.Name) and x.value.id == 'self')
+
+
+def _get_integer_locals(tree):
+    # Return the local variables declared as integers, for example with
+    # ``i, n = declare('int', 2)``.
+    names = set()
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Assign) and
+                isinstance(node.value, ast.Call) and
+                isinstance(node.value.func, ast.Name) and
+                node.value.func.id == 'declare' and node.value.args):
+            continue
+        arg = node.value.args[0]
+        kind = getattr(arg, 'value', getattr(arg, 's', None))
+        if not isinstance(kind, str) or kind.split()[-1] not in _INT_TYPES:
+            continue
+        for target in node.targets:
+            elts = target.elts if isinstance(target, ast.Tuple) else [target]
+            names.update(x.id for x in elts if isinstance(x, ast.Name))
+    return names
+
+
+def get_integer_attributes(cls):
+    """Return the names of the attributes that the methods of the given
+    equation class use as integers, i.e. in an index, as an argument to
+    ``range``, in a bitwise operation or in an expression assigned to a local
+    variable declared as an integer.
+    """
+    int_ops = (ast.BitAnd, ast.BitOr, ast.BitXor, ast.LShift, ast.RShift)
+    names = set()
+    for klass in cls.__mro__:
+        for meth in klass.__dict__.values():
+            if not inspect.isfunction(meth):
+                continue
+            try:
+                tree = ast.parse(dedent(inspect.getsource(meth)))
+            except (IOError, TypeError):
+                continue
+            int_locals = _get_integer_locals(tree)
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Subscript):
+                    names.update(_get_self_attributes(node.slice))
+                elif isinstance(node, ast.Call) and \
+                        isinstance(node.func, ast.Name) and \
+                        node.func.id == 'range':
+                    for arg in node.args:
+                        names.update(_get_self_attributes(arg))
+                elif isinstance(node, ast.BinOp) and \
+                        isinstance(node.op, int_ops):
+                    names.update(_get_self_attributes(node))
+                elif isinstance(node, (ast.Assign, ast.AugAssign)):
+                    targets = getattr(node, 'targets', None) or [node.target]
+                    if any(isinstance(x, ast.Name) and x.id in int_locals
+                           for x in targets):
+                        names.update(_get_self_attributes(node.value))
+    return names
+
+
+def _is_number(value):
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+
+def get_wrapper_instance(equations):
+    """Given equations of the same class, return an instance whose attributes
+    have the types to declare on the compiled wrapper of the class.
+
+    The parameters of the equations are set on the wrapper at runtime and are
+    not part of the generated code, so their types should not depend on their
+    values either.  Numbers are declared as doubles unless all the equations
+    have integers and the methods of the class use them as integers (see
+    :py:func:`get_integer_attributes`).  Changing only the numerical
+    parameters of the equations thus does not change the generated code.
+    """
+    eq = equations[-1]
+    int_attrs = get_integer_attributes(eq.__class__)
+    data = dict(eq.__dict__)
+    for name, value in data.items():
+        values = [x.__dict__.get(name) for x in equations]
+        if not all(_is_number(x) for x in values):
+            continue
+        if name in int_attrs and \
+                all(isinstance(x, numbers.Integral) for x in values):
+            data[name] = int(value)
+        else:
+            data[name] = float(value)
+    obj = eq.__class__.__new__(eq.__class__)
+    obj.__dict__.update(data)
+    return obj
+
+
 def get_init_args(obj, method, ignore=None):
     """Return the arguments for the method given, typically an __init__.
     """
@@ -402,6 +703,9 @@ class Equation(object):
         # The name of the variable used in the compiled AccelerationEval
         # instance.
         self.var_name = ''
+        if hasattr(self, 'residual'):
+            # The residual reduced over the destination particles.
+            self.residual_value = 0.0
 
     def __repr__(self):
         name = self.__class__.__name__
@@ -497,6 +801,14 @@ class Group(object):
 
         self.equations = equations
         self.src_arrays = self.dest_arrays = None
+        # Information on the precomputed symbols shared through the pair
+        # cache, see `set_pair_cache`.
+        self.pair_cache = None
+        # Visit each pair once for symmetric equations, see `set_symmetric`.
+        self.symmetric = False
+        # Use the nearest periodic image of the source particles, see
+        # `set_periodic_images`.
+        self.periodic_images = False
 
         self.update()
 
@@ -514,24 +826,33 @@ class Group(object):
 
     def _has_code(self, kind='loop'):
         assert kind in ('initialize', 'initialize_pair', 'loop', 'loop_all',
-                        'post_loop', 'reduce')
+                        'post_loop', 'reduce', 'residual')
         for equation in self.equations:
             if hasattr(equation, kind):
                 return True
 
-    def _setup_precomputed(self):
-        """Get the precomputed symbols for this group of equations.
-        """
-        # Calculate the precomputed symbols for this equation.
+    def _get_loop_args(self):
         all_args = set()
         for equation in self.equations:
             if hasattr(equation, 'loop'):
                 args = getfullargspec(equation.loop).args
                 all_args.update(args)
         all_args.discard('self')
+        return all_args
+
+    def _setup_precomputed(self, symbols=None, cached=()):
+        """Get the precomputed symbols for this group of equations.
+
+        The symbols in `cached` are read from the pair cache and are neither
+        computed nor used to find further precomputed symbols.
+        """
+        # Calculate the precomputed symbols for this equation.
+        if symbols is None:
+            symbols = self._get_loop_args()
 
         pre = self.pre_comp
-        precomputed = dict((s, pre[s]) for s in all_args if s in pre)
+        precomputed = dict((s, pre[s]) for s in symbols
+                           if s in pre and s not in cached)
 
         # Now find the precomputed symbols in the pre-computed symbols.
         done = False
@@ -542,7 +863,8 @@ class Group(object):
             for sym in found_precomp:
                 code_block = pre[sym]
                 new = set([s for s in code_block.symbols
-                           if s in pre and s not in precomputed])
+                           if s in pre and s not in precomputed
+                           and s not in cached])
                 all_new.update(new)
             if len(all_new) > 0:
                 done = False
@@ -556,6 +878,8 @@ class Group(object):
         context = self.context
         for p, cb in self.precomputed.items():
             context[p] = cb.context[p]
+        for p in cached:
+            context[p] = pre[p].context[p]
 
     ##########################################################################
     # Public interface.
@@ -565,6 +889,33 @@ class Group(object):
         if not self.has_subgroups:
             self._setup_precomputed()
 
+    def get_pair_cacheable_symbols(self):
+        """Return the precomputed symbols used by this group that may be
+        stored in the pair cache.
+        """
+        return set(x for x in self.precomputed
+                   if x in PAIR_CACHEABLE_SYMBOLS)
+
+    def set_pair_cache(self, pair_cache):
+        """Share precomputed symbols with other groups via the pair cache.
+
+        Parameters
+        ----------
+
+        pair_cache: Context
+            with the `index` of the cache, the number of values stored per
+            pair (`stride`), the offset of each symbol in the values of a
+            pair (`slots`), the symbols to `load` and `store` and `setup`,
+            a flag indicating if this group should setup the cache.
+        """
+        self.pair_cache = pair_cache
+        self.context = Context()
+        self._setup_precomputed(
+            self._get_loop_args().union(pair_cache.stores),
+            cached=pair_cache.loads
+        )
+        self.src_arrays = self.dest_arrays = None
+
     def get_array_names(self, recompute=False):
         """Returns two sets of array names, the first being source_arrays
         and the second being destination array names.
@@ -582,10 +933,84 @@ class Group(object):
             src_arrays.update(cb.src_arrays)
             dest_arrays.update(cb.dest_arrays)
 
+        if self.symmetric:
+            for equation in self.equations:
+                if is_symmetric_equation(equation):
+                    args = getfullargspec(equation.loop_pair).args
+                    s, d = get_array_names(args)
+                    src_arrays.update(s)
+                    dest_arrays.update(d)
+
         self.src_arrays = src_arrays
         self.dest_arrays = dest_arrays
         return src_arrays, dest_arrays
 
+    def get_pair_updates(self):
+        """Return the properties updated by the ``loop_pair`` methods of the
+        symmetric equations and how they are updated, see
+        :py:func:`get_pair_updates`.
+        """
+        updates = {}
+        for equation in self.equations:
+            if not is_symmetric_equation(equation):
+                continue
+            for prop, kind in get_pair_updates(equation).items():
+                if updates.setdefault(prop, kind) != kind:
+                    msg = 'Property %s is updated using both %s and %s.' % (
+                        prop, kind, updates[prop]
+                    )
+                    raise RuntimeError(msg)
+        return updates
+
+    def set_symmetric(self, symmetric):
+        """Evaluate the symmetric equations once per pair of particles.
+
+        This is only valid when the destination and source are the same and
+        the neighbors are symmetric, i.e. if j is a neighbor of i, i is a
+        neighbor of j.
+        """
+        if symmetric:
+            # Check that the updates are supported.
+            self.get_pair_updates()
+            written = self.get_precomputed_writes()
+            if len(written) > 0:
+                msg = ('Symmetric loops are not supported for groups which '
+                       'modify the precomputed %s.' % ', '.join(written))
+                raise RuntimeError(msg)
+        self.symmetric = symmetric
+        self.src_arrays = self.dest_arrays = None
+
+    def get_precomputed_writes(self):
+        """Return the sorted precomputed symbols modified by the equations,
+        for example a kernel gradient correction modifies ``DWIJ``.
+        """
+        written = set()
+        for equation in self.equations:
+            written.update(get_precomputed_written_by_equation(equation))
+        return sorted(written)
+
+    def set_periodic_images(self, periodic_images):
+        """Use the nearest periodic image of the source particle in `XIJ`.
+
+        This is used with virtual periodic domains where no ghost particles
+        are created and the neighbors across a periodic boundary are the
+        real particles on the other side. Equations that compute the
+        separation themselves from the positions will not see the images.
+        """
+        self.periodic_images = periodic_images
+
+    def is_thread_safe(self, kind):
+        """Return True if the `kind` method (for example ``initialize``) of
+        all the equations may be called in parallel for the destination
+        particles, see :py:func:`is_thread_safe`. The ``loop`` of equations
+        with sources is part of the neighbor loop and is not checked.
+        """
+        equations = self.equations
+        if kind == 'loop':
+            equations = [eq for eq in equations if eq.no_source]
+        return all(is_thread_safe(eq, kind) for eq in equations
+                   if hasattr(eq, kind))
+
     def get_converged_condition(self):
         if self.has_subgroups:
             code = [g.get_converged_condition() for g in self.equations]
@@ -636,12 +1061,18 @@ class Group(object):
     def has_loop_all(self):
         return self._has_code('loop_all')
 
+    def has_loop_pair(self):
+        return any(is_symmetric_equation(x) for x in self.equations)
+
     def has_post_loop(self):
         return self._has_code('post_loop')
 
     def has_reduce(self):
         return self._has_code('reduce')
 
+    def has_residual(self):
+        return self._has_code('residual')
+
 
 class CythonGroup(Group):
     ##########################################################################
@@ -678,38 +1109,101 @@ class CythonGroup(Group):
                     pass
         return '\n'.join(decl)
 
+    def _get_needed_precomputed(self, equations, kinds, symbols=()):
+        # The precomputed and cached symbols used by the given methods of
+        # the equations along with the ones they depend on.
+        pair_cache = self.pair_cache
+        loads = pair_cache.loads if pair_cache is not None else []
+        args = set(symbols)
+        for eq in equations:
+            for kind in kinds:
+                if hasattr(eq, kind):
+                    args.update(getfullargspec(getattr(eq, kind)).args)
+        needed = set(x for x in args if x in self.precomputed or x in loads)
+        new = needed
+        while len(new) > 0:
+            new = set(
+                s for x in new if x in self.precomputed
+                for s in self.precomputed[x].symbols
+                if s in self.precomputed or s in loads
+            ) - needed
+            needed.update(new)
+        return needed
+
+    def _get_precomputed_code(self, kernel=None, symbols=None, store=True):
+        # Only the given `symbols` are computed or loaded if any are given.
+        pre = []
+        pair_cache = self.pair_cache
+        if pair_cache is not None:
+            loads = [x for x in pair_cache.loads
+                     if symbols is None or x in symbols]
+            if len(loads) > 0 or store:
+                pre.append(
+                    '_pc_record = &_pc_values[(_pc_offsets[d_idx] + '
+                    'nbr_idx)*%d]' % pair_cache.stride
+                )
+            pre.extend(self._get_pair_cache_code(loads, True))
+        for p, cb in self.precomputed.items():
+            if symbols is not None and p not in symbols:
+                continue
+            pre.append(cb.code.strip())
+            if p == 'XIJ' and self.periodic_images:
+                pre.append('nearest_image(XIJ, self.periodic_length)')
+        if pair_cache is not None and store:
+            pre.extend(self._get_pair_cache_code(pair_cache.stores, False))
+        if len(pre) > 0:
+            pre.extend(['', ''])
+        return self._set_kernel('\n'.join(pre), kernel)
+
+    def _get_call(self, eq, kind, replace=None):
+        args = getfullargspec(getattr(eq, kind)).args
+        if 'self' in args:
+            args.remove('self')
+        if 'SPH_KERNEL' in args:
+            args[args.index('SPH_KERNEL')] = 'self.kernel'
+        if kind == 'reduce':
+            args = ['dst.array', 't', 'dt']
+        if replace is not None:
+            args = [replace.get(x, x) for x in args]
+        call_args = ', '.join(args)
+        return 'self.{eq_name}.{method}({args})'.format(
+            eq_name=eq.var_name, method=kind, args=call_args
+        )
+
     def _get_code(self, kernel=None, kind='loop'):
         assert kind in ('initialize', 'initialize_pair', 'loop', 'loop_all',
-                        'post_loop', 'reduce')
+                        'post_loop', 'reduce', 'residual')
         # We assume here that precomputed quantities are only relevant
         # for loops and not post_loops and initialization.
-        pre = []
+        preamble = ''
         if kind == 'loop':
-            for p, cb in self.precomputed.items():
-                pre.append(cb.code.strip())
-            if len(pre) > 0:
-                pre.extend(['', ''])
-        preamble = self._set_kernel('\n'.join(pre), kernel)
+            preamble = self._get_precomputed_code(kernel)
 
         code = []
         for eq in self.equations:
-            meth = getattr(eq, kind, None)
-            if meth is not None:
-                args = getfullargspec(meth).args
-                if 'self' in args:
-                    args.remove('self')
-                if 'SPH_KERNEL' in args:
-                    args[args.index('SPH_KERNEL')] = 'self.kernel'
-                if kind == 'reduce':
-                    args = ['dst.array', 't', 'dt']
-                call_args = ', '.join(args)
-                c = 'self.{eq_name}.{method}({args})' \
-                    .format(eq_name=eq.var_name, method=kind, args=call_args)
-                code.append(c)
+            if hasattr(eq, kind):
+                code.append(self._get_call(eq, kind))
         if len(code) > 0:
             code.append('')
         return preamble + '\n'.join(code)
 
+    def _get_pair_cache_code(self, symbols, load):
+        code = []
+        slots = self.pair_cache.slots
+        for sym in symbols:
+            value = self.pre_comp[sym].context[sym]
+            if isinstance(value, (list, tuple)):
+                names = ['%s[%d]' % (sym, i) for i in range(len(value))]
+            else:
+                names = [sym]
+            for i, name in enumerate(names):
+                record = '_pc_record[%d]' % (slots[sym] + i)
+                if load:
+                    code.append('%s = %s' % (name, record))
+                else:
+                    code.append('%s = %s' % (record, name))
+        return code
+
     def _set_kernel(self, code, kernel):
         if kernel is not None:
             k_func = 'self.kernel.kernel'
@@ -766,6 +1260,55 @@ class CythonGroup(Group):
     def get_loop_all_code(self, kernel=None):
         return self._get_code(kernel, kind='loop_all')
 
+    def get_non_symmetric_loop_code(self, kernel=None):
+        """Return the code for the loop over neighbors which calls ``loop``
+        for the equations which are not symmetric and stores the pair cache
+        values. This is empty if there is nothing to do.
+        """
+        others = [x for x in self.equations
+                  if hasattr(x, 'loop') and not is_symmetric_equation(x)]
+        stores = [] if self.pair_cache is None else self.pair_cache.stores
+        if len(others) == 0 and len(stores) == 0:
+            return ''
+        symbols = self._get_needed_precomputed(others, ['loop'], stores)
+        code = [self._get_precomputed_code(kernel, symbols)]
+        code.extend(self._get_call(eq, 'loop') for eq in others)
+        code.append('')
+        return '\n'.join(code)
+
+    def get_symmetric_loop_code(self, kernel=None, use_buffers=False):
+        """Return the code for the loop over neighbors which calls
+        ``loop_pair`` of the symmetric equations once for each pair of real
+        particles. The other equations are called in a separate loop, see
+        :py:meth:`get_non_symmetric_loop_code`, so that the pairs already
+        seen from the other particle are skipped before doing any work.
+
+        If `use_buffers` is True, the properties updated in ``loop_pair`` are
+        accumulated in the per-thread buffers, ``_tb_<prop>``.
+        """
+        pairwise = [x for x in self.equations if is_symmetric_equation(x)]
+        symbols = self._get_needed_precomputed(
+            pairwise, ['loop', 'loop_pair']
+        )
+
+        # The pair is handled when the other particle is the destination.
+        code = ['if s_idx < d_idx:', '    continue']
+        code.append(self._get_precomputed_code(kernel, symbols, store=False))
+
+        replace = {}
+        if use_buffers:
+            for prop in self.get_pair_updates():
+                replace['d_' + prop] = replace['s_' + prop] = '_tb_' + prop
+        code.append('if s_idx > d_idx and s_idx < NP_DEST:')
+        code.extend(
+            '    ' + self._get_call(eq, 'loop_pair', replace)
+            for eq in pairwise
+        )
+        code.append('else:')
+        code.extend('    ' + self._get_call(eq, 'loop') for eq in pairwise)
+        code.append('')
+        return '\n'.join(code)
+
     def get_post_loop_code(self, kernel=None):
         return self._get_code(kernel, kind='post_loop')
 
@@ -778,12 +1321,44 @@ class CythonGroup(Group):
                 lines.append(code)
         return '\n'.join(lines)
 
+    def has_reduce(self):
+        # The residual of an equation is reduced in the compiled code, its
+        # reduce method is only used by the GPU backends.
+        return any(hasattr(eq, 'reduce') and not hasattr(eq, 'residual')
+                   for eq in self.equations)
+
     def get_reduce_code(self):
-        return self._get_code(kernel=None, kind='reduce')
+        code = [self._get_call(eq, 'reduce') for eq in self.equations
+                if hasattr(eq, 'reduce') and not hasattr(eq, 'residual')]
+        if len(code) > 0:
+            code.append('')
+        return '\n'.join(code)
+
+    def get_residual_equations(self):
+        return [eq for eq in self.equations if hasattr(eq, 'residual')]
+
+    def get_residual_code(self, buffer, stride):
+        """Return the code accumulating the ``residual`` of each equation for
+        the particle ``d_idx`` in the per-thread `buffer`, the values of a
+        thread are stored at ``threadid()*stride``.
+        """
+        code = []
+        for i, eq in enumerate(self.get_residual_equations()):
+            slot = '{buf}[threadid()*{stride} + {i}]'.format(
+                buf=buffer, stride=stride, i=i
+            )
+            call = self._get_call(eq, 'residual')
+            if get_residual_op(eq) == 'max':
+                code.append('%s = fmax(%s, %s)' % (slot, slot, call))
+            else:
+                code.append('%s += %s' % (slot, call))
+        if len(code) > 0:
+            code.append('')
+        return '\n'.join(code)
 
     def get_equation_wrappers(self, known_types={}):
         classes = defaultdict(lambda: 0)
-        eqs = {}
+        eqs = defaultdict(list)
         for equation in self.equations:
             cls = equation.__class__.__name__
             n = classes[cls]
@@ -791,13 +1366,13 @@ class CythonGroup(Group):
                 camel_to_underscore(equation.name), n
             )
             classes[cls] += 1
-            eqs[cls] = equation
+            eqs[cls].append(equation)
         wrappers = []
         predefined = dict(get_predefined_types(self.pre_comp))
         predefined.update(known_types)
         code_gen = CythonGenerator(known_types=predefined)
         for cls in sorted(classes.keys()):
-            code_gen.parse(eqs[cls])
+            code_gen.parse(get_wrapper_instance(eqs[cls]))
             wrappers.append(code_gen.get_code())
         return '\n'.join(wrappers)
 
@@ -873,7 +1448,7 @@ class OpenCLGroup(Group):
             modified_classes = self._update_for_local_memory(predefined, eqs)
 
         code_gen = self._Converter_Class(known_types=predefined)
-        ignore = ['reduce']
+        ignore = ['reduce', 'loop_pair', 'residual']
         for cls in sorted(classes.keys()):
             src = code_gen.parse_instance(eqs[cls], ignore_methods=ignore)
             wrappers.append(src)
@@ -161,10 +161,22 @@ class ComputeDIIBoundary(Equation):
 
 
 class ComputeRhoAdvection(Equation):
+    def __init__(self, dest, sources, warm_start=0.5):
+        """
+        Parameters
+        ----------
+
+        warm_start : float
+            Fraction of the pressure of the previous time step used as the
+            initial guess for the pressure iterations.
+        """
+        self.warm_start = warm_start
+        super(ComputeRhoAdvection, self).__init__(dest, sources)
+
     def initialize(self, d_idx, d_rho_adv, d_rho, d_p0, d_p, d_piter, d_aii):
         d_rho_adv[d_idx] = d_rho[d_idx]
         d_p0[d_idx] = d_p[d_idx]
-        d_piter[d_idx] = 0.5*d_p[d_idx]
+        d_piter[d_idx] = self.warm_start*d_p[d_idx]
 
     def loop(self, d_idx, d_rho, d_rho_adv, d_uadv, d_vadv, d_wadv, d_u,
              d_v, d_w, s_idx, s_m, s_uadv, s_vadv, s_wadv, DWIJ, dt=0.0):
@@ -262,11 +274,13 @@ class UpdateGhostProps(Equation):
 
 
 class PressureSolve(Equation):
+    # The residual is the average compression of the fluid.
+    residual_reduction = 'mean'
+
     def __init__(self, dest, sources, rho0, omega=0.5,
                  tolerance=1e-2, debug=False):
         self.rho0 = rho0
         self.omega = omega
-        self.compression = 0.0
         self.debug = debug
         self.tolerance = tolerance
         super(PressureSolve, self).__init__(dest, sources)
@@ -317,6 +331,9 @@ class PressureSolve(Equation):
         d_piter[d_idx] = p
         d_p[d_idx] = p
 
+    def residual(self, d_idx, d_compression):
+        return (d_compression[d_idx] - self.rho0)/self.rho0
+
     def reduce(self, dst, t, dt):
         dst.tmp_comp[0] = serial_reduce_array(dst.compression > 0.0, 'sum')
         dst.tmp_comp[1] = serial_reduce_array(dst.compression, 'sum')
@@ -325,11 +342,11 @@ class PressureSolve(Equation):
             avg_rho = dst.tmp_comp[1]/dst.tmp_comp[0]
         else:
             avg_rho = self.rho0
-        self.compression = fabs(avg_rho - self.rho0)/self.rho0
+        self.residual_value = fabs(avg_rho - self.rho0)/self.rho0
 
     def converged(self):
         debug = self.debug
-        compression = self.compression
+        compression = self.residual_value
 
         if compression > self.tolerance:
             if debug:
@@ -405,7 +422,7 @@ class PressureForceBoundary(Equation):
 class IISPHScheme(Scheme):
     def __init__(self, fluids, solids, dim, rho0, nu=0.0,
                  gx=0.0, gy=0.0, gz=0.0, omega=0.5, tolerance=1e-2,
-                 debug=False, has_ghosts=False):
+                 debug=False, has_ghosts=False, warm_start=0.5):
         '''The IISPH scheme
 
         Parameters
@@ -431,6 +448,9 @@ class IISPHScheme(Scheme):
             Produce some debugging output on iterations.
         has_ghosts: bool
             The problem has ghost particles so add equations for those.
+        warm_start: float
+            Fraction of the pressure of the previous time step used as the
+            initial guess for the pressure iterations.
         '''
         self.fluids = fluids
         self.solids = solids
@@ -444,6 +464,7 @@ class IISPHScheme(Scheme):
         self.tolerance = tolerance
         self.debug = debug
         self.has_ghosts = has_ghosts
+        self.warm_start = warm_start
 
     def add_user_options(self, group):
         group.add_argument(
@@ -455,13 +476,19 @@ class IISPHScheme(Scheme):
             default=None,
             help='Tolerance for convergence of iterations as a fraction'
         )
+        group.add_argument(
+            '--warm-start', action='store', type=float, dest='warm_start',
+            default=None,
+            help='Fraction of the previous pressure used as the initial '
+            'guess for the pressure iterations.'
+        )
         add_bool_argument(
             group, 'iisph-debug', dest='debug', default=None,
             help="Produce some debugging output on convergence of iterations."
         )
 
     def consume_user_options(self, options):
-        vars = ['omega', 'tolerance', 'debug']
+        vars = ['omega', 'tolerance', 'debug', 'warm_start']
         data = dict((var, self._smart_getattr(options, var))
                     for var in vars)
         self.configure(**data)
@@ -572,7 +599,8 @@ class IISPHScheme(Scheme):
         eq = []
         for fluid in self.fluids:
             eq.extend([
-                ComputeRhoAdvection(dest=fluid, sources=self.fluids),
+                ComputeRhoAdvection(dest=fluid, sources=self.fluids,
+                                    warm_start=self.warm_start),
                 ComputeAII(dest=fluid, sources=self.fluids),
             ])
             if self.solids:
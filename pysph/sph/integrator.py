@@ -11,6 +11,7 @@ import numpy as np
 
 # Local imports.
 from .integrator_step import IntegratorStep
+from .profile import profile_ctx
 
 
 ###############################################################################
@@ -43,6 +44,8 @@ class Integrator(object):
         # This is set later when the underlying compiled integrator is created
         # by the SPHCompiler.
         self.c_integrator = None
+        # Do consecutive stages in one loop over the particles when compiled.
+        self.fuse_stages = False
 
     def __repr__(self):
         name = self.__class__.__name__
@@ -226,13 +229,16 @@ class Integrator(object):
         if update_nnps:
             # update NNPS since particles have moved
             if self.parallel_manager:
-                self.parallel_manager.update()
-            self.nnps.update()
+                with profile_ctx('parallel_manager.update'):
+                    self.parallel_manager.update()
+            with profile_ctx('nnps.update'):
+                self.nnps.update()
 
         # Evaluate
         c_integrator = self.c_integrator
         a_eval = self.acceleration_evals[index]
-        a_eval.compute(c_integrator.t, c_integrator.dt)
+        with profile_ctx('acceleration_eval.compute'):
+            a_eval.compute(c_integrator.t, c_integrator.dt)
 
     def initial_acceleration(self, t, dt):
         """Compute the initial accelerations if needed before the iterations start.
@@ -257,7 +263,8 @@ class Integrator(object):
         The integrator should explicitly call this when needed in the
         `one_timestep` method.
         """
-        self.nnps.update_domain()
+        with profile_ctx('nnps.update_domain'):
+            self.nnps.update_domain()
 
 
 ###############################################################################
@@ -98,8 +98,8 @@ cdef class Integrator:
         # Only iterate over real particles.
         NP_DEST = dst.size(real=True)
         ${indent(helper.get_array_setup(dest, method), 2)}
-        for d_idx in range(NP_DEST):
-            ${indent(helper.get_stepper_loop(dest, method), 3)}
+        ${indent(helper.get_stepper_loop_start(dest, method), 2)}
+                ${indent(helper.get_stepper_loop(dest, method), 4)}
         % endif
         % endfor
     % endfor
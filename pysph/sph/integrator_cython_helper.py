@@ -8,11 +8,12 @@ from the `sph_eval` module.
 
 import inspect
 from os.path import join, dirname
+import re
 from textwrap import dedent
 from mako.template import Template
 
 # Local imports.
-from pysph.sph.equation import get_array_names
+from pysph.sph.equation import get_array_names, is_thread_safe
 from compyle.api import CythonGenerator, get_func_definition
 
 
@@ -20,6 +21,9 @@ getfullargspec = getattr(
     inspect, 'getfullargspec', inspect.getargspec
 )
 
+# A line of the timestep code calling a stepper method, e.g. self.stage1().
+_STAGE_CALL = re.compile(r'^(\s*)self\.(\w+)\(\)\s*(#.*)?$')
+
 
 class IntegratorCythonHelper(object):
     """A helper that generates Cython code for the Integrator class.
@@ -29,6 +33,8 @@ class IntegratorCythonHelper(object):
         self.acceleration_eval_helper = acceleration_eval_helper
         pas = acceleration_eval_helper.object.particle_arrays
         self._particle_arrays = dict((x.name, x) for x in pas)
+        # Maps the names of the fused methods to the methods they call.
+        self._fused = {}
         if self.object is not None:
             self._check_integrator_steppers()
 
@@ -101,7 +107,7 @@ class IntegratorCythonHelper(object):
     def get_array_declarations(self, method):
         arrays = set()
         for dest in self.object.steppers:
-            s, d = get_array_names(self.get_args(dest, method))
+            s, d = self._get_array_names(dest, method)
             self._check_arrays_for_properties(dest, s | d)
             arrays.update(s | d)
 
@@ -115,23 +121,47 @@ class IntegratorCythonHelper(object):
         return '\n'.join(decl)
 
     def get_array_setup(self, dest, method):
-        s, d = get_array_names(self.get_args(dest, method))
+        s, d = self._get_array_names(dest, method)
         lines = ['%s = dst.%s.data' % (n, n[2:]) for n in sorted(s | d)]
         return '\n'.join(lines)
 
-    def get_stepper_loop(self, dest, method):
-        args = self.get_args(dest, method)
-        if 'self' in args:
-            args.remove('self')
-        call_args = ', '.join(args)
-        c = 'self.{obj}.{method}({args})'.format(
-            obj=dest+'_stepper', method=method, args=call_args
+    def get_stepper_loop_start(self, dest, method):
+        """Return the start of the loop over the particles for the stepper
+        of `dest`. This is run in parallel when using OpenMP unless the
+        stepper method is not thread safe.
+        """
+        a_helper = self.acceleration_eval_helper
+        stepper = self.object.steppers[dest]
+        parallel = a_helper.config.use_openmp and all(
+            is_thread_safe(stepper, m) for m in self._get_methods(method)
+            if hasattr(stepper, m)
         )
-        return c
+        if parallel:
+            return '%s\n    for d_idx in %s:' % (
+                a_helper.get_parallel_block(),
+                a_helper.get_parallel_range('NP_DEST')
+            )
+        else:
+            return 'if True: # Serial loop.\n    for d_idx in range(NP_DEST):'
+
+    def get_stepper_loop(self, dest, method):
+        lines = []
+        for name in self._get_methods(method):
+            if not hasattr(self.object.steppers[dest], name):
+                continue
+            args = self.get_args(dest, name)
+            if 'self' in args:
+                args.remove('self')
+            call_args = ', '.join(args)
+            lines.append('self.{obj}.{method}({args})'.format(
+                obj=dest+'_stepper', method=name, args=call_args
+            ))
+        return '\n'.join(lines)
 
     def get_py_stage_code(self, dest, method):
         stepper = self.object.steppers[dest]
-        method = 'py_' + method
+        # Only the first of the fused methods may have a py_ method.
+        method = 'py_' + self._get_methods(method)[0]
         if hasattr(stepper, method):
             return 'self.steppers["{dest}"].{method}(dst.array, t, dt)'.format(
                 dest=dest, method=method
@@ -140,32 +170,99 @@ class IntegratorCythonHelper(object):
             return ''
 
     def has_stepper_loop(self, dest, method):
-        return hasattr(self.object.steppers[dest], method)
+        stepper = self.object.steppers[dest]
+        return any(hasattr(stepper, x) for x in self._get_methods(method))
 
     def get_stepper_method_wrapper_names(self):
         """Returns the names of the methods we should wrap.  For a 2 stage
-        method this will return ('initialize', 'stage1', 'stage2')
+        method this will return ('initialize', 'stage1', 'stage2') along with
+        any fused methods, for example 'initialize_stage1'.
         """
-        methods = set()
-        for stepper in self.object.steppers.values():
-            stages = []
-            for x in dir(stepper):
-                if x.startswith('py_stage'):
-                    stages.append(x[3:])
-                elif x.startswith('stage') or x == 'initialize':
-                    stages.append(x)
-            methods.update(stages)
+        methods = set(self._get_stepper_methods())
+        methods.update(self._fused)
         return list(sorted(methods))
 
     def get_timestep_code(self):
         method = self.object.one_timestep
         sourcelines = inspect.getsourcelines(method)[0]
         defn, lines = get_func_definition(sourcelines)
-        return dedent(''.join(lines))
+        code = dedent(''.join(lines))
+        if getattr(self.object, 'fuse_stages', False):
+            code = self._fuse_stages(code)
+        return code
 
     ##########################################################################
     # Private interface.
     ##########################################################################
+    def _get_stepper_methods(self):
+        methods = set()
+        for stepper in self.object.steppers.values():
+            for x in dir(stepper):
+                if x.startswith('py_stage'):
+                    methods.add(x[3:])
+                elif x.startswith('stage') or x == 'initialize':
+                    methods.add(x)
+        return methods
+
+    def _get_methods(self, method):
+        return self._fused.get(method, [method])
+
+    def _get_array_names(self, dest, method):
+        s, d = set(), set()
+        for name in self._get_methods(method):
+            _s, _d = get_array_names(self.get_args(dest, name))
+            s.update(_s)
+            d.update(_d)
+        return s, d
+
+    def _can_fuse(self, methods, method):
+        """Return True if the `method` of the steppers can be called in the
+        same loop over the particles right after the given `methods`.
+        """
+        for stepper in self.object.steppers.values():
+            if hasattr(stepper, 'py_' + method):
+                return False
+            for name in list(methods) + [method]:
+                if hasattr(stepper, name) and \
+                   not is_thread_safe(stepper, name):
+                    return False
+        return True
+
+    def _fuse_stages(self, code):
+        """Replace consecutive calls to the stepper methods in the timestep
+        code, for example ``self.initialize()`` and ``self.stage1()``, by a
+        call to a fused method which does both in one pass over the particles.
+        """
+        methods = self._get_stepper_methods()
+        lines, run, pending = [], [], []
+
+        def flush():
+            if len(run) > 0:
+                name = '_'.join(run)
+                if len(run) > 1:
+                    self._fused[name] = list(run)
+                lines.append('%sself.%s()' % (indent, name))
+            lines.extend(pending)
+            del run[:], pending[:]
+
+        indent = ''
+        for line in code.splitlines():
+            match = _STAGE_CALL.match(line)
+            if match and match.group(2) in methods:
+                name = match.group(2)
+                if len(run) > 0 and (match.group(1) != indent or
+                                     not self._can_fuse(run, name)):
+                    flush()
+                indent = match.group(1)
+                run.append(name)
+            elif len(run) > 0 and (not line.strip() or
+                                   line.strip().startswith('#')):
+                pending.append(line)
+            else:
+                flush()
+                lines.append(line)
+        flush()
+        return '\n'.join(lines) + '\n'
 
     def _check_arrays_for_properties(self, dest, args):
         """Given a particle array name and a set of arguments used by an
@@ -9,7 +9,9 @@ Implement as many stages as needed.
 ###############################################################################
 class IntegratorStep(object):
     """Subclass this and implement the methods ``initialize``, ``stage1`` etc.
-    Use the same conventions as the equations.
+    Use the same conventions as the equations. With OpenMP, the methods are
+    called in parallel for the particles unless they are not thread safe,
+    see :py:func:`pysph.sph.equation.is_thread_safe`.
     """
     def __repr__(self):
         return '%s()'%(self.__class__.__name__)
@@ -0,0 +1,120 @@
+"""Simple timers used to profile the accelerations and the integrator.
+
+When profiling is enabled (``get_config().profile``), the generated
+acceleration evaluators time each group, each destination/source block and
+the initialize, loop, post_loop and reduce phases. The integrator also times
+the NNPS updates. The timings are accumulated in a global :py:class:`Profiler`
+which can be printed as a table or saved as JSON.
+"""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import json
+from timeit import default_timer as timer
+
+from compyle.config import get_config
+
+
+class Profiler(object):
+    """Accumulate the number of calls and the total time for named timers.
+    """
+
+    def __init__(self):
+        self.data = OrderedDict()
+        self.equations = {}
+
+    def add(self, name, time, calls=1):
+        """Add the time taken for `calls` calls of the timer `name`."""
+        info = self.data.get(name)
+        if info is None:
+            info = self.data[name] = [0, 0.0]
+        info[0] += calls
+        info[1] += time
+
+    def describe(self, name, equations):
+        """Set the names of the equations timed by the timer `name`."""
+        known = self.equations.setdefault(name, [])
+        known.extend(x for x in equations if x not in known)
+
+    def reset(self):
+        self.data.clear()
+        self.equations.clear()
+
+    def get_info(self):
+        """Return a list of dictionaries with the name, number of calls,
+        total time and the equations (if any) for each timer, in the order
+        they were first used.
+        """
+        return [
+            dict(name=name, calls=calls, time=time,
+                 equations=self.equations.get(name, []))
+            for name, (calls, time) in self.data.items()
+        ]
+
+    def get_table(self, total_time=None):
+        """Return a string with a table of the timings and the equations
+        timed by each timer.
+
+        If `total_time` is given, the fraction of the total time taken by
+        each timer is also shown.
+        """
+        info = self.get_info()
+        width = max([len(x['name']) for x in info] + [4])
+        fmt = '%-{w}s %10s %10s %6s  %s'.format(w=width)
+        hr = '-'*78
+        header = fmt % ('Name', 'Calls', 'Time', '%', 'Equations')
+        lines = [hr, header, hr]
+        for item in info:
+            if total_time:
+                pct = '%6.1f' % (100.0*item['time']/total_time)
+            else:
+                pct = ''
+            line = fmt % (
+                item['name'], item['calls'], '%.4g' % item['time'], pct,
+                ', '.join(item['equations'])
+            )
+            lines.append(line.rstrip())
+        lines.append(hr)
+        return '\n'.join(lines)
+
+    def print_table(self, total_time=None):
+        print(self.get_table(total_time))
+
+    def save(self, fname, **metadata):
+        """Save the timings to the given JSON file along with any additional
+        metadata passed as keyword arguments.
+        """
+        data = dict(metadata)
+        data['timers'] = self.get_info()
+        with open(fname, 'w') as f:
+            json.dump(data, f, indent=2)
+
+
+_profiler = Profiler()
+
+
+def get_profiler():
+    """Return the global profiler."""
+    return _profiler
+
+
+def is_profiling():
+    return bool(get_config().profile)
+
+
+@contextmanager
+def profile_ctx(name):
+    """Time the enclosed code if profiling is enabled, for example::
+
+        with profile_ctx('nnps.update'):
+            nnps.update()
+
+    """
+    if not is_profiling():
+        yield
+        return
+    start = timer()
+    try:
+        yield
+    finally:
+        _profiler.add(name, timer() - start)
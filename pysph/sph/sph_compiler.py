@@ -1,3 +1,58 @@
+from concurrent.futures import ProcessPoolExecutor
+import os
+from os.path import exists
+
+
+def _build_ext_module(ext_module, use_openmp):
+    """Build the given ExtModule, this is run in a separate process.
+    """
+    from compyle.config import get_config
+    get_config().use_openmp = use_openmp
+    ext_module.write_and_build()
+    return ext_module.ext_path
+
+
+def build_ext_modules(ext_modules, n_jobs=None):
+    """Build the given compyle ExtModules that are not already built,
+    concurrently in a pool of processes.
+
+    The modules are only built and not loaded, a subsequent ``load()`` on
+    each of them picks up the built extension.  Modules sharing the same
+    code are built once and if only one module needs to be built, it is
+    built in this process.
+
+    Parameters
+    ----------
+
+    ext_modules: list of compyle.ext_module.ExtModule instances.
+    n_jobs: int: maximum number of processes to use, defaults to the number
+        of CPUs.
+
+    Returns the list of the paths of the extensions that were built.
+    """
+    pending = {}
+    for ext_mod in ext_modules:
+        if not exists(ext_mod.ext_path):
+            pending.setdefault(ext_mod.ext_path, ext_mod)
+    pending = list(pending.values())
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = min(n_jobs, len(pending))
+    if n_jobs < 2:
+        for ext_mod in pending:
+            ext_mod.write_and_build()
+        return [ext_mod.ext_path for ext_mod in pending]
+
+    from compyle.config import get_config
+    use_openmp = get_config().use_openmp
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        futures = [
+            executor.submit(_build_ext_module, ext_mod, use_openmp)
+            for ext_mod in pending
+        ]
+        return [f.result() for f in futures]
+
+
 class SPHCompiler(object):
     def __init__(self, acceleration_evals, integrator):
         """Compiles the acceleration evaluator and integrator to produce a
@@ -23,10 +78,16 @@ class SPHCompiler(object):
         self.module = None
 
     # Public interface. ####################################################
-    def compile(self):
+    def compile(self, n_jobs=None):
         """Compile the generated code to extension modules and
         setup the objects that need this by calling their
         setup_compiled_module.
+
+        Parameters
+        ----------
+
+        n_jobs: int: maximum number of processes used to build the Cython
+            extension modules concurrently, defaults to the number of CPUs.
         """
         if self.module is not None:
             return
@@ -35,6 +96,8 @@ class SPHCompiler(object):
         # The rest of the acceleration evals (if present) are independent.
         code0 = self._get_code()
         helper0 = self.acceleration_eval_helpers[0]
+        if self.backend == 'cython':
+            self.build(code0, n_jobs=n_jobs)
         mod = helper0.compile(code0)
         helper0.setup_compiled_module(mod)
 
@@ -57,6 +120,34 @@ class SPHCompiler(object):
             mod = helper.compile(helper.get_code())
             helper.setup_compiled_module(mod)
 
+    def build(self, code0=None, n_jobs=None):
+        """Build the Cython extension modules for all the acceleration evals
+        without loading them.  The modules that are not already in the cache
+        are built concurrently.
+
+        Parameters
+        ----------
+
+        code0: str: code for the first acceleration eval and the integrator,
+            generated if not given.
+        n_jobs: int: maximum number of processes to use, defaults to the
+            number of CPUs.
+
+        Returns the list of the paths of the extensions that were built.
+        """
+        if self.backend != 'cython':
+            raise NotImplementedError(
+                'Only the Cython extension modules can be built ahead.'
+            )
+        if code0 is None:
+            code0 = self._get_code()
+        helpers = self.acceleration_eval_helpers
+        ext_modules = [helpers[0].get_ext_module(code0)]
+        ext_modules.extend(
+            helper.get_ext_module(helper.get_code()) for helper in helpers[1:]
+        )
+        return build_ext_modules(ext_modules, n_jobs=n_jobs)
+
     # Private interface. ####################################################
     def _get_code(self):
         main = self.acceleration_eval_helpers[0].get_code()
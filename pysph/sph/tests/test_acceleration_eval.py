@@ -10,18 +10,24 @@ import pytest
 import numpy as np
 
 # Local imports.
-from pysph.base.utils import get_particle_array
+from pysph.base.utils import get_particle_array, set_precision
 from compyle.config import get_config
 from compyle.api import declare
 from pysph.sph.equation import Equation, Group
 from pysph.sph.acceleration_eval import (
     AccelerationEval, MegaGroup, CythonGroup,
-    check_equation_array_properties
+    check_equation_array_properties, fuse_adjacent_groups, setup_pair_cache,
+    setup_symmetric_loops
 )
-from pysph.sph.basic_equations import SummationDensity
+from pysph.sph.equation import get_pair_updates, is_thread_safe
+from pysph.sph.basic_equations import ContinuityEquation, SummationDensity
+from pysph.sph.wc.basic import MomentumEquation
 from pysph.base.kernels import CubicSpline
 from pysph.base.nnps import LinkedListNNPS as NNPS
+from pysph.base.nnps_base import get_number_of_threads, \
+    set_number_of_threads
 from pysph.sph.sph_compiler import SPHCompiler
+from pysph.sph.profile import get_profiler
 
 from pysph.base.reduce_array import serial_reduce_array
 
@@ -227,6 +233,294 @@ class InitializePair(Equation):
         d_u[d_idx] = s_u[d_idx]*1.5
 
 
+class KernelSum(Equation):
+    def initialize(self, d_idx, d_au):
+        d_au[d_idx] = 0.0
+
+    def loop(self, d_idx, d_au, s_idx, s_m, WIJ, DWIJ):
+        d_au[d_idx] += s_m[s_idx]*(WIJ + DWIJ[0])
+
+
+class ScaleH(Equation):
+    def post_loop(self, d_idx, d_h):
+        d_h[d_idx] *= 1.0
+
+
+class ScaledMass(Equation):
+    def __init__(self, dest, sources, scale, index):
+        self.scale = scale
+        self.index = index
+        super(ScaledMass, self).__init__(dest, sources)
+
+    def post_loop(self, d_idx, d_u, d_m):
+        d_u[d_idx] = self.scale*d_m[d_idx] + d_m[self.index]
+
+
+class HalveU(Equation):
+    residual_reduction = 'max'
+
+    def __init__(self, dest, sources, tolerance):
+        self.tolerance = tolerance
+        super(HalveU, self).__init__(dest, sources)
+
+    def post_loop(self, d_idx, d_u):
+        d_u[d_idx] *= 0.5
+
+    def residual(self, d_idx, d_u):
+        return abs(d_u[d_idx])
+
+    def converged(self):
+        if self.residual_value < self.tolerance:
+            return 1.0
+        else:
+            return -1.0
+
+
+class MeanMass(Equation):
+    residual_reduction = 'mean'
+
+    def residual(self, d_idx, d_m):
+        return d_m[d_idx]
+
+
+class TestPairCache(unittest.TestCase):
+    def test_should_share_symbols_used_by_several_groups(self):
+        # Given
+        groups = [
+            Group(equations=[SummationDensity(dest='f', sources=['f'])]),
+            Group(equations=[KernelSum(dest='f', sources=['f'])]),
+        ]
+        mega_groups = [MegaGroup(g, CythonGroup) for g in groups]
+
+        # When
+        n_buffers, info = setup_pair_cache(mega_groups)
+
+        # Then
+        self.assertEqual(n_buffers, 1)
+        shared = ['HIJ', 'R2IJ', 'RIJ', 'WIJ', 'XIJ']
+        self.assertEqual(info, [('f', 'f', shared, 7)])
+        first = mega_groups[0].data['f'][1]['f']
+        second = mega_groups[1].data['f'][1]['f']
+        self.assertEqual(first.pair_cache.stores, shared)
+        self.assertEqual(first.pair_cache.loads, [])
+        self.assertTrue(first.pair_cache.setup)
+        self.assertEqual(second.pair_cache.stores, [])
+        self.assertEqual(second.pair_cache.loads, shared)
+        self.assertFalse(second.pair_cache.setup)
+        self.assertEqual(sorted(second.precomputed.keys()), ['DWIJ'])
+
+    def test_should_not_share_symbols_when_h_changes(self):
+        # Given
+        groups = [
+            Group(equations=[SummationDensity(dest='f', sources=['f'])]),
+            Group(equations=[ScaleH(dest='f', sources=None)]),
+            Group(equations=[KernelSum(dest='f', sources=['f'])]),
+        ]
+        mega_groups = [MegaGroup(g, CythonGroup) for g in groups]
+
+        # When
+        n_buffers, info = setup_pair_cache(mega_groups)
+
+        # Then
+        self.assertEqual(n_buffers, 0)
+        self.assertEqual(info, [])
+        second = mega_groups[2].data['f'][1]['f']
+        self.assertIsNone(second.pair_cache)
+
+
+class TestGroupFusion(unittest.TestCase):
+    def test_should_fuse_independent_groups(self):
+        # Given
+        groups = [
+            Group(equations=[SummationDensity(dest='f', sources=['f'])]),
+            Group(equations=[KernelSum(dest='f', sources=['f'])], post=id),
+        ]
+
+        # When
+        fused, report = fuse_adjacent_groups(groups)
+
+        # Then
+        self.assertEqual(len(fused), 1)
+        names = [eq.name for eq in fused[0].equations]
+        self.assertEqual(names, ['SummationDensity', 'KernelSum'])
+        self.assertEqual(fused[0].post, id)
+        self.assertEqual(report, ['Fused group 0, group 1.'])
+
+    def test_should_not_fuse_dependent_groups(self):
+        # Given
+        groups = [
+            Group(equations=[SummationDensity(dest='f', sources=['f'])]),
+            Group(equations=[
+                MomentumEquation(dest='f', sources=['f'], c0=1.0)
+            ]),
+            Group(equations=[KernelSum(dest='f', sources=['f'])],
+                  iterate=True),
+        ]
+
+        # When
+        fused, report = fuse_adjacent_groups(groups)
+
+        # Then
+        self.assertEqual(len(fused), 3)
+        self.assertEqual(len(report), 2)
+        self.assertTrue(report[0].startswith(
+            'Not fusing group 1 with group 0: reads f.rho'
+        ))
+        self.assertEqual(
+            report[1], 'Not fusing group 2 with group 1: is iterated.'
+        )
+
+    def test_should_consider_arrays_used_by_precomputed_symbols(self):
+        # Given
+        groups = [
+            Group(equations=[KernelSum(dest='f', sources=['f'])]),
+            Group(equations=[ScaleH(dest='f', sources=None)]),
+        ]
+
+        # When
+        fused, report = fuse_adjacent_groups(groups)
+
+        # Then
+        # The smoothing lengths are used to compute WIJ and DWIJ.
+        self.assertEqual(len(fused), 2)
+        expect = 'Not fusing group 1 with group 0: writes f.h used before.'
+        self.assertEqual(report, [expect])
+
+    def test_should_fuse_sub_groups(self):
+        # Given
+        groups = [
+            Group(equations=[
+                Group(equations=[SummationDensity(dest='f', sources=['f'])]),
+                Group(equations=[KernelSum(dest='f', sources=['f'])]),
+            ], iterate=True, max_iterations=3)
+        ]
+
+        # When
+        fused, report = fuse_adjacent_groups(groups)
+
+        # Then
+        self.assertEqual(len(fused), 1)
+        self.assertTrue(fused[0].iterate)
+        self.assertEqual(fused[0].max_iterations, 3)
+        self.assertEqual(len(fused[0].equations), 1)
+        self.assertEqual(len(fused[0].equations[0].equations), 2)
+        self.assertEqual(report, ['Fused group 0.0, group 0.1.'])
+
+
+class BadPairUpdate(Equation):
+    symmetric = True
+
+    def loop(self, d_idx, d_au, s_idx, s_m, WIJ):
+        d_au[d_idx] += s_m[s_idx]*WIJ
+
+    def loop_pair(self, d_idx, d_au, d_m, s_idx, s_au, s_m, WIJ):
+        d_au[d_idx] = s_m[s_idx]*WIJ
+        s_au[s_idx] = d_m[d_idx]*WIJ
+
+
+class OverriddenContinuity(ContinuityEquation):
+    def loop(self, d_idx, d_arho, s_idx, s_m, DWIJ, VIJ):
+        d_arho[d_idx] += 2.0*s_m[s_idx]*DWIJ[0]*VIJ[0]
+
+
+class TestSymmetricLoops(unittest.TestCase):
+    def test_should_find_pair_updates(self):
+        # Given
+        eq = MomentumEquation(dest='f', sources=['f'], c0=1.0, alpha=0.1,
+                              beta=0.0)
+
+        # When
+        updates = get_pair_updates(eq)
+
+        # Then
+        expect = dict(au='sum', av='sum', aw='sum', dt_cfl='max')
+        self.assertEqual(updates, expect)
+        expect = dict(arho='sum')
+        eq = ContinuityEquation(dest='f', sources=['f'])
+        self.assertEqual(get_pair_updates(eq), expect)
+
+    def test_should_raise_error_for_unsupported_updates(self):
+        # Given
+        g = Group(equations=[BadPairUpdate(dest='f', sources=['f'])])
+        mg = MegaGroup(g, CythonGroup)
+
+        # When/Then
+        self.assertRaises(RuntimeError, setup_symmetric_loops, [mg])
+
+    def test_should_use_symmetric_loops_only_for_same_source(self):
+        # Given
+        g = Group(equations=[
+            ContinuityEquation(dest='f', sources=['f', 's']),
+            OverriddenContinuity(dest='s', sources=['s']),
+        ])
+        mg = MegaGroup(g, CythonGroup)
+
+        # When
+        setup_symmetric_loops([mg])
+
+        # Then
+        sources = mg.data['f'][1]
+        self.assertTrue(sources['f'].symmetric)
+        self.assertFalse(sources['s'].symmetric)
+        self.assertFalse(mg.data['s'][1]['s'].symmetric)
+
+    def test_should_not_use_symmetric_loops_if_precomputed_is_modified(self):
+        # Given
+        from pysph.sph.wc.kernel_correction import GradientCorrection
+        g = Group(equations=[
+            GradientCorrection(dest='f', sources=['f'], dim=2),
+            ContinuityEquation(dest='f', sources=['f']),
+        ])
+        mg = MegaGroup(g, CythonGroup)
+
+        # When
+        found = setup_symmetric_loops([mg])
+
+        # Then
+        eq_group = mg.data['f'][1]['f']
+        self.assertFalse(found)
+        self.assertFalse(eq_group.symmetric)
+        self.assertEqual(eq_group.get_precomputed_writes(), ['DWIJ'])
+        self.assertRaises(RuntimeError, eq_group.set_symmetric, True)
+
+
+class IndexedPostLoop(Equation):
+    def post_loop(self, d_idx, d_au, d_m):
+        i, i3 = declare('int', 2)
+        i3 = 3*d_idx
+        for i in range(3):
+            d_au[i3 + i] = d_m[d_idx]
+
+
+class UnsafeInitialize(SummationDensity):
+    thread_safe = False
+
+
+class TestThreadSafety(unittest.TestCase):
+    def test_should_detect_thread_safe_methods(self):
+        # Given
+        eq = SummationDensity(dest='f', sources=['f'])
+        reduction = FindTotalMass(dest='f', sources=['f'])
+        indexed = IndexedPostLoop(dest='f', sources=None)
+
+        # When/Then
+        self.assertTrue(is_thread_safe(eq, 'initialize'))
+        self.assertTrue(is_thread_safe(reduction, 'initialize'))
+        self.assertFalse(is_thread_safe(reduction, 'post_loop'))
+        self.assertTrue(is_thread_safe(indexed, 'post_loop'))
+
+    def test_should_respect_thread_safe_attribute(self):
+        # Given
+        g = Group(equations=[
+            UnsafeInitialize(dest='f', sources=['f']),
+            ContinuityEquation(dest='f', sources=['f'])
+        ])
+
+        # When/Then
+        self.assertFalse(g.is_thread_safe('initialize'))
+        self.assertTrue(g.is_thread_safe('loop'))
+
+
 class TestMegaGroup(unittest.TestCase):
     def test_ensure_group_retains_user_order_of_equations(self):
         # Given
@@ -289,15 +583,22 @@ class TestAccelerationEval1D(unittest.TestCase):
         pa = get_particle_array(name='fluid', x=x, h=h, m=m)
         self.pa = pa
 
-    def _make_accel_eval(self, equations, cache_nnps=False):
+    def _make_accel_eval(self, equations, cache_nnps=False,
+                         cache_pair_values=False, fuse_groups=False,
+                         symmetric_loops=False, compressed_neighbors=False):
         arrays = [self.pa]
         kernel = CubicSpline(dim=self.dim)
         a_eval = AccelerationEval(
-            particle_arrays=arrays, equations=equations, kernel=kernel
+            particle_arrays=arrays, equations=equations, kernel=kernel,
+            cache_pair_values=cache_pair_values, fuse_groups=fuse_groups,
+            symmetric_loops=symmetric_loops,
+            compressed_neighbors=compressed_neighbors
         )
         comp = SPHCompiler(a_eval, integrator=None)
         comp.compile()
         nnps = NNPS(dim=kernel.dim, particles=arrays, cache=cache_nnps)
+        if compressed_neighbors:
+            nnps.set_cache_compression(True)
         nnps.update()
         a_eval.set_nnps(nnps)
         return a_eval
@@ -518,6 +819,415 @@ class TestAccelerationEval1D(unittest.TestCase):
         expect = np.asarray([7., 9., 11., 11., 11., 11., 11., 11., 9., 7.])
         self.assertListEqual(list(pa.u), list(expect))
 
+    def test_should_give_same_results_with_pair_cache(self):
+        # Given
+        pa = self.pa
+
+        def make_equations():
+            return [
+                Group(equations=[
+                    SummationDensity(dest='fluid', sources=['fluid'])
+                ]),
+                Group(equations=[KernelSum(dest='fluid', sources=['fluid'])]),
+            ]
+
+        a_eval = self._make_accel_eval(make_equations(), cache_nnps=True)
+        a_eval.compute(0.1, 0.1)
+        expect_rho, expect_au = pa.rho.copy(), pa.au.copy()
+
+        # When
+        pa.rho[:] = 0.0
+        pa.au[:] = 0.0
+        a_eval = self._make_accel_eval(
+            make_equations(), cache_nnps=True, cache_pair_values=True
+        )
+        a_eval.compute(0.1, 0.1)
+
+        # Then
+        self.assertTrue(np.allclose(pa.rho, expect_rho))
+        self.assertTrue(np.allclose(pa.au, expect_au))
+        self.assertEqual(a_eval.n_pair_cache_buffers, 1)
+        self.assertTrue(a_eval.get_pair_cache_nbytes() > 0)
+
+    def test_should_give_same_results_with_fused_groups(self):
+        # Given
+        pa = self.pa
+
+        def make_equations():
+            return [
+                Group(equations=[
+                    SummationDensity(dest='fluid', sources=['fluid'])
+                ]),
+                Group(equations=[KernelSum(dest='fluid', sources=['fluid'])]),
+            ]
+
+        a_eval = self._make_accel_eval(make_equations())
+        a_eval.compute(0.1, 0.1)
+        expect_rho, expect_au = pa.rho.copy(), pa.au.copy()
+
+        # When
+        pa.rho[:] = 0.0
+        pa.au[:] = 0.0
+        a_eval = self._make_accel_eval(make_equations(), fuse_groups=True)
+        a_eval.compute(0.1, 0.1)
+
+        # Then
+        self.assertEqual(len(a_eval.mega_groups), 1)
+        self.assertEqual(a_eval.fusion_report, ['Fused group 0, group 1.'])
+        self.assertTrue(np.allclose(pa.rho, expect_rho))
+        self.assertTrue(np.allclose(pa.au, expect_au))
+
+    def test_should_time_groups_when_profiling(self):
+        # Given
+        equations = [
+            Group(equations=[
+                SummationDensity(dest='fluid', sources=['fluid'])
+            ]),
+            Group(equations=[ScaleH(dest='fluid', sources=None)]),
+        ]
+        profiler = get_profiler()
+        profiler.reset()
+        orig = get_config().profile
+        get_config().profile = True
+        try:
+            a_eval = self._make_accel_eval(equations)
+
+            # When
+            a_eval.compute(0.1, 0.1)
+            a_eval.compute(0.1, 0.1)
+        finally:
+            get_config().profile = orig
+
+        # Then
+        info = dict((x['name'], x) for x in profiler.get_info())
+        profiler.reset()
+        expect = ['g0', 'g0/fluid', 'g0/fluid/initialize',
+                  'g0/fluid<-fluid/loop', 'g1', 'g1/fluid',
+                  'g1/fluid/post_loop']
+        self.assertEqual(sorted(info.keys()), expect)
+        self.assertEqual(info['g0/fluid<-fluid/loop']['calls'], 2)
+        self.assertEqual(info['g0/fluid<-fluid/loop']['equations'],
+                         ['SummationDensity'])
+
+    def test_should_give_same_results_with_symmetric_loops(self):
+        # Given
+        pa = self.pa
+        pa.add_property('arho')
+        pa.u[:] = np.sin(pa.x)
+        equations = [Group(equations=[
+            OverriddenContinuity(dest='fluid', sources=['fluid'])
+        ])]
+        a_eval = self._make_accel_eval(equations)
+        a_eval.compute(0.1, 0.1)
+        expect = 0.5*pa.arho
+
+        # When
+        equations = [Group(equations=[
+            ContinuityEquation(dest='fluid', sources=['fluid'])
+        ])]
+        a_eval = self._make_accel_eval(equations, symmetric_loops=True)
+        a_eval.compute(0.1, 0.1)
+
+        # Then
+        group = a_eval.mega_groups[0].data['fluid'][1]['fluid']
+        self.assertTrue(group.symmetric)
+        self.assertTrue(np.allclose(pa.arho, expect))
+
+    def test_should_decode_compressed_neighbors(self):
+        # Given
+        pa = self.pa
+        equations = [Group(equations=[
+            SummationDensity(dest='fluid', sources=['fluid'])
+        ])]
+        a_eval = self._make_accel_eval(equations)
+        a_eval.compute(0.1, 0.1)
+        expect = pa.rho.copy()
+
+        # When
+        pa.rho[:] = 0.0
+        a_eval = self._make_accel_eval(
+            equations, cache_nnps=True, compressed_neighbors=True
+        )
+        a_eval.compute(0.1, 0.1)
+        # The compressed cache is built by the update after it is used.
+        a_eval.nnps.update()
+        pa.rho[:] = 0.0
+        a_eval.compute(0.1, 0.1)
+
+        # Then
+        self.assertIsNotNone(a_eval.nnps.get_cache_compression_stats())
+        np.testing.assert_allclose(pa.rho, expect)
+
+    def test_should_reject_compressed_neighbors_unless_enabled(self):
+        # Given
+        equations = [Group(equations=[
+            SummationDensity(dest='fluid', sources=['fluid'])
+        ])]
+        a_eval = self._make_accel_eval(equations)
+        nnps = NNPS(dim=self.dim, particles=[self.pa], cache=True)
+        nnps.set_cache_compression(True)
+
+        # When/Then
+        self.assertRaises(RuntimeError, a_eval.set_nnps, nnps)
+
+    def test_should_not_use_symmetric_loops_by_default(self):
+        # Given
+        self.pa.add_property('arho')
+        equations = [Group(equations=[
+            ContinuityEquation(dest='fluid', sources=['fluid'])
+        ])]
+
+        # When
+        a_eval = self._make_accel_eval(equations)
+
+        # Then
+        group = a_eval.mega_groups[0].data['fluid'][1]['fluid']
+        self.assertFalse(group.symmetric)
+
+    def test_should_split_symmetric_loops_with_other_equations(self):
+        # Given
+        pa = self.pa
+        pa.add_property('arho')
+        pa.u[:] = np.sin(pa.x)
+
+        def make_equations():
+            return [Group(equations=[
+                SummationDensity(dest='fluid', sources=['fluid']),
+                ContinuityEquation(dest='fluid', sources=['fluid'])
+            ])]
+
+        a_eval = self._make_accel_eval(make_equations())
+        a_eval.compute(0.1, 0.1)
+        expect_rho, expect_arho = pa.rho.copy(), pa.arho.copy()
+
+        # When
+        pa.rho[:] = 0.0
+        pa.arho[:] = 0.0
+        a_eval = self._make_accel_eval(
+            make_equations(), symmetric_loops=True
+        )
+        a_eval.compute(0.1, 0.1)
+
+        # Then
+        group = a_eval.mega_groups[0].data['fluid'][1]['fluid']
+        self.assertTrue(group.symmetric)
+        self.assertTrue(
+            group.get_symmetric_loop_code().startswith('if s_idx < d_idx:')
+        )
+        self.assertNotIn('summation_density', group.get_symmetric_loop_code())
+        np.testing.assert_allclose(pa.rho, expect_rho)
+        np.testing.assert_allclose(pa.arho, expect_arho, atol=1e-12)
+
+    def test_should_support_single_precision_properties(self):
+        # Given
+        pa = self.pa
+        pa.add_property('arho')
+        pa.u[:] = np.sin(pa.x)
+
+        def make_equations():
+            return [
+                Group(equations=[
+                    SummationDensity(dest='fluid', sources=['fluid'])
+                ]),
+                Group(equations=[
+                    ContinuityEquation(dest='fluid', sources=['fluid'])
+                ]),
+            ]
+
+        a_eval = self._make_accel_eval(make_equations())
+        a_eval.compute(0.1, 0.1)
+        expect_rho, expect_arho = pa.rho.copy(), pa.arho.copy()
+
+        # When
+        set_precision([pa], 'single')
+        pa.rho[:] = 0.0
+        pa.arho[:] = 0.0
+        a_eval = self._make_accel_eval(make_equations())
+        a_eval.compute(0.1, 0.1)
+
+        # Then
+        self.assertEqual(pa.get_carray('rho').get_c_type(), 'float')
+        np.testing.assert_allclose(pa.rho, expect_rho, rtol=1e-5)
+        np.testing.assert_allclose(pa.arho, expect_arho, rtol=1e-4,
+                                   atol=1e-5)
+
+    def test_should_use_single_precision_symmetric_buffers_with_openmp(self):
+        # Given
+        pa = self.pa
+        pa.add_property('arho')
+        pa.u[:] = np.sin(pa.x)
+        equations = [Group(equations=[
+            ContinuityEquation(dest='fluid', sources=['fluid'])
+        ])]
+        a_eval = self._make_accel_eval(equations)
+        a_eval.compute(0.1, 0.1)
+        expect = pa.arho.copy()
+
+        # When
+        set_precision([pa], 'single')
+        pa.arho[:] = 0.0
+        cfg = get_config()
+        orig = cfg.use_openmp
+        cfg.use_openmp = True
+        try:
+            a_eval = self._make_accel_eval(equations, symmetric_loops=True)
+            a_eval.compute(0.1, 0.1)
+        finally:
+            cfg.use_openmp = orig
+
+        # Then
+        buffers = a_eval.c_acceleration_eval._symmetric_buffers
+        self.assertEqual(
+            [x.get_c_type() for x in buffers.values()], ['float']
+        )
+        np.testing.assert_allclose(pa.arho, expect, rtol=1e-4, atol=1e-5)
+
+    def test_should_reset_symmetric_buffers_of_each_thread(self):
+        # Given
+        pa = self.pa
+        pa.add_property('arho')
+        pa.u[:] = np.sin(pa.x)
+
+        def make_equations():
+            return [Group(equations=[
+                SummationDensity(dest='fluid', sources=['fluid']),
+                ContinuityEquation(dest='fluid', sources=['fluid'])
+            ])]
+
+        a_eval = self._make_accel_eval(make_equations())
+        a_eval.compute(0.1, 0.1)
+        expect_rho, expect_arho = pa.rho.copy(), pa.arho.copy()
+
+        # When
+        cfg = get_config()
+        orig = cfg.use_openmp
+        n_threads = get_number_of_threads()
+        cfg.use_openmp = True
+        set_number_of_threads(4)
+        try:
+            a_eval = self._make_accel_eval(
+                make_equations(), symmetric_loops=True
+            )
+            for i in range(2):
+                pa.rho[:] = 0.0
+                pa.arho[:] = 0.0
+                a_eval.compute(0.1, 0.1)
+        finally:
+            cfg.use_openmp = orig
+            set_number_of_threads(n_threads)
+
+        # Then
+        np.testing.assert_allclose(pa.rho, expect_rho)
+        np.testing.assert_allclose(pa.arho, expect_arho, atol=1e-12)
+
+    def test_should_update_equation_parameters_without_compiling(self):
+        # Given
+        pa = self.pa
+        a_eval = self._make_accel_eval(
+            [ScaledMass(dest='fluid', sources=None, scale=2, index=0)]
+        )
+        module = a_eval.c_acceleration_eval.__class__
+        a_eval.compute(0.1, 0.1)
+        np.testing.assert_allclose(pa.u, 3.0)
+
+        # When
+        a_eval.update_equations(
+            [ScaledMass(dest='fluid', sources=None, scale=0.5, index=1)]
+        )
+        a_eval.compute(0.1, 0.1)
+
+        # Then
+        self.assertIs(a_eval.c_acceleration_eval.__class__, module)
+        self.assertEqual(a_eval.all_group.equations[0].scale, 0.5)
+        np.testing.assert_allclose(pa.u, 1.5)
+
+        # When/Then
+        with self.assertRaises(ValueError):
+            a_eval.update_equations(
+                [ScaledMass(dest='fluid', sources=None, scale=1.0, index=0.5)]
+            )
+        with self.assertRaises(ValueError):
+            a_eval.update_equations(
+                [SummationDensity(dest='fluid', sources=['fluid'])]
+            )
+
+    def test_should_track_residuals_of_iterated_group(self):
+        # Given
+        pa = self.pa
+        pa.u[:] = pa.x
+        equations = [Group(
+            equations=[
+                HalveU(dest='fluid', sources=None, tolerance=0.1),
+                MeanMass(dest='fluid', sources=None)
+            ],
+            iterate=True, max_iterations=10
+        )]
+        a_eval = self._make_accel_eval(equations)
+
+        # When
+        a_eval.compute(0.1, 0.1)
+
+        # Then
+        history = a_eval.get_residual_history()
+        self.assertEqual(sorted(history.keys()), ['halve_u0', 'mean_mass0'])
+        np.testing.assert_allclose(
+            history['halve_u0'], [0.5, 0.25, 0.125, 0.0625]
+        )
+        np.testing.assert_allclose(history['mean_mass0'], np.ones(4))
+        np.testing.assert_allclose(pa.u, pa.x/16)
+
+        # When
+        a_eval.compute(0.1, 0.1)
+
+        # Then
+        history = a_eval.get_residual_history()
+        np.testing.assert_allclose(history['halve_u0'], [0.03125])
+
+
+class TestIntegerParameters(unittest.TestCase):
+    def test_should_compile_equations_using_integer_parameters(self):
+        # Given
+        from pysph.base.kernels import QuinticSpline
+        from pysph.sph.wc.crksph import CRKSPHScheme
+        from pysph.sph.wc.kernel_correction import (
+            GradientCorrection, GradientCorrectionPreStep,
+            MixedGradientCorrection
+        )
+        x, y = np.mgrid[0:1:0.1, 0:1:0.1]
+        pa = get_particle_array(
+            name='fluid', x=x.ravel(), y=y.ravel(), h=0.13, m=0.01, rho=1.0
+        )
+        scheme = CRKSPHScheme(
+            ['fluid'], dim=2, rho0=1.0, c0=10.0, nu=0.0, h0=0.1, p0=1.0
+        )
+        scheme.setup_properties([pa])
+        pa.add_property('m_mat', stride=9)
+        pa.add_property('dw_gamma', stride=3)
+        pa.add_property('cwij')
+        equations = scheme.get_equations() + [
+            Group(equations=[
+                GradientCorrectionPreStep('fluid', ['fluid'], dim=2)
+            ]),
+            Group(equations=[
+                GradientCorrection('fluid', ['fluid'], dim=2),
+                MixedGradientCorrection('fluid', ['fluid'], dim=2),
+                ContinuityEquation('fluid', ['fluid'])
+            ])
+        ]
+        a_eval = AccelerationEval(
+            particle_arrays=[pa], equations=equations,
+            kernel=QuinticSpline(dim=2)
+        )
+
+        # When
+        SPHCompiler(a_eval, integrator=None).compile()
+
+        # Then
+        c_eval = a_eval.c_acceleration_eval
+        self.assertIsInstance(c_eval.gradient_correction0.dim, int)
+        self.assertIsInstance(c_eval.gradient_correction0.tol, float)
+        self.assertIsInstance(c_eval.crksph0.dim, int)
+
 
 class EqWithTime(Equation):
     def initialize(self, d_idx, d_au, t, dt):
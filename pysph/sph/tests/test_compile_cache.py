@@ -0,0 +1,120 @@
+# Standard library imports.
+import os
+from os.path import dirname, exists, join
+import shutil
+import tempfile
+import time
+import unittest
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+# Local library imports.
+from compyle.ext_module import get_platform_dir
+from pysph.sph.compile_cache import (
+    CachedExtModule, clean_cache, get_cache_dir, get_cache_entries,
+    get_shared_cache_dirs
+)
+
+
+CODE = '''
+def f():
+    return 1
+'''
+
+
+class TestCompileCache(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _make_entry(self, name, nbytes, age):
+        path = join(self.root, name[2:4])
+        if not exists(path):
+            os.makedirs(path)
+        mtime = time.time() - age*86400
+        for ext in ('.pyx', '.so'):
+            fname = join(path, name + ext)
+            with open(fname, 'wb') as f:
+                f.write(b'x'*nbytes)
+            os.utime(fname, (mtime, mtime))
+
+    def test_should_use_cache_dirs_from_environment(self):
+        # Given
+        shared = os.pathsep.join(['/a', '/b'])
+        env = {'PYSPH_CACHE_DIR': self.root, 'PYSPH_SHARED_CACHE': shared}
+
+        # When
+        with mock.patch.dict(os.environ, env):
+            root = get_cache_dir()
+            shared_roots = get_shared_cache_dirs()
+
+        # Then
+        self.assertEqual(root, join(self.root, get_platform_dir()))
+        self.assertEqual(
+            shared_roots,
+            [join('/a', get_platform_dir()), join('/b', get_platform_dir())]
+        )
+
+    def test_module_should_be_keyed_on_source_and_flags(self):
+        # Given
+        m1 = CachedExtModule(CODE, root=self.root, shared_roots=[])
+        m2 = CachedExtModule(CODE, root=self.root, shared_roots=[])
+        m3 = CachedExtModule(
+            CODE, root=self.root, shared_roots=[], extra_compile_args=['-g']
+        )
+
+        # Then
+        self.assertEqual(m1.ext_path, m2.ext_path)
+        self.assertNotEqual(m1.ext_path, m3.ext_path)
+        self.assertEqual(dirname(m1.ext_path), join(self.root, m1.hash[:2]))
+
+    def test_should_load_module_from_shared_cache(self):
+        # Given
+        shared = join(self.root, 'shared')
+        local = join(self.root, 'local')
+        CachedExtModule(CODE, root=shared, shared_roots=[]).load()
+
+        # When
+        ext_mod = CachedExtModule(CODE, root=local, shared_roots=[shared])
+        mod = ext_mod.load()
+
+        # Then
+        self.assertEqual(mod.f(), 1)
+        self.assertTrue(ext_mod.ext_path.startswith(shared))
+        self.assertEqual(len(get_cache_entries(local)), 0)
+        self.assertEqual(len(get_cache_entries(shared)), 1)
+
+    def test_should_evict_least_recently_used_modules(self):
+        # Given
+        self._make_entry('m_aa1', 100, age=10)
+        self._make_entry('m_bb2', 100, age=5)
+        self._make_entry('m_cc3', 100, age=1)
+
+        # When
+        removed = clean_cache(self.root, max_size=250, dry_run=True)
+
+        # Then
+        self.assertEqual([e['name'] for e in removed], ['m_aa1', 'm_bb2'])
+        self.assertEqual(len(get_cache_entries(self.root)), 3)
+
+        # When
+        removed = clean_cache(self.root, max_age=7)
+
+        # Then
+        self.assertEqual([e['name'] for e in removed], ['m_aa1'])
+        names = [e['name'] for e in get_cache_entries(self.root)]
+        self.assertEqual(names, ['m_bb2', 'm_cc3'])
+
+        # When
+        clean_cache(self.root)
+
+        # Then
+        self.assertEqual(len(get_cache_entries(self.root)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,9 +5,10 @@ from textwrap import dedent
 import unittest
 
 # Local imports.
-from compyle.api import KnownType
+from compyle.api import KnownType, declare
 from pysph.sph.equation import (
-    BasicCodeBlock, Context, CythonGroup, Equation, Group, sort_precomputed
+    BasicCodeBlock, Context, CythonGroup, Equation, Group,
+    get_integer_attributes, get_wrapper_instance, sort_precomputed
 )
 
 
@@ -263,5 +264,66 @@ class TestGroup(TestBase):
         self.assertEqual(result, expect, msg)
 
 
+class IndexedEquation(Equation):
+    def __init__(self, dest, sources, index, scale, flags=0):
+        self.index = index
+        self.scale = scale
+        self.flags = flags
+        super(IndexedEquation, self).__init__(dest, sources)
+
+    def post_loop(self, d_idx, d_u, d_m):
+        i = declare('int')
+        for i in range(self.index):
+            d_u[d_idx] += d_m[self.index]*self.scale
+        if self.flags & 1:
+            d_u[d_idx] = 0.0
+
+
+class TestEquationParameters(unittest.TestCase):
+    def _get_wrappers(self, rho0, c0, gamma, alpha, gz):
+        from pysph.sph.wc.basic import MomentumEquation, TaitEOS
+        g = CythonGroup(
+            [TaitEOS('f', None, rho0=rho0, c0=c0, gamma=gamma),
+             MomentumEquation('f', ['f'], c0=c0, alpha=alpha, gz=gz)]
+        )
+        return g.get_equation_wrappers()
+
+    def test_should_find_integer_attributes(self):
+        self.assertEqual(get_integer_attributes(IndexedEquation),
+                         set(['index', 'flags']))
+
+    def test_wrapper_types_should_not_depend_on_parameter_values(self):
+        # Given
+        eqs = [IndexedEquation('f', None, index=1, scale=1),
+               IndexedEquation('f', None, index=2, scale=0.5)]
+
+        # When
+        obj = get_wrapper_instance(eqs)
+
+        # Then
+        self.assertIsInstance(obj, IndexedEquation)
+        self.assertEqual(obj.index, 2)
+        self.assertIsInstance(obj.index, int)
+        self.assertEqual(obj.scale, 0.5)
+        self.assertIsInstance(obj.flags, int)
+        self.assertIsInstance(
+            get_wrapper_instance(eqs[:1]).scale, float
+        )
+
+    def test_generated_code_should_not_depend_on_parameter_values(self):
+        # Given
+        code = self._get_wrappers(rho0=1000, c0=10, gamma=7, alpha=1, gz=-9)
+
+        # When
+        other = self._get_wrappers(
+            rho0=998.2, c0=12.5, gamma=7.0, alpha=0.05, gz=-9.81
+        )
+
+        # Then
+        self.assertEqual(code, other)
+        self.assertIn('cdef public double gamma', code)
+        self.assertIn('cdef public double c0', code)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -2,7 +2,7 @@ import unittest
 
 import numpy as np
 
-from pysph.base.utils import get_particle_array
+from pysph.base.utils import get_particle_array, get_particle_array_wcsph
 from pysph.base.kernels import QuinticSpline
 
 from pysph.sph.acceleration_eval import AccelerationEval
@@ -32,6 +32,64 @@ class TestIntegratorCythonHelper(unittest.TestCase):
             integrator, a_helper
         )
 
+    def _get_helper(self, stepper, fuse_stages):
+        x = np.linspace(0, 1, 10)
+        pa = get_particle_array_wcsph(name='fluid', x=x)
+        equations = [SummationDensity(dest='fluid', sources=['fluid'])]
+        kernel = QuinticSpline(dim=1)
+        a_eval = AccelerationEval([pa], equations, kernel=kernel)
+        a_helper = AccelerationEvalCythonHelper(a_eval)
+        integrator = PECIntegrator(fluid=stepper)
+        integrator.fuse_stages = fuse_stages
+        return IntegratorCythonHelper(integrator, a_helper)
+
+    def test_should_fuse_consecutive_stages(self):
+        # Given
+        helper = self._get_helper(WCSPHStep(), fuse_stages=True)
+
+        # When
+        code = helper.get_timestep_code()
+
+        # Then
+        self.assertIn('self.initialize_stage1()', code)
+        self.assertNotIn('self.initialize()', code)
+        self.assertIn('self.stage2()', code)
+        names = helper.get_stepper_method_wrapper_names()
+        self.assertIn('initialize_stage1', names)
+        self.assertTrue(helper.has_stepper_loop('fluid', 'initialize_stage1'))
+        loop = helper.get_stepper_loop('fluid', 'initialize_stage1')
+        self.assertEqual(
+            [x.split('(')[0] for x in loop.splitlines()],
+            ['self.fluid_stepper.initialize', 'self.fluid_stepper.stage1']
+        )
+
+    def test_should_not_fuse_stages_with_py_stage(self):
+        # Given
+        class PyStage1Step(WCSPHStep):
+            def py_stage1(self, dest, t, dt):
+                pass
+
+        # When
+        helper = self._get_helper(PyStage1Step(), fuse_stages=True)
+        code = helper.get_timestep_code()
+
+        # Then
+        self.assertIn('self.initialize()', code)
+        self.assertIn('self.stage1()', code)
+        self.assertNotIn('initialize_stage1',
+                         helper.get_stepper_method_wrapper_names())
+
+    def test_should_not_fuse_stages_by_default(self):
+        # Given
+        helper = self._get_helper(WCSPHStep(), fuse_stages=False)
+
+        # When
+        code = helper.get_timestep_code()
+
+        # Then
+        self.assertIn('self.initialize()', code)
+        self.assertIn('self.stage1()', code)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,81 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from compyle.config import get_config
+from pysph.sph.profile import Profiler, get_profiler, profile_ctx
+
+
+class TestProfiler(unittest.TestCase):
+    def test_should_accumulate_timings(self):
+        # Given
+        p = Profiler()
+
+        # When
+        p.add('g0', 1.0)
+        p.add('g0/fluid<-fluid/loop', 0.5)
+        p.add('g0', 2.0)
+        p.describe('g0/fluid<-fluid/loop', ['A', 'B'])
+        p.describe('g0/fluid<-fluid/loop', ['B', 'C'])
+
+        # Then
+        info = p.get_info()
+        self.assertEqual([x['name'] for x in info],
+                         ['g0', 'g0/fluid<-fluid/loop'])
+        self.assertEqual(info[0]['calls'], 2)
+        self.assertAlmostEqual(info[0]['time'], 3.0)
+        self.assertEqual(info[0]['equations'], [])
+        self.assertEqual(info[1]['equations'], ['A', 'B', 'C'])
+        table = p.get_table(total_time=6.0)
+        self.assertTrue('50.0' in table)
+        self.assertTrue('A, B, C' in table)
+
+    def test_should_save_json(self):
+        # Given
+        p = Profiler()
+        p.add('nnps.update', 0.25, calls=5)
+        root = tempfile.mkdtemp()
+        fname = os.path.join(root, 'profile.json')
+
+        try:
+            # When
+            p.save(fname, run_duration=1.0)
+
+            # Then
+            with open(fname) as f:
+                data = json.load(f)
+        finally:
+            shutil.rmtree(root)
+        self.assertEqual(data['run_duration'], 1.0)
+        self.assertEqual(data['timers'][0]['name'], 'nnps.update')
+        self.assertEqual(data['timers'][0]['calls'], 5)
+
+    def test_profile_ctx_only_times_when_profiling(self):
+        # Given
+        profiler = get_profiler()
+        profiler.reset()
+        orig = get_config().profile
+
+        try:
+            # When
+            get_config().profile = False
+            with profile_ctx('f'):
+                pass
+            self.assertEqual(profiler.get_info(), [])
+            get_config().profile = True
+            with profile_ctx('f'):
+                pass
+        finally:
+            get_config().profile = orig
+
+        # Then
+        info = profiler.get_info()
+        self.assertEqual(len(info), 1)
+        self.assertEqual(info[0]['calls'], 1)
+        profiler.reset()
+
+
+if __name__ == '__main__':
+    unittest.main()
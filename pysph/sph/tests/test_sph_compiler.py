@@ -0,0 +1,64 @@
+# Standard library imports.
+import os
+import shutil
+import tempfile
+import unittest
+
+# Library imports.
+from compyle.ext_module import ExtModule
+
+# Local library imports.
+from pysph.sph.sph_compiler import build_ext_modules
+
+
+CODE = '''
+def f():
+    return %d
+'''
+
+
+class TestBuildExtModules(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _make_ext_module(self, value):
+        return ExtModule(CODE % value, root=self.root)
+
+    def test_should_build_modules_concurrently(self):
+        # Given
+        ext_modules = [self._make_ext_module(i) for i in range(3)]
+
+        # When
+        built = build_ext_modules(ext_modules, n_jobs=3)
+
+        # Then
+        self.assertEqual(
+            sorted(built), sorted(m.ext_path for m in ext_modules)
+        )
+        for i, ext_mod in enumerate(ext_modules):
+            self.assertTrue(os.path.exists(ext_mod.ext_path))
+            self.assertEqual(ext_mod.load().f(), i)
+
+    def test_should_not_rebuild_cached_or_duplicate_modules(self):
+        # Given
+        ext_modules = [self._make_ext_module(1), self._make_ext_module(1)]
+
+        # When
+        built = build_ext_modules(ext_modules, n_jobs=2)
+
+        # Then
+        self.assertEqual(built, [ext_modules[0].ext_path])
+
+        # When
+        ext_modules.append(self._make_ext_module(2))
+        built = build_ext_modules(ext_modules, n_jobs=2)
+
+        # Then
+        self.assertEqual(built, [ext_modules[2].ext_path])
+
+
+if __name__ == '__main__':
+    unittest.main()
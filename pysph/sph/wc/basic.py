@@ -156,11 +156,16 @@ class MomentumEquation(Equation):
 
         \bar{\rho}_{ab} = \frac{\rho_a + \rho_b}{2}
 
+    The interaction is antisymmetric so each pair of particles is evaluated
+    once when the destination and source are the same.
+
     References
     ----------
     .. [Monaghan1992] J. Monaghan, Smoothed Particle Hydrodynamics, "Annual
         Review of Astronomy and Astrophysics", 30 (1992), pp. 543-574.
     """
+    symmetric = True
+
     def __init__(self, dest, sources, c0,
                  alpha=1.0, beta=1.0, gx=0.0, gy=0.0, gz=0.0,
                  tensile_correction=False):
@@ -256,6 +261,65 @@ class MomentumEquation(Equation):
         d_av[d_idx] += -s_m[s_idx] * (tmp + piij) * DWIJ[1]
         d_aw[d_idx] += -s_m[s_idx] * (tmp + piij) * DWIJ[2]
 
+    def loop_pair(self, d_idx, s_idx, d_m, d_rho, d_cs, d_p, d_au, d_av,
+                  d_aw, s_m, s_rho, s_cs, s_p, s_au, s_av, s_aw, VIJ, XIJ,
+                  HIJ, R2IJ, RHOIJ1, EPS, DWIJ, WIJ, WDP, d_dt_cfl, s_dt_cfl):
+
+        rhoi21 = 1.0/(d_rho[d_idx]*d_rho[d_idx])
+        rhoj21 = 1.0/(s_rho[s_idx]*s_rho[s_idx])
+
+        vijdotxij = VIJ[0]*XIJ[0] + VIJ[1]*XIJ[1] + VIJ[2]*XIJ[2]
+
+        piij = 0.0
+        if vijdotxij < 0:
+            cij = 0.5 * (d_cs[d_idx] + s_cs[s_idx])
+
+            muij = (HIJ * vijdotxij)/(R2IJ + EPS)
+
+            piij = -self.alpha*cij*muij + self.beta*muij*muij
+            piij = piij*RHOIJ1
+
+        # compute the CFL time step factor
+        _dt_cfl = 0.0
+        if R2IJ > 1e-12:
+            _dt_cfl = abs(HIJ * vijdotxij/R2IJ) + self.c0
+            d_dt_cfl[d_idx] = max(_dt_cfl, d_dt_cfl[d_idx])
+            s_dt_cfl[s_idx] = max(_dt_cfl, s_dt_cfl[s_idx])
+
+        tmpi = d_p[d_idx]*rhoi21
+        tmpj = s_p[s_idx]*rhoj21
+
+        fij = WIJ/WDP
+        Ri = 0.0
+        Rj = 0.0
+
+        # tensile instability correction
+        if self.tensile_correction:
+            fij = fij*fij
+            fij = fij*fij
+
+            if d_p[d_idx] > 0:
+                Ri = 0.01 * tmpi
+            else:
+                Ri = 0.2*abs(tmpi)
+
+            if s_p[s_idx] > 0:
+                Rj = 0.01 * tmpj
+            else:
+                Rj = 0.2 * abs(tmpj)
+
+        # gradient and correction terms, the kernel gradient changes sign
+        # for the source particle.
+        tmp = (tmpi + tmpj) + (Ri + Rj)*fij
+
+        d_au[d_idx] += -s_m[s_idx] * (tmp + piij) * DWIJ[0]
+        d_av[d_idx] += -s_m[s_idx] * (tmp + piij) * DWIJ[1]
+        d_aw[d_idx] += -s_m[s_idx] * (tmp + piij) * DWIJ[2]
+
+        s_au[s_idx] += d_m[d_idx] * (tmp + piij) * DWIJ[0]
+        s_av[s_idx] += d_m[d_idx] * (tmp + piij) * DWIJ[1]
+        s_aw[s_idx] += d_m[d_idx] * (tmp + piij) * DWIJ[2]
+
     def post_loop(self, d_idx, d_au, d_av, d_aw, d_dt_force):
         d_au[d_idx] += self.gx
         d_av[d_idx] += self.gy
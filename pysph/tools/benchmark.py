@@ -0,0 +1,351 @@
+"""Benchmark various parts of PySPH and save the timings as JSON.
+
+The ``nnps`` suite times the binning (``update``) and a full neighbor query
+over all particles for each of the CPU NNPS algorithms. For example::
+
+    $ pysph bench nnps --n 10000 100000 --dim 2 3 --cache both -o nnps.json
+
+The ``precision`` suite runs an example for a few time steps with double,
+single and mixed precision storage of the properties and reports the
+throughput of each. For example::
+
+    $ pysph bench precision --example dam_break_3d --max-steps 50 --openmp
+
+Any other options are passed on to the example.
+
+The JSON output may be used to select the best ``--nnps`` for a given case
+and to compare the performance of different versions of PySPH.
+"""
+
+from __future__ import print_function
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+
+import numpy as np
+
+
+NNPS_ALGORITHMS = (
+    'LinkedListNNPS', 'BoxSortNNPS', 'SpatialHashNNPS',
+    'ExtendedSpatialHashNNPS', 'CellIndexingNNPS', 'ZOrderNNPS',
+    'StratifiedHashNNPS', 'StratifiedSFCNNPS', 'OctreeNNPS',
+    'CompressedOctreeNNPS'
+)
+
+
+def make_particles(n, dim, h_spread=0.0, seed=123):
+    """Return a particle array with about `n` particles in a unit box.
+
+    The particles are on a perturbed lattice, and the smoothing lengths are
+    uniformly distributed between ``1.2*dx`` and ``1.2*(1 + h_spread)*dx``.
+    """
+    from pysph.base.utils import get_particle_array
+    rng = np.random.RandomState(seed)
+    nx = max(int(round(n**(1.0/dim))), 1)
+    dx = 1.0/nx
+    _x = np.arange(nx)*dx + 0.5*dx
+    grid = np.meshgrid(*([_x]*dim), indexing='ij')
+    coords = [g.ravel() for g in grid]
+    np_ = coords[0].size
+    coords = [c + (rng.random_sample(np_) - 0.5)*0.2*dx for c in coords]
+    coords += [np.zeros(np_)]*(3 - dim)
+    h = 1.2*dx*(1.0 + h_spread*rng.random_sample(np_))
+    return get_particle_array(
+        name='fluid', x=coords[0], y=coords[1], z=coords[2], h=h,
+        m=np.ones(np_)*dx**dim
+    )
+
+
+def get_nnps_class(name):
+    from pysph.base import nnps
+    return getattr(nnps, name)
+
+
+def _best_time(func, repeat, setup=None):
+    times = []
+    for i in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    return min(times)
+
+
+def find_all_neighbors(nnps, cache):
+    """Find the neighbors of all the particles of the first array in
+    parallel and return the total number of neighbors found.
+
+    A cached NNPS fills its neighbor cache. Otherwise the NNPS is queried
+    directly with :py:meth:`pysph.base.nnps_base.NNPS.get_all_neighbors`,
+    a compiled parallel loop over ``find_nearest_neighbors``.
+    """
+    if cache:
+        nnps.set_context(0, 0)
+        nbr_cache = nnps.cache[0]
+        nbr_cache.find_all_neighbors()
+        return sum(x.length for x in nbr_cache._neighbor_arrays)
+    else:
+        offsets, nbrs = nnps.get_all_neighbors(0, 0)
+        return len(nbrs)
+
+
+def time_nnps(name, pa, dim, cache, repeat=3):
+    """Time the update and a full neighbor query for the given NNPS, see
+    :py:func:`find_all_neighbors`.
+
+    Returns a dictionary with the best of `repeat` times for the update
+    and query and the total number of neighbors found.
+    """
+    cls = get_nnps_class(name)
+    start = time.time()
+    nnps = cls(dim=dim, particles=[pa], radius_scale=2.0, cache=cache)
+    setup = time.time() - start
+
+    def query():
+        return find_all_neighbors(nnps, cache)
+
+    t_update = _best_time(nnps.update, repeat)
+    # The update resets any cached neighbors so each query starts afresh.
+    t_query = _best_time(query, repeat, setup=nnps.update)
+    n_nbrs = query()
+    return dict(
+        setup=setup, update=t_update, query=t_query, neighbors=int(n_nbrs)
+    )
+
+
+def run_nnps_bench(options):
+    from pysph.base.nnps_base import (get_number_of_threads,
+                                      set_number_of_threads)
+    caches = dict(yes=[True], no=[False], both=[False, True])[options.cache]
+    threads = options.threads or [get_number_of_threads()]
+    results = []
+    for n_threads in threads:
+        set_number_of_threads(n_threads)
+        for dim in options.dim:
+            for n in options.n:
+                for h_spread in options.h_spread:
+                    pa = make_particles(n, dim, h_spread)
+                    for name in options.nnps:
+                        for cache in caches:
+                            res = dict(
+                                nnps=name, n=pa.get_number_of_particles(),
+                                dim=dim, h_spread=h_spread, cache=cache,
+                                threads=n_threads
+                            )
+                            res.update(time_nnps(
+                                name, pa, dim, cache, options.repeat
+                            ))
+                            results.append(res)
+                            print(
+                                "{nnps:<24s} n={n:<9d} dim={dim} "
+                                "h_spread={h_spread:<5g} cache={cache:d} "
+                                "threads={threads:<3d} update={update:.4g}s "
+                                "query={query:.4g}s".format(**res)
+                            )
+                            sys.stdout.flush()
+    return results
+
+
+def get_metadata():
+    import pysph
+    return dict(
+        pysph_version=pysph.__version__,
+        python_version=platform.python_version(),
+        platform=platform.platform(),
+        processor=platform.processor(),
+        date=datetime.datetime.now().isoformat(),
+    )
+
+
+def _make_nnps_parser():
+    parser = argparse.ArgumentParser(
+        prog='pysph bench nnps', description=__doc__, add_help=False
+    )
+    parser.add_argument(
+        "-h", "--help", action="store_true", default=False, dest="help",
+        help="show this help message and exit"
+    )
+    parser.add_argument(
+        "--nnps", type=str, nargs='+', default=list(NNPS_ALGORITHMS),
+        choices=NNPS_ALGORITHMS, help="NNPS algorithms to benchmark."
+    )
+    parser.add_argument(
+        "--n", type=int, nargs='+', default=[10000, 100000, 1000000],
+        help="Approximate number of particles."
+    )
+    parser.add_argument(
+        "--dim", type=int, nargs='+', default=[2, 3], choices=[1, 2, 3],
+        help="Dimensions to benchmark."
+    )
+    parser.add_argument(
+        "--h-spread", type=float, nargs='+', default=[0.0, 1.0],
+        dest="h_spread",
+        help="Spread of the smoothing lengths, h varies from h0 to "
+        "(1 + h_spread)*h0."
+    )
+    parser.add_argument(
+        "--cache", choices=['yes', 'no', 'both'], default='both',
+        help="Benchmark with/without the neighbor cache."
+    )
+    parser.add_argument(
+        "--threads", type=int, nargs='+', default=None,
+        help="Number of OpenMP threads, defaults to the current number."
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3,
+        help="Number of times to repeat each measurement, the best time "
+        "is reported."
+    )
+    parser.add_argument(
+        "-o", "--output", type=str, default=None,
+        help="Output JSON file, defaults to nnps_bench.json."
+    )
+    return parser
+
+
+def nnps_main(argv):
+    parser = _make_nnps_parser()
+    options = parser.parse_args(argv)
+    if options.help:
+        parser.print_help()
+        sys.exit()
+    results = run_nnps_bench(options)
+    output = options.output or 'nnps_bench.json'
+    data = dict(suite='nnps', metadata=get_metadata(), results=results)
+    with open(output, 'w') as f:
+        json.dump(data, f, indent=2)
+    print("Results written to %s" % output)
+
+
+PRECISION_OPTIONS = dict(
+    double=[], single=['--single-precision'], mixed=['--mixed-precision']
+)
+
+
+def time_example(example, precision, max_steps, extra_args):
+    """Run the example module in a separate process with the given
+    precision and return the time taken by the solver and the number of
+    particles.
+    """
+    import subprocess
+    import tempfile
+    from pysph.solver.utils import get_files, load
+    output_dir = tempfile.mkdtemp(prefix='pysph_bench_')
+    module = example if '.' in example else 'pysph.examples.' + example
+    cmd = [
+        sys.executable, '-m', module, '-q', '-d', output_dir,
+        '--max-steps', str(max_steps), '--pfreq', str(max_steps)
+    ] + PRECISION_OPTIONS[precision] + extra_args
+    subprocess.check_call(cmd)
+
+    fname = module.split('.')[-1]
+    with open(os.path.join(output_dir, fname + '.info')) as f:
+        info = json.load(f)
+    data = load(get_files(output_dir, fname)[0])
+    n = sum(pa.get_number_of_particles() for pa in data['arrays'].values())
+    shutil.rmtree(output_dir)
+    return info['cpu_time'], n
+
+
+def run_precision_bench(options):
+    results = []
+    for precision in options.precision:
+        best = None
+        for i in range(options.repeat):
+            t, n = time_example(
+                options.example, precision, options.max_steps, options.args
+            )
+            best = t if best is None else min(best, t)
+        res = dict(
+            example=options.example, precision=precision, n=n,
+            steps=options.max_steps, time=best,
+            throughput=n*options.max_steps/best
+        )
+        results.append(res)
+        print(
+            "{example} precision={precision:<7s} n={n:<9d} "
+            "time={time:.4g}s throughput={throughput:.4g} "
+            "particle steps/s".format(**res)
+        )
+        sys.stdout.flush()
+    double = [r for r in results if r['precision'] == 'double']
+    if double:
+        for res in results:
+            res['speedup'] = res['throughput']/double[0]['throughput']
+    return results
+
+
+def _make_precision_parser():
+    parser = argparse.ArgumentParser(
+        prog='pysph bench precision', description=__doc__, add_help=False
+    )
+    parser.add_argument(
+        "-h", "--help", action="store_true", default=False, dest="help",
+        help="show this help message and exit"
+    )
+    parser.add_argument(
+        "--example", type=str, default='dam_break_3d',
+        help="Example to run, either the name of a PySPH example or a "
+        "module."
+    )
+    parser.add_argument(
+        "--precision", type=str, nargs='+',
+        default=['double', 'single', 'mixed'],
+        choices=list(PRECISION_OPTIONS), help="Precisions to benchmark."
+    )
+    parser.add_argument(
+        "--max-steps", type=int, default=50, dest="max_steps",
+        help="Number of time steps to run."
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=1,
+        help="Number of times to repeat each measurement, the best time "
+        "is reported."
+    )
+    parser.add_argument(
+        "-o", "--output", type=str, default=None,
+        help="Output JSON file, defaults to precision_bench.json."
+    )
+    return parser
+
+
+def precision_main(argv):
+    parser = _make_precision_parser()
+    # Any unknown arguments, e.g. --openmp, are passed to the example.
+    options, args = parser.parse_known_args(argv)
+    options.args = args
+    if options.help:
+        parser.print_help()
+        sys.exit()
+    results = run_precision_bench(options)
+    output = options.output or 'precision_bench.json'
+    data = dict(suite='precision', metadata=get_metadata(), results=results)
+    with open(output, 'w') as f:
+        json.dump(data, f, indent=2)
+    print("Results written to %s" % output)
+
+
+SUITES = dict(nnps=nnps_main, precision=precision_main)
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    if len(argv) == 0 or argv[0] not in SUITES:
+        print(__doc__)
+        print("Available suites: %s" % ', '.join(sorted(SUITES)))
+        sys.exit()
+
+    SUITES[argv[0]](argv[1:])
+
+
+if __name__ == '__main__':
+    main()
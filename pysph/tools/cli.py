@@ -23,6 +23,21 @@ def output_vtk(args):
     main(args)
 
 
+def run_benchmarks(args):
+    from pysph.tools.benchmark import main
+    main(args)
+
+
+def run_precompile(args):
+    from pysph.tools.precompile import main
+    main(args)
+
+
+def manage_cache(args):
+    from pysph.sph.compile_cache import main
+    main(args)
+
+
 def _has_pysph_dir():
     init_py = join('pysph', '__init__.py')
     init_pyc = join('pysph', '__init__.pyc')
@@ -66,6 +81,28 @@ def main():
     )
     tests.set_defaults(func=run_tests)
 
+    bench = subparsers.add_parser(
+        'bench', help='Run PySPH benchmarks, e.g. "pysph bench nnps"',
+        add_help=False
+    )
+    bench.set_defaults(func=run_benchmarks)
+
+    precompile = subparsers.add_parser(
+        'precompile',
+        help='Compile the code for an example ahead of time, e.g. '
+        '"pysph precompile elliptical_drop --openmp"',
+        add_help=False
+    )
+    precompile.set_defaults(func=run_precompile)
+
+    cache = subparsers.add_parser(
+        'cache',
+        help='Show or clean the cache of compiled code, e.g. '
+        '"pysph cache --clean --max-age 30"',
+        add_help=False
+    )
+    cache.set_defaults(func=manage_cache)
+
     if (len(sys.argv) == 1 or (len(sys.argv) > 1 and
                                sys.argv[1] in ['-h', '--help'])):
         parser.print_help()
@@ -3,7 +3,6 @@ import numpy as np
 import copy
 from pysph.base.nnps import LinkedListNNPS
 from pysph.base.utils import get_particle_array, get_particle_array_wcsph
-from cyarray.api import UIntArray
 from numpy.linalg import norm
 
 
@@ -677,22 +676,15 @@ def find_overlap_particles(fluid_parray, solid_parray, dx_solid, dim=3):
     if dim == 2:
         z = np.zeros_like(x)
         z1 = np.zeros_like(x1)
-    to_remove = []
     ll_nnps = LinkedListNNPS(dim, [fluid_parray, solid_parray])
-    for i in range(len(x)):
-        nbrs = UIntArray()
-        ll_nnps.get_nearest_particles(1, 0, i, nbrs)
-        point_i = np.array([x[i], y[i], z[i]])
-        near_points = nbrs.get_npy_array()
-        distances = []
-        for ind in near_points:
-            dest = [x1[ind], y1[ind], z1[ind]]
-            distances.append(distance(point_i, dest))
-        if len(distances) == 0:
-            continue
-        elif min(distances) < (dx_solid * (1.0 - 1.0e-07)):
-            to_remove.append(i)
-    return to_remove
+    offsets, nbrs = ll_nnps.get_all_neighbors(1, 0)
+    d_idx = np.repeat(np.arange(len(x)), np.diff(offsets))
+    distances = np.sqrt(
+        (x[d_idx] - x1[nbrs])**2 + (y[d_idx] - y1[nbrs])**2 +
+        (z[d_idx] - z1[nbrs])**2
+    )
+    close = distances < (dx_solid * (1.0 - 1.0e-07))
+    return np.unique(d_idx[close]).tolist()
 
 
 def remove_overlap_particles(fluid_parray, solid_parray, dx_solid, dim=3):
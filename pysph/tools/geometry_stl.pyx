@@ -3,7 +3,6 @@ from pysph.base import nnps
 import numpy as np
 from stl import mesh
 from numpy.linalg import norm
-from cyarray.api import UIntArray
 
 
 class ZeroAreaTriangleException(Exception):
@@ -103,18 +102,8 @@ def _get_neighbouring_particles(pa_src, pa_dst, radius_scale):
     nps = nnps.LinkedListNNPS(dim=3, particles=pa_list,
                               radius_scale=radius_scale)
 
-    nps.set_context(src_index=1, dst_index=0)
-
-    n = len(pa_dst.x)
-    nbrs = UIntArray()
-    grid_set = set()
-    for i in range(n):
-        nps.get_nearest_particles(1, 0, i, nbrs)
-        neighbours = list(nbrs.get_npy_array())
-        for neighbour in neighbours:
-            grid_set.add(neighbour)
-
-    idx = list(grid_set)
+    offsets, nbrs = nps.get_all_neighbors(src_index=1, dst_index=0)
+    idx = np.unique(nbrs)
 
     return pa_src.x[idx], pa_src.y[idx], pa_src.z[idx]
 
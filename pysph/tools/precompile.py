@@ -0,0 +1,56 @@
+"""Compile the generated code of a PySPH application ahead of time.
+
+The application is set up with the given options and the extension modules it
+needs are built into the cache (``~/.pysph/source``) without running the
+simulation, so that later runs with the same options start immediately.  For
+example::
+
+    $ pysph precompile elliptical_drop --openmp
+    $ pysph precompile my_problem.py --nx 100 --compile-jobs 4
+
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+
+from pysph.examples.run import _exec_file, get_path, guess_correct_module
+
+
+def get_filename(example):
+    """Return the filename of the given example, this may either be the path
+    to a file or the name of one of the PySPH examples.
+    """
+    if os.path.isfile(example):
+        return example
+    else:
+        return get_path(guess_correct_module(example))
+
+
+def precompile(filename, args):
+    """Run the application in the given file with the given command line
+    arguments, only compiling the generated code.
+    """
+    print("Compiling code for %s.\n" % filename)
+    sys.argv = [filename] + list(args) + ['--compile-only']
+    _exec_file(filename)
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if len(argv) == 0 or argv[0] in ['-h', '--help']:
+        print("usage: pysph precompile example [options]\n")
+        print(__doc__)
+        sys.exit()
+
+    filename = get_filename(argv[0])
+    if not os.path.isfile(filename):
+        print("No such file or example: %s" % argv[0])
+        sys.exit(1)
+    precompile(filename, argv[1:])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,393 @@
+#cython: embedsignature=True
+"""Lightweight probes to sample particle properties at arbitrary points.
+
+Unlike the :py:class:`pysph.tools.interpolator.Interpolator`, the probes are
+not particles and no equations are compiled. The particles near the probes
+are binned into cells and the kernel weighted sums are evaluated in parallel
+using a tabulated kernel, this is fast enough to sample thousands of probes
+every timestep.
+
+"""
+
+import numpy as np
+cimport numpy as np
+cimport cython
+from cython.parallel import parallel, prange
+from libc.math cimport ceil, floor, sqrt
+
+from pysph.base.kernels import Gaussian
+
+
+# Number of intervals used to tabulate the kernel.
+DEF N_TABLE = 4096
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _bin_particles(double[::1] x, double[::1] y, double[::1] z,
+                         double* xmin, np.int64_t* n_cells, double cell_size,
+                         np.int64_t[::1] keys, np.int64_t[::1] start,
+                         np.int64_t[::1] order) nogil:
+    # Counting sort of the particles inside the grid by their cell.
+    cdef np.int64_t i, n = x.shape[0]
+    cdef np.int64_t n_total = n_cells[0]*n_cells[1]*n_cells[2]
+    cdef np.int64_t ix, iy, iz
+    for i in prange(n):
+        ix = <np.int64_t>floor((x[i] - xmin[0])/cell_size)
+        iy = <np.int64_t>floor((y[i] - xmin[1])/cell_size)
+        iz = <np.int64_t>floor((z[i] - xmin[2])/cell_size)
+        if ix < 0 or iy < 0 or iz < 0 or ix >= n_cells[0] or \
+           iy >= n_cells[1] or iz >= n_cells[2]:
+            keys[i] = -1
+        else:
+            keys[i] = (ix*n_cells[1] + iy)*n_cells[2] + iz
+
+    for i in range(n_total + 1):
+        start[i] = 0
+    for i in range(n):
+        if keys[i] >= 0:
+            start[keys[i] + 1] += 1
+    for i in range(n_total):
+        start[i + 1] += start[i]
+    # Use the start of each cell as its fill counter and shift it back.
+    for i in range(n):
+        if keys[i] >= 0:
+            order[start[keys[i]]] = i
+            start[keys[i]] += 1
+    for i in range(n_total, 0, -1):
+        start[i] = start[i - 1]
+    start[0] = 0
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef np.int64_t _find_neighbors(double xp, double yp, double zp,
+                                double radius, double[::1] x, double[::1] y,
+                                double[::1] z, double* xmin,
+                                np.int64_t* n_cells, double cell_size,
+                                np.int64_t[::1] start, np.int64_t[::1] order,
+                                unsigned int* nbrs, double* dists) nogil:
+    # Find the particles within radius of the point, only counting them if
+    # nbrs is NULL.
+    cdef np.int64_t layers = <np.int64_t>ceil(radius/cell_size)
+    cdef np.int64_t cx = <np.int64_t>floor((xp - xmin[0])/cell_size)
+    cdef np.int64_t cy = <np.int64_t>floor((yp - xmin[1])/cell_size)
+    cdef np.int64_t cz = <np.int64_t>floor((zp - xmin[2])/cell_size)
+    cdef np.int64_t ix, iy, iz, k, j, cell, count = 0
+    cdef double xij, yij, zij, r2, radius2 = radius*radius
+    for ix in range(max(cx - layers, 0), min(cx + layers + 1, n_cells[0])):
+        for iy in range(max(cy - layers, 0),
+                        min(cy + layers + 1, n_cells[1])):
+            for iz in range(max(cz - layers, 0),
+                            min(cz + layers + 1, n_cells[2])):
+                cell = (ix*n_cells[1] + iy)*n_cells[2] + iz
+                for k in range(start[cell], start[cell + 1]):
+                    j = order[k]
+                    xij = xp - x[j]
+                    yij = yp - y[j]
+                    zij = zp - z[j]
+                    r2 = xij*xij + yij*yij + zij*zij
+                    if r2 < radius2:
+                        if nbrs != NULL:
+                            nbrs[count] = j
+                            dists[count] = sqrt(r2)
+                        count += 1
+    return count
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef void _kernel_sums(double[::1] xp, double[::1] yp, double[::1] zp,
+                       double hp, double radius_scale, int dim,
+                       double[::1] table, double[::1] x, double[::1] y,
+                       double[::1] z, double[::1] h, double[::1] volume,
+                       double[::1] f, double* xmin, np.int64_t* n_cells,
+                       double cell_size, np.int64_t[::1] start,
+                       np.int64_t[::1] order,
+                       double[::1] num, double[::1] den) nogil:
+    cdef np.int64_t p, ix, iy, iz, k, j, cell, layers, cx, cy, cz, it
+    cdef double xij, yij, zij, r2, hij, q, s, w, hfac
+    cdef double dq = radius_scale/N_TABLE
+    cdef int d
+    layers = <np.int64_t>ceil(radius_scale*hp/cell_size)
+    for p in prange(xp.shape[0]):
+        cx = <np.int64_t>floor((xp[p] - xmin[0])/cell_size)
+        cy = <np.int64_t>floor((yp[p] - xmin[1])/cell_size)
+        cz = <np.int64_t>floor((zp[p] - xmin[2])/cell_size)
+        for ix in range(max(cx - layers, 0),
+                        min(cx + layers + 1, n_cells[0])):
+            for iy in range(max(cy - layers, 0),
+                            min(cy + layers + 1, n_cells[1])):
+                for iz in range(max(cz - layers, 0),
+                                min(cz + layers + 1, n_cells[2])):
+                    cell = (ix*n_cells[1] + iy)*n_cells[2] + iz
+                    for k in range(start[cell], start[cell + 1]):
+                        j = order[k]
+                        xij = xp[p] - x[j]
+                        yij = yp[p] - y[j]
+                        zij = zp[p] - z[j]
+                        r2 = xij*xij + yij*yij + zij*zij
+                        hij = 0.5*(hp + h[j])
+                        q = sqrt(r2)/hij
+                        if q >= radius_scale:
+                            continue
+                        # Linear interpolation in the tabulated kernel.
+                        s = q/dq
+                        it = <np.int64_t>s
+                        s = s - it
+                        hfac = 1.0
+                        for d in range(dim):
+                            hfac = hfac*hij
+                        w = ((1.0 - s)*table[it] + s*table[it + 1])/hfac
+                        num[p] = num[p] + w*volume[j]*f[j]
+                        den[p] = den[p] + w
+
+
+class ProbeSet(object):
+    """A set of points at which particle properties are sampled.
+
+    The probes are given as plain coordinate arrays. Call :py:meth:`update`
+    after the particles have moved and then :py:meth:`interpolate` or
+    :py:meth:`get_neighbors` as needed.
+
+    Examples
+    --------
+
+    >>> probes = ProbeSet([fluid], x=np.linspace(0, 1, 1000))
+    >>> p = probes.interpolate('p')
+
+    """
+    def __init__(self, particle_arrays, x=None, y=None, z=None, kernel=None,
+                 dim=None):
+        """
+        Parameters
+        ----------
+
+        particle_arrays: list
+            The particle arrays to sample.
+        x, y, z: array_like
+            The coordinates of the probes, any of these that are not given
+            are taken to be zero.
+        kernel: Kernel
+            The kernel to use, defaults to a Gaussian.
+        dim: int
+            The dimension of the default kernel, deduced from the
+            coordinates given if not specified.
+        """
+        coords = [c for c in (x, y, z) if c is not None]
+        if len(coords) == 0:
+            raise RuntimeError('At least one non-None array must be given.')
+        shape = np.asarray(coords[0]).shape
+
+        def _get_array(c):
+            if c is None:
+                return np.zeros(int(np.prod(shape)))
+            return np.ascontiguousarray(np.ravel(c), dtype=np.float64)
+
+        self.shape = shape
+        self.x, self.y, self.z = _get_array(x), _get_array(y), _get_array(z)
+        if kernel is None:
+            kernel = Gaussian(dim=dim if dim is not None else len(coords))
+        self.kernel = kernel
+        self.particle_arrays = list(particle_arrays)
+        self._table = self._tabulate_kernel(kernel)
+        self.update()
+
+    def update(self):
+        """Rebin the particles near the probes, call this after the
+        particles have moved.
+        """
+        arrays = self.particle_arrays
+        self.hmax = max(pa.h.max() if pa.get_number_of_particles() > 0
+                        else 0.0 for pa in arrays)
+        radius = self.kernel.radius_scale*max(self.hmax, 1e-300)
+        self.radius = radius
+        bmin = np.array([self.x.min(), self.y.min(), self.z.min()]) - radius
+        bmax = np.array([self.x.max(), self.y.max(), self.z.max()]) + radius
+
+        # Grow the cells if the grid would be much larger than the number
+        # of particles.
+        n_total = sum(pa.get_number_of_particles() for pa in arrays)
+        cell_size = radius
+        while True:
+            n_cells = np.maximum(
+                np.ceil((bmax - bmin)/cell_size), 1
+            ).astype(np.int64)
+            if np.prod(n_cells) <= max(8*n_total, 1 << 16):
+                break
+            cell_size *= 2.0
+
+        self._xmin = bmin
+        self._n_cells = n_cells
+        self._cell_size = cell_size
+        self._bins = [self._bin(pa) for pa in arrays]
+
+    def get_neighbors(self, int src_index=0, double radius=-1.0):
+        """Find the particles of the given array within a radius of each
+        probe.
+
+        Parameters
+        ----------
+
+        src_index: int
+            Index of the particle array.
+        radius: double
+            The search radius, defaults to the kernel support for the
+            largest smoothing length. This must not be larger than the
+            default radius used when binning.
+
+        Returns
+        -------
+
+        offsets, nbrs, dists: NumPy arrays, the neighbors of probe ``i``
+            are ``nbrs[offsets[i]:offsets[i+1]]`` and ``dists`` has their
+            distances from the probe.
+        """
+        if radius < 0:
+            radius = self.radius
+        if radius > self.radius*(1.0 + 1e-12):
+            raise ValueError(
+                'Radius %s larger than the binned radius %s.' %
+                (radius, self.radius)
+            )
+        cdef double[::1] xp = self.x, yp = self.y, zp = self.z
+        pa = self.particle_arrays[src_index]
+        cdef double[::1] x = self._get(pa, 'x')
+        cdef double[::1] y = self._get(pa, 'y')
+        cdef double[::1] z = self._get(pa, 'z')
+        cdef np.int64_t[::1] start, order
+        start, order = self._bins[src_index]
+        cdef np.ndarray[np.double_t, ndim=1] xmin = self._xmin
+        cdef np.ndarray[np.int64_t, ndim=1] n_cells = self._n_cells
+        cdef double* _xmin = <double*>xmin.data
+        cdef np.int64_t* _n_cells = <np.int64_t*>n_cells.data
+        cdef double cell_size = self._cell_size
+        cdef np.int64_t i, n = xp.shape[0]
+        cdef np.ndarray[np.int64_t, ndim=1] offsets = np.zeros(
+            n + 1, dtype=np.int64
+        )
+        cdef np.int64_t* off = <np.int64_t*>offsets.data
+        with nogil, parallel():
+            for i in prange(n):
+                off[i + 1] = _find_neighbors(
+                    xp[i], yp[i], zp[i], radius, x, y, z, _xmin, _n_cells,
+                    cell_size, start, order, NULL, NULL
+                )
+        for i in range(n):
+            off[i + 1] += off[i]
+
+        cdef np.ndarray[np.uint32_t, ndim=1] nbrs = np.empty(
+            off[n], dtype=np.uint32
+        )
+        cdef np.ndarray[np.double_t, ndim=1] dists = np.empty(off[n])
+        cdef unsigned int* _nbrs = <unsigned int*>nbrs.data
+        cdef double* _dists = <double*>dists.data
+        with nogil, parallel():
+            for i in prange(n):
+                _find_neighbors(
+                    xp[i], yp[i], zp[i], radius, x, y, z, _xmin, _n_cells,
+                    cell_size, start, order, &_nbrs[off[i]], &_dists[off[i]]
+                )
+        return offsets, nbrs, dists
+
+    def interpolate(self, prop, method='shepard'):
+        """Interpolate the given property at the probes.
+
+        Parameters
+        ----------
+
+        prop: str
+            The name of the property to interpolate.
+        method: str
+            Either 'shepard', which normalizes the kernel weighted sum by the
+            sum of the weights, or 'sph' which computes the SPH sum using
+            the particle volumes ``m/rho``.
+
+        Returns
+        -------
+
+        A NumPy array shaped like the probe coordinates.
+        """
+        if method not in ('shepard', 'sph'):
+            raise RuntimeError('%s method is not implemented' % method)
+        num, den = self.kernel_sums(prop, volume=(method == 'sph'))
+        if method == 'shepard':
+            result = np.where(den > 1e-12, num/np.where(den > 1e-12, den, 1.0),
+                              num)
+        else:
+            result = num
+        result.shape = self.shape
+        return result
+
+    def kernel_sums(self, prop, volume=False):
+        """Return the sums of the kernel weighted property, and of the kernel
+        weights, over the particles near each probe. If `volume` is True the
+        property is also weighted by the particle volumes ``m/rho``.
+        """
+        cdef np.int64_t n = self.x.shape[0]
+        cdef np.ndarray[np.double_t, ndim=1] num = np.zeros(n)
+        cdef np.ndarray[np.double_t, ndim=1] den = np.zeros(n)
+        cdef np.ndarray[np.double_t, ndim=1] xmin = self._xmin
+        cdef np.ndarray[np.int64_t, ndim=1] n_cells = self._n_cells
+        cdef np.int64_t[::1] start, order
+        cdef double[::1] x, y, z, h, vol, f
+        cdef double[::1] xp = self.x, yp = self.y, zp = self.z
+        cdef double[::1] table = self._table
+        cdef double[::1] _num = num, _den = den
+        cdef double hp = self.hmax
+        cdef double radius_scale = self.kernel.radius_scale
+        cdef double cell_size = self._cell_size
+        cdef int dim = self.kernel.dim
+        for pa, (start, order) in zip(self.particle_arrays, self._bins):
+            if pa.get_number_of_particles() == 0:
+                continue
+            x, y, z = self._get(pa, 'x'), self._get(pa, 'y'), self._get(pa, 'z')
+            h = self._get(pa, 'h')
+            f = self._get(pa, prop)
+            if volume:
+                vol = np.ascontiguousarray(
+                    self._get(pa, 'm')/self._get(pa, 'rho')
+                )
+            else:
+                vol = np.ones(x.shape[0])
+            with nogil:
+                _kernel_sums(
+                    xp, yp, zp, hp, radius_scale, dim, table, x, y, z, h,
+                    vol, f, <double*>xmin.data, <np.int64_t*>n_cells.data,
+                    cell_size, start, order, _num, _den
+                )
+        return num, den
+
+    # Private protocol ###################################################
+
+    def _get(self, pa, prop):
+        return np.ascontiguousarray(
+            pa.get(prop, only_real_particles=False), dtype=np.float64
+        )
+
+    def _bin(self, pa):
+        cdef np.int64_t n = pa.get_number_of_particles()
+        cdef np.ndarray[np.double_t, ndim=1] xmin = self._xmin
+        cdef np.ndarray[np.int64_t, ndim=1] n_cells = self._n_cells
+        cdef double[::1] x = self._get(pa, 'x')
+        cdef double[::1] y = self._get(pa, 'y')
+        cdef double[::1] z = self._get(pa, 'z')
+        cdef np.int64_t[::1] keys = np.empty(n, dtype=np.int64)
+        cdef np.int64_t[::1] start = np.empty(np.prod(self._n_cells) + 1,
+                                        dtype=np.int64)
+        cdef np.int64_t[::1] order = np.empty(n, dtype=np.int64)
+        cdef double cell_size = self._cell_size
+        with nogil:
+            _bin_particles(
+                x, y, z, <double*>xmin.data, <np.int64_t*>n_cells.data,
+                cell_size, keys, start, order
+            )
+        return start, order
+
+    def _tabulate_kernel(self, kernel):
+        # The kernel for a unit smoothing length, W(r, h) = W(r/h, 1)/h^dim.
+        q = np.linspace(0.0, kernel.radius_scale, N_TABLE + 1)
+        table = np.array([kernel.kernel([x, 0.0, 0.0], x, 1.0) for x in q])
+        return np.concatenate((table, [0.0]))
@@ -0,0 +1,65 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from pysph.tools.benchmark import make_particles, nnps_main, time_nnps
+
+
+class TestNNPSBenchmark(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_make_particles(self):
+        # When
+        pa = make_particles(1000, 3, h_spread=1.0)
+
+        # Then
+        self.assertEqual(pa.get_number_of_particles(), 1000)
+        h0 = 1.2*0.1
+        self.assertTrue(np.all(pa.h >= h0))
+        self.assertTrue(np.all(pa.h <= 2*h0))
+
+    def test_cached_and_uncached_queries_find_same_neighbors(self):
+        # Given
+        pa = make_particles(400, 2, h_spread=0.5)
+
+        # When
+        r0 = time_nnps('LinkedListNNPS', pa, 2, cache=False, repeat=1)
+        r1 = time_nnps('LinkedListNNPS', pa, 2, cache=True, repeat=1)
+        r2 = time_nnps('ZOrderNNPS', pa, 2, cache=False, repeat=1)
+
+        # Then
+        self.assertTrue(r0['neighbors'] > 0)
+        self.assertEqual(r0['neighbors'], r1['neighbors'])
+        self.assertEqual(r0['neighbors'], r2['neighbors'])
+
+    def test_should_write_json_output(self):
+        # Given
+        fname = os.path.join(self.root, 'bench.json')
+        argv = ['--nnps', 'LinkedListNNPS', 'SpatialHashNNPS', '--n', '100',
+                '--dim', '2', '--h-spread', '0', '--cache', 'both',
+                '--repeat', '1', '-o', fname]
+
+        # When
+        nnps_main(argv)
+
+        # Then
+        with open(fname) as f:
+            data = json.load(f)
+        self.assertEqual(data['suite'], 'nnps')
+        self.assertEqual(len(data['results']), 4)
+        res = data['results'][0]
+        for key in ('nnps', 'n', 'dim', 'h_spread', 'cache', 'threads',
+                    'update', 'query', 'neighbors'):
+            self.assertTrue(key in res)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+
+import numpy as np
+
+from pysph.base.kernels import CubicSpline
+from pysph.base.utils import get_particle_array
+from pysph.tools.interpolator import Interpolator
+from pysph.tools.probes import ProbeSet
+
+
+class TestProbeSet(unittest.TestCase):
+    def _make_2d_grid(self, name='fluid'):
+        n = 51
+        dx = 2.0/(n-1)
+        x, y = np.mgrid[-1.+dx/2:1.:dx, -1.+dx/2:1.:dx]
+        x, y = x.ravel(), y.ravel()
+        m = np.ones_like(x)
+        h = np.ones_like(x)*1.2*dx
+        rho = np.ones_like(x)*m/(dx*dx)
+        p = np.sin(x * np.pi)
+        return get_particle_array(name=name, x=x, y=y, h=h, m=m, rho=rho, p=p)
+
+    def test_should_match_interpolator(self):
+        # Given
+        pa = self._make_2d_grid()
+        kernel = CubicSpline(dim=2)
+        x = np.linspace(-0.5, 0.5, 25)
+        y = np.linspace(-0.3, 0.4, 25)
+
+        # When
+        probes = ProbeSet([pa], x=x, y=y, kernel=kernel)
+
+        # Then
+        for method in ('shepard', 'sph'):
+            ip = Interpolator([pa], x=x, y=y, kernel=kernel, method=method)
+            np.testing.assert_allclose(
+                probes.interpolate('p', method=method),
+                ip.interpolate('p'), rtol=1e-5, atol=1e-8
+            )
+
+    def test_should_find_neighbors_within_radius(self):
+        # Given
+        pa = self._make_2d_grid()
+        x = np.array([0.0, 0.51, -0.99, 5.0])
+        y = np.array([0.0, -0.2, 0.99, 5.0])
+        probes = ProbeSet([pa], x=x, y=y, kernel=CubicSpline(dim=2))
+        radius = 0.7*probes.radius
+
+        # When
+        offsets, nbrs, dists = probes.get_neighbors(0, radius)
+
+        # Then
+        for i in range(len(x)):
+            d = np.sqrt((pa.x - x[i])**2 + (pa.y - y[i])**2)
+            expect = np.where(d < radius)[0]
+            found = nbrs[offsets[i]:offsets[i+1]]
+            self.assertListEqual(sorted(found), list(expect))
+            np.testing.assert_allclose(dists[offsets[i]:offsets[i+1]],
+                                       d[found])
+        self.assertEqual(offsets[4] - offsets[3], 0)
+
+    def test_should_follow_moving_particles_after_update(self):
+        # Given
+        pa = self._make_2d_grid()
+        probes = ProbeSet([pa], x=[0.25], y=[0.0], kernel=CubicSpline(dim=2))
+
+        # When
+        pa.x[:] += 0.5
+        pa.p[:] = np.sin((pa.x - 0.5) * np.pi)
+        probes.update()
+        p = probes.interpolate('p')
+
+        # Then
+        np.testing.assert_allclose(p, [np.sin(-0.25*np.pi)], rtol=1e-2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -470,6 +470,17 @@ def get_basic_extensions():
             define_macros=MACROS,
         ),
 
+        # Probes
+        Extension(
+            name="pysph.tools.probes",
+            sources=["pysph/tools/probes.pyx"],
+            include_dirs=include_dirs,
+            extra_compile_args=extra_compile_args + openmp_compile_args,
+            extra_link_args=openmp_link_args,
+            language="c++",
+            define_macros=MACROS,
+        ),
+
     ]
 
     if HAVE_OPENCL:
@@ -679,7 +690,7 @@ def setup_package():
           url='http://github.com/pypr/pysph',
           license="BSD",
           keywords="SPH simulation computational fluid dynamics",
-          packages=find_packages(),
+          packages=find_packages(exclude=['benchmarks']),
           package_data={
               '': ['*.pxd', '*.mako', '*.txt.gz', '*.txt', '*.vtk.gz', '*.gz',
                    '*.rst', 'ndspmhd-sedov-initial-conditions.npz']